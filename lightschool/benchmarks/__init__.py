@@ -0,0 +1,6 @@
+"""Microbenchmarks, a load test and a cold-start benchmark for LightSchool.
+
+Run from the project directory, e.g. ``python -m benchmarks.bench_rules``,
+``python -m benchmarks.load``, ``python -m benchmarks.startup`` or
+``python -m benchmarks.run`` for everything.
+"""
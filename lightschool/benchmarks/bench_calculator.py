@@ -0,0 +1,136 @@
+"""Tutor calculator: compiled tokenizer + Pratt parser vs. the original regex/AST version."""
+import ast
+import re
+
+from benchmarks.common import measure, report, setup_django
+
+setup_django()
+
+from school.services import calculator  # noqa: E402
+
+# Messages in the shape kids actually send to the tutor (most are not arithmetic).
+CORPUS = [
+    'What is 2 + 3?',
+    'what is 10 minus 4',
+    "what's 12 divided by 3?",
+    '3 times 4',
+    '7 x 8',
+    'calculate (2+3)*4',
+    'what is 2.5 + 2.5',
+    'can you help me with 15 - 7',
+    'What is addition?',
+    'Tell me about nouns',
+    'I have 3 apples and get 2 more',
+    'how do I multiply?',
+    'what is 100 over 4',
+    'hello lumi',
+    'What comes after 9?',
+    'what is 6 x 7 = ?',
+]
+
+
+def legacy_extract(text: str) -> str | None:
+    """Try to extract a simple arithmetic expression from text.
+
+    This converts common words like 'plus' -> '+' and then looks for a sequence
+    of digits/operators. Returns the expression string or None.
+    """
+    if not text or not re.search(r"\d", text):
+        return None
+    t = text.lower()
+    # word -> symbol map
+    words = {
+        r"plus": "+",
+        r"minus": "-",
+        r"times|multiplied by|multiply by": "*",
+        r"x\b": "*",
+        r"divided by|over|divide by": "/",
+        r"what is|what's|calculate|compute|=": "",
+        r"\?": "",
+    }
+    for pat, rep in words.items():
+        t = re.sub(pat, rep, t)
+    # keep only digits, whitespace and arithmetic symbols/parentheses/dot
+    m = re.search(r"[0-9\s\+\-\*\/\(\)\.]+", t)
+    if not m:
+        return None
+    expr = m.group(0).strip()
+    # quick sanity: must contain at least one operator
+    if not re.search(r"[\+\-\*\/]", expr):
+        return None
+    return expr
+
+
+def legacy_eval(expr: str) -> float | int:
+    """Safely evaluate a simple arithmetic expression using ast parsing.
+
+    Allows only numeric constants and + - * / and parentheses.
+    Raises ValueError on disallowed nodes or parse errors.
+    """
+    node = ast.parse(expr, mode='eval')
+
+    def _eval(n):
+        if isinstance(n, ast.Expression):
+            return _eval(n.body)
+        if isinstance(n, ast.Constant):
+            if isinstance(n.value, (int, float)):
+                return n.value
+            raise ValueError("Invalid constant")
+        if isinstance(n, ast.BinOp):
+            left = _eval(n.left)
+            right = _eval(n.right)
+            if isinstance(n.op, ast.Add):
+                return left + right
+            if isinstance(n.op, ast.Sub):
+                return left - right
+            if isinstance(n.op, ast.Mult):
+                return left * right
+            if isinstance(n.op, ast.Div):
+                return left / right
+            raise ValueError("Operator not allowed")
+        if isinstance(n, ast.UnaryOp) and isinstance(n.op, (ast.UAdd, ast.USub)):
+            val = _eval(n.operand)
+            return +val if isinstance(n.op, ast.UAdd) else -val
+        # disallow everything else
+        raise ValueError("Disallowed expression")
+
+    return _eval(node)
+
+
+def legacy_answer(message):
+    expr = legacy_extract(message)
+    if expr:
+        try:
+            return legacy_eval(expr)
+        except Exception:
+            pass
+    return None
+
+
+def answer(message):
+    expr = calculator.extract_expression(message)
+    if expr:
+        try:
+            return calculator.evaluate(expr)
+        except calculator.CalculatorError:
+            pass
+    return None
+
+
+def main():
+    args = [(m,) for m in CORPUS]
+    # The new extractor also finds expressions after leading words ("help me with 15 - 7").
+    for m in CORPUS:
+        if legacy_answer(m) is not None:
+            assert legacy_answer(m) == answer(m), m
+    report('legacy extract (7x re.sub)', measure(legacy_extract, args))
+    report('compiled extract', measure(calculator.extract_expression, args))
+    exprs = [(e,) for e in filter(None, map(calculator.extract_expression, CORPUS))]
+    report('legacy eval (ast.parse)', measure(legacy_eval, exprs))
+    report('Pratt evaluate', measure(calculator.evaluate, exprs))
+    report('legacy end-to-end', measure(legacy_answer, args))
+    report('compiled end-to-end', measure(answer, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""Lesson pack loading: cached catalog hits, caller-owned dict copies, cold parses and memory per locale."""
+from benchmarks.common import measure, report, setup_django
+
+setup_django()
+
+from school.services import lessons  # noqa: E402
+from school.services.catalog import footprint  # noqa: E402
+from school.services.payloads import catalog_json_payload  # noqa: E402
+
+PACKS = [(subject, grade, locale) for locale in ('en', 'es') for subject in ('math', 'english') for grade in (1, 2, 3)]
+
+
+def cold_load(subject, grade, locale):
+    return lessons._read_catalog(lessons.lesson_pack_path(subject, grade, locale))
+
+
+def api_payload(subject, grade, locale):
+    return catalog_json_payload(lessons.load_catalog(subject, grade, locale))
+
+
+def main():
+    report('load_catalog (cached)', measure(lessons.load_catalog, PACKS))
+    report('load_lesson_pack (cached + dict copy)', measure(lessons.load_lesson_pack, PACKS))
+    report('cold parse (read + LessonCatalog)', measure(cold_load, PACKS))
+    report('api/lessons payload (cached)', measure(api_payload, PACKS))
+    # What each locale adds on top of the ones before it (shared objects count once).
+    catalogs = [cold_load(*pack) for pack in PACKS]
+    seen = set()
+    for locale in ('en', 'es'):
+        size = sum(footprint(c, seen) for c in catalogs if c.locale == locale)
+        print(f"catalog footprint, locale {locale:<3} {size / 1024:9.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
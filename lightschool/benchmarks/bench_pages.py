@@ -0,0 +1,50 @@
+"""Render time of the lesson, quiz and unit list pages: full template render vs. the fragment cache."""
+from django.test import RequestFactory
+
+from benchmarks.common import measure, report, setup_django
+
+setup_django()
+
+from django.shortcuts import render  # noqa: E402
+
+from school import views  # noqa: E402
+from school.services.catalog import UnitProgress  # noqa: E402
+from school.services.fragments import fragment_cache  # noqa: E402
+from school.services.lessons import load_catalog  # noqa: E402
+
+PAGES = [('math', 1, 'add_basics'), ('english', 2, None), ('math', 3, None)]
+
+
+def make_request():
+    request = RequestFactory().get('/')
+    request.session = {'django_language': 'en'}
+    return request
+
+
+def full_render(request, subject, grade, unit_id):
+    """What the views did before: render every page from scratch."""
+    catalog = load_catalog(subject, grade, 'en')
+    unit = catalog.get_unit(unit_id) if unit_id else catalog.units[0]
+    context = {'subject': subject, 'grade': grade, 'locale': 'en'}
+    render(request, 'lesson.html', dict(context, unit=unit))
+    render(request, 'quiz.html', dict(context, unit=unit, next_unit_id=None))
+    units = [UnitProgress(u, {}) for u in catalog.units]
+    render(request, 'subject_grade.html', dict(context, units=units))
+
+
+def cached_render(request, subject, grade, unit_id):
+    unit_id = unit_id or load_catalog(subject, grade, 'en').units[0].id
+    views.lesson(request, subject, grade, unit_id)
+    views.quiz(request, subject, grade, unit_id)
+    views.subject_grade(request, subject, grade)
+
+
+def main():
+    args = [(make_request(), *page) for page in PAGES]
+    report('full template render (3 pages)', measure(full_render, args))
+    report('fragment cache (3 pages)', measure(cached_render, args))
+    print('fragment cache:', fragment_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Query latency of the lesson retrieval index (BM25 over cards and quiz explanations)."""
+import time
+
+from benchmarks.common import measure, report, setup_django
+
+setup_django()
+
+from school.services import tutor  # noqa: E402
+from school.services.retrieval import lesson_index  # noqa: E402
+
+QUERIES = [
+    ('What is addition?', 'math', 'en', 1),
+    ('how do I subtract big numbers', 'math', 'en', 2),
+    ('what does borrow mean', 'math', 'en', 2),
+    ('what are nouns', 'english', 'en', 1),
+    ('Can you explain adjectives to me please?', 'english', 'en', 3),
+    ('¿Qué es una resta?', 'math', 'es', 1),
+    ('i am stuck on this one', 'math', 'en', 1),
+]
+
+
+def main():
+    start = time.perf_counter()
+    lesson_index.refresh(force=True)
+    print(f"index build: {(time.perf_counter() - start) * 1000:.1f} ms {lesson_index.stats()}")
+    report('lesson_index.search (top 3)', measure(lesson_index.search, QUERIES))
+    offline = [(q, subject, grade, locale) for q, subject, locale, grade in QUERIES]
+    report('tutor.get_offline_reply', measure(tutor.get_offline_reply, offline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Per-call latency of the tutor rule fallback: compiled engine vs. per-call file load."""
+import random
+
+from benchmarks.common import measure, report, setup_django
+
+setup_django()
+
+from school.services import tutor  # noqa: E402
+
+MESSAGES = [
+    ('What is addition?', 'math', 1, 'en'),
+    ('How do I subtract big numbers', 'math', 2, 'en'),
+    ('i am stuck on this one', 'math', 1, 'en'),
+    ('what are nouns', 'english', 1, 'en'),
+    ('Can you explain adjectives to me please?', 'english', 3, 'en'),
+    ('¿Qué es una resta?', 'math', 1, 'es'),
+    ('ayúdame con la multiplicación', 'math', 3, 'es'),
+    ('hello lumi', 'math', 1, 'en'),
+]
+
+
+def legacy_rule_reply(message, subject, grade, locale):
+    """The original implementation: reload the JSON and match the first word."""
+    rules = tutor.load_tutor_rules()
+    loc_rules = rules.get(locale, {})
+    words = message.lower().split()
+    key = f"{subject}:{words[0]}" if words else None
+    if key in loc_rules:
+        return random.choice(loc_rules[key])
+    return None
+
+
+def main():
+    report('legacy (load JSON + first word)', measure(legacy_rule_reply, MESSAGES))
+    report('compiled rule engine', measure(tutor.get_rule_based_reply, MESSAGES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import os
+import statistics
+import time
+
+import django
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lightschool.settings')
+    django.setup()
+
+
+def measure(func, args_list, repeat=5, min_time=0.2):
+    """Time ``func(*args)`` over ``args_list``; return per-call microseconds.
+
+    Each round loops over the inputs until ``min_time`` has elapsed; the
+    result holds the best and median round, which are less noisy than a
+    single long run.
+    """
+    rounds = []
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            for args in args_list:
+                func(*args)
+            calls += len(args_list)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rounds.append(elapsed / calls * 1e6)
+    return {'best_us': min(rounds), 'median_us': statistics.median(rounds), 'calls': calls}
+
+
+# Every reported result, by name; benchmarks.run saves these as JSON.
+RESULTS = {}
+
+
+def report(name, result):
+    RESULTS[name] = result
+    print(f"{name:<40} best {result['best_us']:9.2f} us/call   median {result['median_us']:9.2f} us/call")
@@ -0,0 +1,197 @@
+"""Concurrent load driver for the LightSchool HTTP endpoints.
+
+Serves the Django app in-process on a threaded WSGI server (or targets
+``--url``), points the tutor at a local stub of the chat completions API,
+and runs each scenario for a fixed time with ``concurrency`` client
+threads. Reports throughput and p50/p95/p99 latency per scenario.
+
+The app runs against a throwaway SQLite database, session directory and
+audit log, so nothing in the project tree is touched.
+
+    python -m benchmarks.load --duration 5 --concurrency 8
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.common import setup_django
+
+TUTOR_QUESTIONS = [
+    'What is addition?', 'what are nouns', 'How do I subtract big numbers',
+    'Can you explain adjectives to me please?', 'what is a verb',
+]
+
+
+def _tutor(message, path='/api/tutor/'):
+    return 'POST', path, {'message': message, 'subject': 'math', 'grade': 1, 'locale': 'en'}
+
+
+# name -> function(i) returning (method, path, JSON body or None)
+SCENARIOS = {
+    'api_lessons': lambda i: ('GET', f'/api/lessons/?subject=math&grade={i % 3 + 1}&locale=en', None),
+    'lessons_batch': lambda i: ('GET', f'/api/lessons/batch/?grade={i % 3 + 1}&locale=en', None),
+    'sync_manifest': lambda i: ('GET', '/api/sync/manifest/', None),
+    'lesson_page': lambda i: ('GET', '/lesson/math/1/add_basics/', None),
+    'quiz_page': lambda i: ('GET', '/quiz/math/1/add_basics/', None),
+    'subject_grade_page': lambda i: ('GET', f'/subject/math/grade/{i % 3 + 1}/', None),
+    'progress_set': lambda i: ('POST', '/api/progress/set/', {
+        'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed', 'score': i % 100}),
+    'quiz_submit': lambda i: ('POST', '/api/quiz/submit/', {
+        'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'answers': {'q1': i % 3, 'q2': 1}}),
+    'tutor_calculator': lambda i: _tutor(f'What is {i % 50} + {i % 7}?'),
+    'tutor_cached': lambda i: _tutor(TUTOR_QUESTIONS[i % len(TUTOR_QUESTIONS)]),
+    # A new question every time, so each request reaches the (stub) AI.
+    'tutor_ai': lambda i: _tutor(f'Why is the number {i} special?'),
+    'tutor_stream': lambda i: _tutor(f'Tell me a fact about {i} apples', path='/api/tutor/stream/'),
+}
+
+
+def prepare_environment(workdir, stub_url=None):
+    """Point settings at throwaway state before the app modules are imported."""
+    if stub_url:
+        os.environ['OPENAI_URL'] = stub_url
+        os.environ['OPENAI_API_KEY'] = 'benchmark'
+    setup_django()
+    from django.conf import settings
+    from django.core.management import call_command
+
+    settings.DEBUG = False
+    settings.DATABASES['default']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+    settings.SESSION_FILE_PATH = os.path.join(workdir, 'sessions')
+    settings.TUTOR_AUDIT_LOG_PATH = os.path.join(workdir, 'tutor_audit.jsonl')
+    # Each client thread is one session asking far more than a learner would;
+    # without this the AI scenarios would mostly measure rate-limited replies.
+    settings.TUTOR_AI_RATE_PER_MINUTE = 0
+    os.makedirs(settings.SESSION_FILE_PATH, exist_ok=True)
+    call_command('migrate', verbosity=0)
+
+
+def serve_app():
+    """Start the Django WSGI app on a free port; return (server, base URL)."""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        # wsgiref writes headers and body separately; with Nagle on, keep-alive
+        # requests stall ~40 ms on the client's delayed ACK.
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=True)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_scenario(base_url, make_request, concurrency=8, duration=5.0, warmup=0.5):
+    """Hammer one scenario; return throughput, error count and latency percentiles (ms)."""
+    counter = itertools.count()
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def worker(slot):
+        session = requests.Session()
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            method, path, body = make_request(next(counter))
+            t0 = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=30)
+                response.content  # read streamed bodies to the end
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - t0
+            if t0 >= start_at:
+                latencies[slot].append(elapsed)
+                errors[slot] += failed
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    samples = sorted(itertools.chain.from_iterable(latencies))
+    ms = [s * 1000 for s in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(errors),
+        'rps': round(len(samples) / duration, 1),
+        'mean_ms': round(statistics.fmean(ms), 3) if ms else None,
+        'p50_ms': percentile(ms, 50) and round(percentile(ms, 50), 3),
+        'p95_ms': percentile(ms, 95) and round(percentile(ms, 95), 3),
+        'p99_ms': percentile(ms, 99) and round(percentile(ms, 99), 3),
+        'concurrency': concurrency,
+    }
+
+
+def report_load(name, result):
+    print(f"{name:<20} {result['rps']:9.1f} req/s   p50 {result['p50_ms'] or 0:8.2f} ms   "
+          f"p95 {result['p95_ms'] or 0:8.2f} ms   p99 {result['p99_ms'] or 0:8.2f} ms   "
+          f"errors {result['errors']}")
+
+
+def run_load(scenarios=None, concurrency=8, duration=5.0, url=None, ai_delay=0.05):
+    """Run the load scenarios; return {scenario: result}."""
+    from benchmarks.stub_openai import StubOpenAI
+
+    stub = StubOpenAI(delay=ai_delay).start()
+    workdir = tempfile.TemporaryDirectory()
+    server = None
+    try:
+        base_url = url
+        if base_url is None:
+            prepare_environment(workdir.name, stub.url)
+            server, base_url = serve_app()
+        results = {}
+        for name in scenarios or SCENARIOS:
+            results[name] = run_scenario(base_url, SCENARIOS[name], concurrency, duration)
+            report_load(name, results[name])
+        print(f"stub AI calls: {stub.calls}")
+        return results
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        stub.stop()
+        workdir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--ai-delay', type=float, default=0.05, help='stub AI response time in seconds')
+    parser.add_argument('--url', help='benchmark a running server instead (its OPENAI_URL is not changed)')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+    results = run_load(args.scenario, args.concurrency, args.duration, args.url, args.ai_delay)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'load': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
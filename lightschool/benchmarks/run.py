@@ -0,0 +1,99 @@
+"""Run the microbenchmarks, the load test and/or the startup benchmark and save the results as JSON.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --micro --compare results.json
+    python -m benchmarks.run --load --duration 10 --concurrency 16
+    python -m benchmarks.run --startup
+
+With none of ``--micro``, ``--load`` and ``--startup`` all of them are run. ``--compare`` prints
+each result next to a previously saved file, with the relative change.
+"""
+import argparse
+import importlib
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+from benchmarks import common
+
+MICRO_MODULES = ['bench_calculator', 'bench_rules', 'bench_lessons', 'bench_pages', 'bench_retrieval']
+
+
+def run_micro(modules=MICRO_MODULES):
+    for name in modules:
+        print(f'== {name}')
+        importlib.import_module(f'benchmarks.{name}').main()
+    return dict(common.RESULTS)
+
+
+def compare(results, baseline):
+    """Print each metric next to the baseline; lower is better for all of them but rps."""
+    for section, entries in results.items():
+        for name, values in entries.items():
+            old = baseline.get(section, {}).get(name)
+            if not old:
+                continue
+            # For load results compare the tail as well as throughput.
+            if section == 'load':
+                keys = ('rps', 'p95_ms')
+            elif section == 'startup':
+                keys = ('boot_ms', 'import_ms') if 'boot_ms' in values else ('median_us', 'overhead_us')
+            else:
+                keys = ('median_us',)
+            for key in keys:
+                before, after = old.get(key), values.get(key)
+                if not before or after is None:
+                    continue
+                change = (after - before) / before * 100
+                print(f'{section}:{name:<36} {key:<10} {before:10.2f} -> {after:10.2f}  ({change:+.1f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LightSchool benchmark runner')
+    parser.add_argument('--micro', action='store_true', help='run the microbenchmarks')
+    parser.add_argument('--load', action='store_true', help='run the HTTP load test')
+    parser.add_argument('--startup', action='store_true',
+                        help='run the cold-start benchmark (imports, boot, middleware per profile)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per load scenario')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results file to compare against')
+    args = parser.parse_args()
+    run_all = not (args.micro or args.load or args.startup)
+
+    results = {}
+    if args.load or run_all:
+        # First: the tutor reads OPENAI_URL when it is imported, and the
+        # load test has to point it at the stub before anything else does.
+        from benchmarks.load import run_load
+        print('== load')
+        results['load'] = run_load(concurrency=args.concurrency, duration=args.duration)
+    if args.micro or run_all:
+        results['micro'] = run_micro()
+    if args.startup or run_all:
+        # Fresh interpreters, so this does not depend on what was imported above.
+        from benchmarks.startup import run_startup
+        print('== startup')
+        results['startup'] = run_startup()
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+    if args.output:
+        document = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+            },
+            **results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+        print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Cold-start cost of each deployment profile: imports, boot time and middleware overhead.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --profile kiosk --repeat 5
+
+Every measurement runs in a fresh interpreter started with ``-X importtime``
+and ``LIGHTSCHOOL_PROFILE`` set. It sets up Django, loads the WSGI app and
+serves one request; the time from launch to that response is the boot
+time, and the import time is the sum of the modules imported until then.
+Bytecode goes to a temporary cache that an untimed first run fills, as a
+deployed worker's would be.
+
+A separate child per profile then times cheap requests through the
+profile's middleware and through none, in alternating rounds so that
+drift in machine load cancels out; the median difference is the
+per-request middleware overhead.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import RESULTS, setup_django
+
+PROFILES = ['full', 'kiosk']
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOOTED = '# booted'
+
+# name -> (path, query string) of the requests timed through the middleware
+REQUESTS = {
+    'api_lessons': ('/api/lessons/', 'subject=math&grade=1&locale=en'),
+    'home_page': ('/', ''),
+}
+
+
+def _environ(path, query):
+    return {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    }
+
+
+def _serve(handler, path, query):
+    response = handler(_environ(path, query), lambda status, headers: None)
+    response.close()
+    return response.status_code
+
+
+def time_requests(handler, bare, path, query, rounds=21, calls=100):
+    """(median us/request through ``handler``, median extra us/request over ``bare``)."""
+    totals, extra = [], []
+    for _ in range(rounds):
+        timings = []
+        for app in (handler, bare):
+            start = time.perf_counter()
+            for _ in range(calls):
+                _serve(app, path, query)
+            timings.append((time.perf_counter() - start) / calls * 1e6)
+        totals.append(timings[0])
+        extra.append(timings[0] - timings[1])
+    return statistics.median(totals), statistics.median(extra)
+
+
+def child(mode):
+    """Runs in the measured interpreter; prints its results as JSON."""
+    setup_django()
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.wsgi import get_wsgi_application
+
+    settings.DEBUG = False
+    handler = get_wsgi_application()
+    status = _serve(handler, *REQUESTS['api_lessons'])
+    booted = time.time()
+    sys.stderr.write(BOOTED + '\n')
+    result = {'profile': getattr(settings, 'DEPLOYMENT_PROFILE', 'full'), 'status': status,
+              'boot_ms': (booted - float(os.environ['BENCH_STARTED'])) * 1000}
+    if mode == 'requests':
+        settings.MIDDLEWARE = []
+        bare = WSGIHandler()
+        for path, query in REQUESTS.values():
+            _serve(handler, path, query)  # first renders fill the template and fragment caches
+            _serve(bare, path, query)
+        result['requests'] = {name: time_requests(handler, bare, path, query)
+                              for name, (path, query) in REQUESTS.items()}
+    print(json.dumps(result))
+
+
+def parse_importtime(output):
+    """(total ms, {top-level module: cumulative ms}) for the imports before the boot marker."""
+    total = 0
+    top = {}
+    for line in output.splitlines():
+        if line == BOOTED:
+            break
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue  # the header line
+        total += int(own)
+        if not name.startswith('  '):
+            top[name.strip()] = top.get(name.strip(), 0) + int(cumulative) / 1000
+    return total / 1000, top
+
+
+def run_child(profile, mode, pycache):
+    env = dict(os.environ, LIGHTSCHOOL_PROFILE=profile, PYTHONPYCACHEPREFIX=pycache,
+               BENCH_STARTED=repr(time.time()))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'benchmarks.startup', '--child', mode],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    if result['profile'] != profile or result['status'] != 200:
+        raise RuntimeError(f'{profile} child failed: {result}')
+    result['import_ms'], result['modules'] = parse_importtime(proc.stderr)
+    return result
+
+
+def report_startup(name, result):
+    RESULTS[name] = result
+    if 'boot_ms' in result:
+        print(f"{name:<40} boot {result['boot_ms']:8.1f} ms   imports {result['import_ms']:8.1f} ms")
+    else:
+        print(f"{name:<40} {result['median_us']:9.2f} us/request   "
+              f"middleware {result['overhead_us']:8.2f} us/request")
+
+
+def run_startup(profiles=PROFILES, repeat=5):
+    results = {}
+    with tempfile.TemporaryDirectory() as pycache:
+        for profile in profiles:
+            run_child(profile, 'boot', pycache)  # compiles the bytecode; not timed
+        boots = {profile: [] for profile in profiles}
+        for _ in range(repeat):
+            for profile in profiles:
+                boots[profile].append(run_child(profile, 'boot', pycache))
+        for profile, runs in boots.items():
+            results[f'startup.{profile}'] = {
+                'boot_ms': statistics.median(run['boot_ms'] for run in runs),
+                'import_ms': statistics.median(run['import_ms'] for run in runs),
+            }
+            report_startup(f'startup.{profile}', results[f'startup.{profile}'])
+            slowest = sorted(runs[0]['modules'].items(), key=lambda item: -item[1])[:5]
+            print('    ' + ', '.join(f'{module} {ms:.1f}' for module, ms in slowest))
+        for profile in profiles:
+            timings = run_child(profile, 'requests', pycache)['requests']
+            for name, (total, overhead) in timings.items():
+                key = f'middleware.{profile}.{name}'
+                results[key] = {'median_us': total, 'overhead_us': overhead}
+                report_startup(key, results[key])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LightSchool cold-start benchmark')
+    parser.add_argument('--profile', action='append', choices=PROFILES,
+                        help='deployment profile to measure (repeatable; default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per profile')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--child', choices=['boot', 'requests'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+    results = run_startup(args.profile or PROFILES, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Local stand-in for the chat completions API, with a configurable response delay."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = 'Addition means putting numbers together!'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length))
+        self.server.calls += 1
+        if request.get('stream'):
+            self._stream()
+            return
+        time.sleep(self.server.delay)
+        content = json.dumps({'answer': ANSWER})
+        body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': content}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        words = ANSWER.split(' ')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        # Spread the delay over the tokens, like a model generating them.
+        for word in words:
+            time.sleep(self.server.delay / len(words))
+            chunk = {'choices': [{'delta': {'content': word + ' '}}]}
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubOpenAI:
+    """Runs the stub on a free local port in a background thread."""
+
+    def __init__(self, delay=0.05):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.delay = delay
+        self.httpd.calls = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}/v1/chat/completions'
+
+    @property
+    def calls(self):
+        return self.httpd.calls
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,36 @@
+"""Gunicorn settings for pre-fork serving (``gunicorn -c gunicorn.conf.py``).
+
+The app is imported once in the master, and its WSGI/ASGI module runs the
+warm-up in 'prefork' mode: lesson packs, tutor rules and the lesson index
+are loaded and validated, then frozen out of the garbage collector before
+the workers are forked, so every worker shares that memory copy-on-write and serves its first request
+warm. A bad lesson pack stops the master before any worker starts. Tutor
+backends with worker threads (the local model) are started in each worker
+after the fork.
+
+Workers serve the WSGI app on ``GUNICORN_THREADS`` threads, and the tutor
+answers on the request's thread through one connection pool per worker.
+``GUNICORN_ASGI=1`` serves the ASGI app on uvicorn workers instead
+(``pip install uvicorn httpx``), so a worker's slow AI replies wait on its
+one event loop rather than holding threads.
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lightschool.settings')
+os.environ.setdefault('LIGHTSCHOOL_WARMUP', 'prefork')
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+if os.getenv('GUNICORN_ASGI') == '1':
+    wsgi_app = 'lightschool.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'lightschool.wsgi:application'
+    threads = int(os.getenv('GUNICORN_THREADS', '4'))
+preload_app = True
+
+
+def post_fork(server, worker):
+    from school.services.tutor import start_backends
+
+    start_backends()
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'school.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -69,6 +73,32 @@ TEMPLATES = [
     },
 ]
 
+# Deployment profile: 'full', or 'kiosk' for autoscaled workers that only serve the school
+# pages and API. 'kiosk' leaves out the admin, auth and messages apps and the CSRF, auth and
+# messages middleware, so workers import less at startup and run less per request. Nothing
+# the school serves uses users or messages, the API views are csrf_exempt, and the one other
+# POST (set_lang) only changes the session's language.
+DEPLOYMENT_PROFILE = os.getenv('LIGHTSCHOOL_PROFILE', 'full')
+if DEPLOYMENT_PROFILE == 'kiosk':
+    INSTALLED_APPS = [
+        'django.contrib.staticfiles',
+        'school',
+    ]
+    MIDDLEWARE = [
+        'school.middleware.MetricsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.locale.LocaleMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ]
+    TEMPLATES[0]['OPTIONS']['context_processors'] = [
+        'django.template.context_processors.debug',
+        'django.template.context_processors.request',
+    ]
+elif DEPLOYMENT_PROFILE != 'full':
+    raise ImproperlyConfigured(f"LIGHTSCHOOL_PROFILE must be 'full' or 'kiosk', not {DEPLOYMENT_PROFILE!r}")
+
 WSGI_APPLICATION = 'lightschool.wsgi.application'
 
 
@@ -138,6 +168,76 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Session settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.file'
+SESSION_ENGINE = 'school.sessions'  # file-backed, with save times recorded for /metrics/
 SESSION_FILE_PATH = BASE_DIR / 'sessions'
-SESSION_COOKIE_AGE = 86400 * 30  # 30 days
\ No newline at end of file
+SESSION_COOKIE_AGE = 86400 * 30  # 30 days
+
+# Lesson pack cache
+LESSON_PACK_CACHE_SIZE = 64  # packs kept in memory per process
+LESSON_PACK_CHECK_INTERVAL = 2.0  # seconds between mtime checks of a cached pack, and between background rebuilds of the lesson index and sync manifest
+# Built by `python manage.py build_lesson_bundle`; when present it is served
+# instead of the JSON files, so rebuild it after editing lessons.
+LESSON_BUNDLE_PATH = BASE_DIR / 'lessons.bundle'
+
+# Startup warm-up (run by wsgi.py/asgi.py, not by management commands): load, validate and index every lesson pack and the
+# tutor rules before serving. 'off', 'on', or 'prefork', which also calls gc.freeze() so
+# workers forked from a preloading server (gunicorn.conf.py) share the data copy-on-write.
+WARMUP_MODE = os.getenv('LIGHTSCHOOL_WARMUP', 'off')
+WARMUP_WORKERS = 8  # threads loading packs in parallel
+WARMUP_STRICT = True  # refuse to start when a pack or the rules file is invalid
+
+# Tutor AI upstream
+TUTOR_AI_TIMEOUT = 10.0  # deadline per upstream call in seconds (sync calls: per connect/read)
+TUTOR_AI_MAX_CONCURRENCY = 32  # in-flight upstream calls per process, enforced by the tutor's admission gate
+TUTOR_AI_POOL_SIZE = 32  # keep-alive connections kept open to the upstream
+TUTOR_AI_QUEUE_SIZE = 16  # questions that may wait for a free upstream slot; the rest get offline replies
+TUTOR_AI_QUEUE_TIMEOUT = 1.0  # seconds a queued question waits before falling back
+TUTOR_AI_RATE_PER_MINUTE = 10  # AI questions per session (or per address, without one) per minute; 0 disables
+TUTOR_AI_BURST = 5  # AI questions a session may ask back to back
+TUTOR_AI_BREAKER_FAILURES = 5  # consecutive upstream failures that open the circuit breaker
+TUTOR_AI_BREAKER_RESET = 30.0  # seconds the breaker stays open before one trial call
+
+# Tutor backends, asked in order for questions the calculator and cache cannot answer:
+# 'openai' (the TUTOR_AI_* upstream), 'local' (on-CPU, no network) or a backend's dotted path.
+# Without a reply from any of them the tutor falls back to the rules and lessons.
+TUTOR_BACKENDS = ['openai']
+
+# Local tutor backend: a quantized GGUF chat model via llama-cpp-python when
+# TUTOR_LOCAL_MODEL_PATH is set, else short answers framed from lesson snippets.
+TUTOR_LOCAL_MODEL_PATH = os.getenv('TUTOR_LOCAL_MODEL_PATH')
+TUTOR_LOCAL_THREADS = None  # CPU threads per model; None lets llama.cpp decide
+TUTOR_LOCAL_MAX_TOKENS = 64  # bounds generation time per reply
+TUTOR_LOCAL_MIN_SCORE = 1.5  # BM25 score a lesson snippet needs for a template answer
+TUTOR_LOCAL_WORKERS = 1  # worker threads, each with its own loaded model
+TUTOR_LOCAL_BATCH_SIZE = 8  # questions a worker takes in one pass
+TUTOR_LOCAL_BATCH_WAIT = 0.01  # seconds a worker waits for a batch to fill
+TUTOR_LOCAL_QUEUE_SIZE = 64  # questions waiting for a worker; the rest get offline replies
+TUTOR_LOCAL_TIMEOUT = 3.0  # latency budget: seconds a question waits before falling back
+
+# Tutor reply cache: 'local' (per process) or 'django' (uses CACHES[TUTOR_CACHE_ALIAS])
+TUTOR_CACHE_BACKEND = 'local'
+TUTOR_CACHE_TTL = 3600  # seconds
+TUTOR_CACHE_MAX_ENTRIES = 2048  # local backend only
+TUTOR_CACHE_ALIAS = 'default'
+
+# Tutor rules
+TUTOR_RULES_CHECK_INTERVAL = 2.0  # seconds between mtime checks of tutor_rules.json
+
+# Tutor lesson retrieval (BM25 over lesson cards and quiz explanations)
+TUTOR_CONTEXT_SNIPPETS = 3  # lesson snippets sent to the AI with each question; 0 disables
+TUTOR_LESSON_MIN_SCORE = 2.0  # BM25 score a snippet needs to be used as an offline answer
+TUTOR_LESSON_MIN_MATCH = 0.6  # ...and the share of the question's words it must contain
+
+# Quizzes
+QUIZ_PASS_SCORE = 60  # percent needed for a submission to count as passed in analytics
+
+# Tutor audit log: JSON lines written by a background thread (None disables it)
+TUTOR_AUDIT_LOG_PATH = BASE_DIR / 'school' / 'logs' / 'tutor_audit.jsonl'
+TUTOR_AUDIT_MAX_BYTES = 10 * 1024 * 1024  # rotate to .1, .2, ... past this size
+TUTOR_AUDIT_BACKUP_COUNT = 5
+TUTOR_AUDIT_SAMPLE_RATE = 1.0  # share of request/response records kept; errors are always kept
+TUTOR_AUDIT_BATCH_SIZE = 256  # records per write
+TUTOR_AUDIT_FLUSH_INTERVAL = 1.0  # seconds the writer waits for more records
+
+# Metrics: latency histograms and cache counters served at /metrics/
+METRICS_ENABLED = True
@@ -14,14 +14,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.i18n import i18n_patterns
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
-]
+urlpatterns = []
+
+# Not installed in the kiosk profile (settings.DEPLOYMENT_PROFILE).
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
 
 urlpatterns += i18n_patterns(
     path('', include('school.urls')),
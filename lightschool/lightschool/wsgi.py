@@ -13,4 +13,9 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lightschool.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Only server processes import this module, so only they warm up (see WARMUP_MODE).
+from school.services.warmup import warm_up_server  # noqa: E402
+
+warm_up_server()
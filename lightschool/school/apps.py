@@ -3,4 +3,4 @@ from django.apps import AppConfig
 
 class SchoolConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'school'
\ No newline at end of file
+    name = 'school'
@@ -0,0 +1,46 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from school.services.bundle import LessonBundle, bundle_key, write_bundle
+from school.services.catalog import LessonCatalog, content_hash
+from school.services.lessons import iter_lesson_pack_files, validate_lesson_pack
+from school.services.payloads import catalog_json_body
+
+
+class Command(BaseCommand):
+    help = "Validate every lesson pack and compile them into one memory-mappable bundle file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=getattr(settings, 'LESSON_BUNDLE_PATH', None),
+            help="Bundle path (defaults to settings.LESSON_BUNDLE_PATH).",
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output:
+            raise CommandError("No output path: pass --output or set LESSON_BUNDLE_PATH.")
+        packs = {}
+        errors = []
+        for locale, subject, grade, path in iter_lesson_pack_files():
+            raw = path.read_bytes()
+            try:
+                data = json.loads(raw)
+                validate_lesson_pack(data)
+                # Missing keys and mis-typed units, cards or questions only show up here.
+                catalog = LessonCatalog(data, version=content_hash(raw))
+            except (KeyError, TypeError, ValueError) as e:
+                errors.append(f"{path}: {e!r}")
+                continue
+            packs[bundle_key(subject, grade, locale)] = (catalog_json_body(catalog), catalog.version)
+        if errors:
+            raise CommandError("Invalid lesson packs:\n" + "\n".join(errors))
+        write_bundle(output, packs)
+        # Re-open to make sure the file we just wrote is readable.
+        check = LessonBundle(output)
+        count = len(check)
+        check.close()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} lesson packs to {output}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from school.services.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = "Load, validate and index every lesson pack and the tutor rules; report time and memory per locale."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Threads loading packs in parallel.")
+
+    def handle(self, *args, **options):
+        report = warm_up(workers=options['workers'])
+        self.stdout.write(report.summary())
+        if report.errors:
+            raise CommandError(f"{len(report.errors)} invalid lesson data file(s)")
+        self.stdout.write(self.style.SUCCESS("All lesson data is valid"))
@@ -0,0 +1,45 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .services.metrics import REQUEST_SECONDS
+
+# Methods recorded by name; anything else a client sends is counted as 'other'.
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+class MetricsMiddleware:
+    """Records each request's latency by view name, method and status class.
+
+    Put it first in MIDDLEWARE so the time includes the other middleware.
+    For streaming responses it measures the time until the response starts.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        _record(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        _record(request, response, start)
+        return response
+
+
+def _record(request, response, start):
+    match = request.resolver_match
+    view = match.view_name if match is not None else 'unresolved'
+    method = request.method if request.method in METHODS else 'other'
+    REQUEST_SECONDS.labels(view, method, f'{response.status_code // 100}xx').observe(
+        time.perf_counter() - start)
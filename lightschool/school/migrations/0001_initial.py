@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Progress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('learner', models.CharField(max_length=32)),
+                ('locale', models.CharField(max_length=10)),
+                ('subject', models.CharField(max_length=32)),
+                ('grade', models.PositiveSmallIntegerField()),
+                ('unit_id', models.CharField(max_length=64)),
+                ('status', models.CharField(max_length=20)),
+                ('score', models.IntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('learner', 'locale', 'subject', 'grade', 'unit_id'), name='progress_unique_unit')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='progress',
+            name='client_ts',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProgressEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('learner', models.CharField(max_length=32)),
+                ('key', models.CharField(max_length=64)),
+                ('applied_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('learner', 'key'), name='progress_event_unique_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0002_progress_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('locale', models.CharField(max_length=10)),
+                ('subject', models.CharField(max_length=32)),
+                ('grade', models.PositiveSmallIntegerField()),
+                ('unit_id', models.CharField(max_length=64)),
+                ('question_id', models.CharField(max_length=32)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('locale', 'subject', 'grade', 'unit_id', 'question_id'), name='question_stat_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submission', models.CharField(max_length=32)),
+                ('learner', models.CharField(max_length=32)),
+                ('locale', models.CharField(max_length=10)),
+                ('subject', models.CharField(max_length=32)),
+                ('grade', models.PositiveSmallIntegerField()),
+                ('unit_id', models.CharField(max_length=64)),
+                ('question_id', models.CharField(max_length=32)),
+                ('chosen', models.SmallIntegerField(blank=True, null=True)),
+                ('correct', models.BooleanField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['locale', 'subject', 'grade', 'unit_id'], name='quiz_attempt_unit')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UnitStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('locale', models.CharField(max_length=10)),
+                ('subject', models.CharField(max_length=32)),
+                ('grade', models.PositiveSmallIntegerField()),
+                ('unit_id', models.CharField(max_length=64)),
+                ('submissions', models.PositiveIntegerField(default=0)),
+                ('passed', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('locale', 'subject', 'grade', 'unit_id'), name='unit_stat_unique')],
+            },
+        ),
+    ]
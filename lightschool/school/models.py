@@ -0,0 +1,96 @@
+from django.db import models
+
+
+class Progress(models.Model):
+    """One learner's status and score for one unit."""
+
+    learner = models.CharField(max_length=32)  # anonymous id stored in the session
+    locale = models.CharField(max_length=10)
+    subject = models.CharField(max_length=32)
+    grade = models.PositiveSmallIntegerField()
+    unit_id = models.CharField(max_length=64)
+    status = models.CharField(max_length=20)
+    score = models.IntegerField(null=True, blank=True)
+    client_ts = models.DateTimeField(null=True, blank=True)  # when the client recorded the status
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also the index behind every lookup: learner, then locale/subject/grade prefixes.
+            models.UniqueConstraint(
+                fields=['learner', 'locale', 'subject', 'grade', 'unit_id'],
+                name='progress_unique_unit',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.learner} {self.locale}/{self.subject}/{self.grade}/{self.unit_id}: {self.status}'
+
+
+class ProgressEvent(models.Model):
+    """Idempotency keys of progress events already applied by a batch sync."""
+
+    learner = models.CharField(max_length=32)
+    key = models.CharField(max_length=64)
+    applied_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['learner', 'key'], name='progress_event_unique_key'),
+        ]
+
+
+class QuizAttempt(models.Model):
+    """One answered question in one quiz submission. Append-only, one flat row per answer."""
+
+    submission = models.CharField(max_length=32)
+    learner = models.CharField(max_length=32)
+    locale = models.CharField(max_length=10)
+    subject = models.CharField(max_length=32)
+    grade = models.PositiveSmallIntegerField()
+    unit_id = models.CharField(max_length=64)
+    question_id = models.CharField(max_length=32)
+    chosen = models.SmallIntegerField(null=True, blank=True)  # None when left blank
+    correct = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['locale', 'subject', 'grade', 'unit_id'], name='quiz_attempt_unit'),
+        ]
+
+
+class QuestionStat(models.Model):
+    """Running totals per question, updated on every submission."""
+
+    locale = models.CharField(max_length=10)
+    subject = models.CharField(max_length=32)
+    grade = models.PositiveSmallIntegerField()
+    unit_id = models.CharField(max_length=64)
+    question_id = models.CharField(max_length=32)
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['locale', 'subject', 'grade', 'unit_id', 'question_id'],
+                name='question_stat_unique',
+            ),
+        ]
+
+
+class UnitStat(models.Model):
+    """Running totals per unit quiz, updated on every submission."""
+
+    locale = models.CharField(max_length=10)
+    subject = models.CharField(max_length=32)
+    grade = models.PositiveSmallIntegerField()
+    unit_id = models.CharField(max_length=64)
+    submissions = models.PositiveIntegerField(default=0)
+    passed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['locale', 'subject', 'grade', 'unit_id'], name='unit_stat_unique'),
+        ]
@@ -0,0 +1,221 @@
+"""Admission control for upstream AI calls.
+
+Three independent checks run before the tutor asks the AI, and each one
+answers immediately; a request that fails any of them gets the offline
+reply instead:
+
+* ``RateLimiter``: a token bucket per session, so one learner mashing
+  "Send" cannot spend the whole class's upstream budget.
+* ``AdmissionGate``: a process-wide cap on in-flight calls with a small,
+  bounded wait queue. Past the queue, callers are turned away at once
+  rather than piling up behind slow upstream timeouts.
+* ``CircuitBreaker``: after repeated failures or timeouts the AI is skipped
+  entirely, with one trial call per cool-down to notice recovery.
+
+All three are thread-safe and do not depend on an event loop, so one
+instance serves the WSGI threads and every event loop in the process.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class RateLimiter:
+    """Token bucket per key: ``burst`` calls at once, refilled at ``rate`` per second.
+
+    Buckets for the least recently seen keys are dropped past ``max_keys``;
+    a dropped key simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def allow(self, key):
+        """Take a token for ``key``; False when its bucket is empty."""
+        if not self.rate or key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            admitted = tokens >= 1
+            if admitted:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        if admitted:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return admitted
+
+    def stats(self):
+        return {'allowed': self.allowed, 'limited': self.limited, 'sessions': len(self._buckets)}
+
+
+class _Waiter:
+    __slots__ = ('granted', 'wake')
+
+    def __init__(self, wake):
+        self.granted = False
+        self.wake = wake
+
+
+class AdmissionGate:
+    """At most ``limit`` holders; up to ``queue_size`` more wait ``queue_timeout`` for a slot.
+
+    ``acquire``/``aacquire`` return False instead of blocking when the queue
+    is full or the wait times out. A slot freed by ``release`` is handed
+    straight to the oldest waiter.
+    """
+
+    def __init__(self, limit, queue_size=0, queue_timeout=1.0):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _enter(self, make_wake):
+        """Take a free slot (None), queue a waiter (returned), or reject (False)."""
+        with self._lock:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                self.admitted += 1
+                return None
+            if len(self._waiters) >= self.queue_size:
+                self.rejected += 1
+                return False
+            waiter = _Waiter(make_wake())
+            self._waiters.append(waiter)
+            self.queued += 1
+            return waiter
+
+    def _give_up(self, waiter):
+        """After a timed-out wait: True if the slot arrived anyway and is kept."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            self.timed_out += 1
+            return False
+
+    def acquire(self):
+        """Take a slot, waiting at most ``queue_timeout``; False when turned away."""
+        waiter = self._enter(threading.Event)
+        if waiter is None or waiter is False:
+            return waiter is None
+        if waiter.wake.wait(self.queue_timeout):
+            return True
+        return self._give_up(waiter)
+
+    async def aacquire(self):
+        """Async ``acquire``: waits on the running loop without holding a thread."""
+        loop = asyncio.get_running_loop()
+        waiter = self._enter(loop.create_future)
+        if waiter is None or waiter is False:
+            return waiter is None
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.wake), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._give_up(waiter)
+        except asyncio.CancelledError:
+            if self._give_up(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            # The slot passes to the next waiter; in_flight is unchanged.
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.admitted += 1
+        wake = waiter.wake
+        if isinstance(wake, threading.Event):
+            wake.set()
+        else:
+            try:
+                wake.get_loop().call_soon_threadsafe(_resolve, wake)
+            except RuntimeError:
+                # The waiter's loop is already closed; pass the slot on.
+                self.release()
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'waiting': len(self._waiters),
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        }
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, ``allow`` lets one trial call through per ``reset_timeout``
+    seconds; a success closes the breaker, a failure keeps it open.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+        self.skipped = 0
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self.opened_at is not None and now - self.opened_at >= self.reset_timeout:
+                self.opened_at = now  # this caller is the trial; the next one waits again
+                return True
+        self.skipped += 1
+        return False
+
+    def record_success(self):
+        if self.failures or self.opened_at is not None:
+            with self._lock:
+                self.failures = 0
+                self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                self.opens += 1
+
+    def stats(self):
+        return {'open': int(self.is_open), 'failures': self.failures, 'opens': self.opens, 'skipped': self.skipped}
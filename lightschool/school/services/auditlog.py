@@ -0,0 +1,182 @@
+"""Queue-backed JSON-lines audit log.
+
+``AuditLog.log`` only samples and enqueues a tuple; a background thread
+serializes records in batches, writes each batch with one ``write`` call
+and rotates the file by size. When the queue is full, records are dropped
+and counted instead of blocking the request.
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+MAX_FIELD_CHARS = 2000
+
+_STOP = object()
+
+
+class AuditLog:
+    """Asynchronous JSON-lines writer with batching, size rotation and sampling.
+
+    ``sample_rate`` applies to records logged with ``sample=True`` (the
+    default); errors should pass ``sample=False`` so they are always kept.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5, sample_rate=1.0,
+                 batch_size=256, flush_interval=1.0, queue_size=10000):
+        self.path = os.fspath(path) if path else None
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.rotations = 0
+        self.rotation_errors = 0
+
+    def log(self, event, sample=True, **fields):
+        """Queue one record; never blocks and never raises."""
+        if self.path is None:
+            return
+        if sample and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait((time.time(), event, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        # Also runs after a fork: the parent's writer thread does not exist in the child.
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_size)
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='audit-log', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, q):
+        stream = self._open()
+        try:
+            while True:
+                try:
+                    batch = [q.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(q.get_nowait())
+                    except queue.Empty:
+                        break
+                records = [record for record in batch if record is not _STOP]
+                stop = len(records) < len(batch)
+                if records:
+                    stream = self._write(stream, records)
+                for _ in batch:
+                    q.task_done()
+                if stop:
+                    return
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            return open(self.path, 'a', encoding='utf-8')
+        except OSError:
+            return None
+
+    def _write(self, stream, records):
+        if stream is None:
+            stream = self._open()
+        try:
+            stream.write(''.join(_format(record) for record in records))
+            stream.flush()
+        except (AttributeError, OSError):
+            # No writable file (stream is None) or the write failed; keep going.
+            self.dropped += len(records)
+            return stream
+        self.written += len(records)
+        if self.max_bytes and stream.tell() >= self.max_bytes:
+            stream.close()
+            try:
+                self._rotate()
+            except OSError:
+                # Keep appending to the same file; the next write past max_bytes retries.
+                self.rotation_errors += 1
+            stream = self._open()
+        return stream
+
+    def _rotate(self):
+        """Shift path -> path.1 -> path.2 ..., dropping the oldest backup."""
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                older = f'{self.path}.{i}'
+                if os.path.exists(older):
+                    os.replace(older, f'{self.path}.{i + 1}')
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def flush(self):
+        """Block until everything queued so far is written (for tests and shutdown)."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        """Write what is queued and stop the writer thread."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._pid = None
+
+    def stats(self):
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'sampled_out': self.sampled_out,
+            'rotations': self.rotations,
+            'rotation_errors': self.rotation_errors,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+def _format(record):
+    ts, event, fields = record
+    entry = {'ts': datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec='milliseconds'), 'event': event}
+    for key, value in fields.items():
+        if isinstance(value, str) and len(value) > MAX_FIELD_CHARS:
+            value = value[:MAX_FIELD_CHARS] + '…'
+        entry[key] = value
+    return json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+
+
+audit_log = AuditLog(
+    getattr(settings, 'TUTOR_AUDIT_LOG_PATH', None),
+    max_bytes=getattr(settings, 'TUTOR_AUDIT_MAX_BYTES', 10 * 1024 * 1024),
+    backup_count=getattr(settings, 'TUTOR_AUDIT_BACKUP_COUNT', 5),
+    sample_rate=getattr(settings, 'TUTOR_AUDIT_SAMPLE_RATE', 1.0),
+    batch_size=getattr(settings, 'TUTOR_AUDIT_BATCH_SIZE', 256),
+    flush_interval=getattr(settings, 'TUTOR_AUDIT_FLUSH_INTERVAL', 1.0),
+)
+atexit.register(audit_log.close)
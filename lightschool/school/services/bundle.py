@@ -0,0 +1,73 @@
+"""Single-file lesson bundle: an offset table plus pre-encoded JSON per pack.
+
+Layout::
+
+    MAGIC (8 bytes) | index length (uint32, little endian) | index JSON | pack blobs
+
+The index maps ``"<locale>/<subject>/<grade>"`` to ``[offset, length, version]``
+with offsets measured from the end of the index. Bundles are written by
+``manage.py build_lesson_bundle`` and memory-mapped read-only by the server,
+so forked workers share the same pages.
+"""
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b'LSBNDL01'
+_HEADER = struct.Struct('<8sI')
+
+
+def bundle_key(subject, grade, locale):
+    return f'{locale}/{subject}/{grade}'
+
+
+def write_bundle(path, packs):
+    """Write ``packs`` ({key: (json_bytes, version)}) to ``path`` atomically."""
+    index = {}
+    offset = 0
+    for key, (body, version) in sorted(packs.items()):
+        index[key] = [offset, len(body), version]
+        offset += len(body)
+    index_bytes = json.dumps(index, sort_keys=True).encode('utf-8')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(index_bytes)))
+        f.write(index_bytes)
+        for key, (body, version) in sorted(packs.items()):
+            f.write(body)
+    os.replace(tmp_path, path)
+    return index
+
+
+class LessonBundle:
+    """Read-only, memory-mapped view of a lesson bundle file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_len = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a lesson bundle: {path}")
+        self._data_start = _HEADER.size + index_len
+        self.index = json.loads(self._map[_HEADER.size:self._data_start])
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, key):
+        """Return (json bytes, version) for ``key``, or None."""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, length, version = entry
+        start = self._data_start + offset
+        return self._map[start:start + length], version
+
+    def close(self):
+        self._map.close()
@@ -0,0 +1,157 @@
+"""Fast, bounded arithmetic for the tutor's calculator short-circuit.
+
+``extract_expression`` turns a kid's question ("what is 3 times 4?") into an
+expression string with one precompiled substitution pass; ``evaluate`` runs
+a single-pass tokenizer and a small Pratt parser over ``+ - * /`` and
+parentheses. Limits on expression length, operand size, nesting depth and
+result magnitude keep the worst case cheap no matter what is typed.
+"""
+import re
+
+MAX_EXPRESSION_LENGTH = 120
+MAX_OPERAND_DIGITS = 12
+MAX_DEPTH = 16
+MAX_MAGNITUDE = 10 ** 15
+
+
+class CalculatorError(ValueError):
+    """The expression is malformed or outside the calculator's limits."""
+
+
+# Word -> symbol replacements, applied in a single pass.
+_WORDS = {
+    'plus': '+',
+    'minus': '-',
+    'times': '*',
+    'multiplied by': '*',
+    'multiply by': '*',
+    'x': '*',
+    'divided by': '/',
+    'divide by': '/',
+    'over': '/',
+    'what is': '',
+    "what's": '',
+    'calculate': '',
+    'compute': '',
+    '=': '',
+    '?': '',
+}
+_WORDS_RE = re.compile(
+    r"multiplied by|multiply by|divided by|divide by|what is|what's|"
+    r"plus|minus|times|over|calculate|compute|x\b|=|\?"
+)
+_DIGIT_RE = re.compile(r"\d")
+# Runs of expression characters that contain at least one digit.
+_EXPR_RE = re.compile(r"[\s(+\-]*\.?\d[0-9\s+\-*/().]*")
+_OPERATOR_RE = re.compile(r"[+\-*/]")
+_TOKEN_RE = re.compile(r"(\d+\.\d*|\.\d+|\d+)|(\S)")
+_SYMBOLS = frozenset('+-*/()')
+
+_BINARY_POWER = {'+': 10, '-': 10, '*': 20, '/': 20}
+_UNARY_POWER = 30
+
+
+def extract_expression(text):
+    """Return the arithmetic expression in ``text``, or None if there isn't one."""
+    if not text or not _DIGIT_RE.search(text):
+        return None
+    t = _WORDS_RE.sub(lambda m: _WORDS[m.group(0)], text.lower())
+    m = _EXPR_RE.search(t)
+    if not m:
+        return None
+    expr = m.group(0).strip()
+    # quick sanity: must contain at least one operator
+    if not _OPERATOR_RE.search(expr) or len(expr) > MAX_EXPRESSION_LENGTH:
+        return None
+    return expr
+
+
+def _tokenize(expr):
+    tokens = []
+    for number, symbol in _TOKEN_RE.findall(expr):
+        if number:
+            if '.' in number:
+                if len(number) - 1 > MAX_OPERAND_DIGITS:
+                    raise CalculatorError("Operand too large")
+                tokens.append(float(number))
+            else:
+                if len(number) > MAX_OPERAND_DIGITS:
+                    raise CalculatorError("Operand too large")
+                tokens.append(int(number))
+        elif symbol in _SYMBOLS:
+            tokens.append(symbol)
+        else:
+            raise CalculatorError(f"Unexpected character: {symbol!r}")
+    return tokens
+
+
+class _Parser:
+    __slots__ = ('tokens', 'pos')
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def _next(self):
+        if self.pos >= len(self.tokens):
+            raise CalculatorError("Unexpected end of expression")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def parse(self, min_power=0, depth=0):
+        if depth > MAX_DEPTH:
+            raise CalculatorError("Expression nested too deeply")
+        token = self._next()
+        if token == '(':
+            left = self.parse(0, depth + 1)
+            if self._next() != ')':
+                raise CalculatorError("Missing closing parenthesis")
+        elif token == '-' or token == '+':
+            operand = self.parse(_UNARY_POWER, depth + 1)
+            left = -operand if token == '-' else operand
+        elif isinstance(token, str):
+            raise CalculatorError(f"Unexpected {token!r}")
+        else:
+            left = token
+        while True:
+            op = self._peek()
+            power = _BINARY_POWER.get(op) if isinstance(op, str) else None
+            if power is None or power <= min_power:
+                return left
+            self.pos += 1
+            right = self.parse(power, depth + 1)
+            left = _apply(op, left, right)
+
+
+def _apply(op, left, right):
+    if op == '+':
+        result = left + right
+    elif op == '-':
+        result = left - right
+    elif op == '*':
+        result = left * right
+    else:
+        if right == 0:
+            raise CalculatorError("Division by zero")
+        result = left / right
+    if abs(result) > MAX_MAGNITUDE:
+        raise CalculatorError("Result too large")
+    return result
+
+
+def evaluate(expr):
+    """Evaluate ``expr`` (numbers, + - * / and parentheses) or raise CalculatorError."""
+    if len(expr) > MAX_EXPRESSION_LENGTH:
+        raise CalculatorError("Expression too long")
+    tokens = _tokenize(expr)
+    if not tokens:
+        raise CalculatorError("Empty expression")
+    parser = _Parser(tokens)
+    value = parser.parse()
+    if parser.pos != len(tokens):
+        raise CalculatorError(f"Unexpected {tokens[parser.pos]!r}")
+    return value
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import sys
+import threading
+import weakref
+
+
+def content_hash(raw):
+    """Short stable hash of pack bytes, used as the pack version."""
+    return hashlib.sha256(raw).hexdigest()[:20]
+
+
+def _text(value):
+    """Interned string, so equal text in any pack or locale is stored once."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# Pack skeletons are shared by every catalog with the same structure (the
+# other locales of a pack, reloads after a text-only edit) for as long as one
+# of those catalogs is alive.
+_shared = weakref.WeakValueDictionary()
+_shared_lock = threading.Lock()
+
+
+def _share(obj):
+    """The live object equal to ``obj``, or ``obj`` itself once registered."""
+    key = (type(obj), obj.key())
+    with _shared_lock:
+        return _shared.setdefault(key, obj)
+
+
+class Frozen:
+    """Base for compact read-only lesson objects.
+
+    Subclasses declare ``__slots__`` and set them once in ``__init__`` via
+    ``_set``; any later assignment raises AttributeError, so instances can be
+    shared between requests and threads without copying.
+    """
+
+    __slots__ = ()
+
+    def _set(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+
+class Card(Frozen):
+    """One lesson card; fields absent from the JSON are None."""
+
+    __slots__ = ('type', 'title', 'body', 'src', 'caption')
+
+    def __init__(self, data):
+        self._set(**{name: _text(data.get(name)) for name in self.__slots__})
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+
+class Question(Frozen):
+    """One quiz question."""
+
+    __slots__ = ('id', 'prompt', 'options', 'answer_index', 'explanation')
+
+    def __init__(self, data):
+        self._set(
+            id=_text(data['id']),
+            prompt=_text(data.get('prompt')),
+            options=tuple(_text(option) for option in data.get('options', ())),
+            answer_index=data.get('answerIndex'),
+            explanation=_text(data.get('explanation')),
+        )
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'prompt': self.prompt,
+            'options': list(self.options),
+            'answerIndex': self.answer_index,
+            'explanation': self.explanation,
+        }
+
+
+class QuizMeta(Frozen):
+    """Per-unit quiz metadata derived once from the pack."""
+
+    __slots__ = ('question_ids', 'answer_key', 'count')
+
+    def __init__(self, quiz):
+        self._set(
+            question_ids=tuple(q.id for q in quiz),
+            answer_key={q.id: q.answer_index for q in quiz},
+            count=len(quiz),
+        )
+
+
+class Unit(Frozen):
+    """One unit of a lesson pack: its cards and quiz."""
+
+    __slots__ = ('id', 'title', 'cards', 'quiz')
+
+    def __init__(self, data):
+        self._set(
+            id=_text(data['id']),
+            title=_text(data['title']),
+            cards=tuple(Card(c) for c in data['cards']),
+            quiz=tuple(Question(q) for q in data['quiz']),
+        )
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'cards': [c.as_dict() for c in self.cards],
+            'quiz': [q.as_dict() for q in self.quiz],
+        }
+
+    def to_json(self):
+        """JSON for embedding the unit in a <script> block."""
+        return json.dumps(self.as_dict()).replace('</', '<\\/')
+
+
+class UnitProgress:
+    """Per-request view of a shared Unit with the learner's progress overlaid."""
+
+    __slots__ = ('unit', 'progress')
+
+    def __init__(self, unit, progress):
+        self.unit = unit
+        self.progress = progress
+
+    def __getattr__(self, name):
+        return getattr(self.unit, name)
+
+
+class PackSkeleton(Frozen):
+    """The locale-independent part of a pack: unit order and quiz answer keys.
+
+    Every locale of a pack has the same skeleton, so it is built once and
+    shared; a catalog adds only its locale's text.
+    """
+
+    __slots__ = ('subject', 'grade', 'unit_ids', 'positions', 'quiz_meta', '__weakref__')
+
+    def __init__(self, subject, grade, units):
+        unit_ids = tuple(u.id for u in units)
+        self._set(
+            subject=_text(subject),
+            grade=grade,
+            unit_ids=unit_ids,
+            positions={unit_id: i for i, unit_id in enumerate(unit_ids)},
+            quiz_meta={u.id: QuizMeta(u.quiz) for u in units},
+        )
+
+    def key(self):
+        return (self.subject, self.grade, tuple(
+            (unit_id, tuple(meta.answer_key.items())) for unit_id, meta in self.quiz_meta.items()))
+
+
+class LessonCatalog(Frozen):
+    """A lesson pack plus the unit index built once when the pack is loaded.
+
+    Everything reachable from a catalog is read-only, so cached catalogs are
+    shared by all requests; ``as_dict`` rebuilds the original JSON structure.
+    Strings are interned and the skeleton is shared with the pack's other
+    locales, so each added locale costs little more than its own text.
+    """
+
+    __slots__ = ('locale', 'units', 'version', 'skeleton', '_derived')
+
+    def __init__(self, data, version=None):
+        units = tuple(Unit(u) for u in data['units'])
+        if version is None:
+            version = content_hash(json.dumps(data, sort_keys=True).encode('utf-8'))
+        self._set(
+            locale=_text(data['locale']),
+            units=units,
+            version=version,
+            skeleton=_share(PackSkeleton(data['subject'], data['grade'], units)),
+            _derived={},
+        )
+
+    @property
+    def subject(self):
+        return self.skeleton.subject
+
+    @property
+    def grade(self):
+        return self.skeleton.grade
+
+    @property
+    def unit_ids(self):
+        return self.skeleton.unit_ids
+
+    def __contains__(self, unit_id):
+        return unit_id in self.skeleton.positions
+
+    def __len__(self):
+        return len(self.units)
+
+    def get_unit(self, unit_id):
+        """Return the Unit with ``unit_id``, or None."""
+        pos = self.skeleton.positions.get(unit_id)
+        if pos is None:
+            return None
+        return self.units[pos]
+
+    def neighbours(self, unit_id):
+        """Return (previous unit id, next unit id); either may be None."""
+        pos = self.skeleton.positions.get(unit_id)
+        if pos is None:
+            return None, None
+        unit_ids = self.skeleton.unit_ids
+        prev_id = unit_ids[pos - 1] if pos > 0 else None
+        next_id = unit_ids[pos + 1] if pos + 1 < len(unit_ids) else None
+        return prev_id, next_id
+
+    def quiz_meta(self, unit_id):
+        """Return the QuizMeta for ``unit_id``, or None."""
+        return self.skeleton.quiz_meta.get(unit_id)
+
+    def derived(self, name, build):
+        """Return ``build(self)``, computed once per catalog (i.e. per pack version)."""
+        try:
+            return self._derived[name]
+        except KeyError:
+            return self._derived.setdefault(name, build(self))
+
+    def as_dict(self):
+        """Return a fresh, caller-owned dict in the lesson JSON format."""
+        return {
+            'subject': self.subject,
+            'grade': self.grade,
+            'locale': self.locale,
+            'units': [u.as_dict() for u in self.units],
+        }
+
+
+def footprint(obj, seen=None):
+    """Approximate deep size in bytes of ``obj``, counting shared objects once."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(footprint(k, seen) + footprint(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(footprint(item, seen) for item in obj)
+    elif isinstance(obj, Frozen):
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                size += footprint(getattr(obj, name, None), seen)
+    return size
@@ -0,0 +1,85 @@
+"""Rendered-page cache for the lesson, quiz and unit list pages.
+
+Those pages depend only on the lesson pack and the active language, so the
+rendered HTML is memoized on the LessonCatalog (``catalog.derived``). A new
+pack version is a new catalog object, which drops the old renders with it;
+nothing has to be invalidated by hand.
+
+The unit list also shows per-learner progress badges. It is cached as a
+skeleton with a marker in each badge slot and the badges are filled in per
+request.
+"""
+import time
+
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .metrics import LESSONS_SECONDS, timed
+
+BADGE_MARKER = mark_safe('<!--progress-badge-->')
+
+
+class FragmentCache:
+    """Memoizes rendered HTML per catalog and language, and counts the render time it saves."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def get(self, catalog, name, render):
+        """Return ``render()`` for ``name``, rendered once per pack version and language."""
+        built = []
+
+        def build(_catalog):
+            start = time.perf_counter()
+            value = render()
+            elapsed = time.perf_counter() - start
+            built.append(elapsed)
+            return value, elapsed
+
+        value, elapsed = catalog.derived(('fragment', name, get_language()), build)
+        if built:
+            self.misses += 1
+            self.render_seconds += elapsed
+        else:
+            self.hits += 1
+            self.saved_seconds += elapsed
+        return value
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'render_ms': round(self.render_seconds * 1000, 3),
+            'saved_ms': round(self.saved_seconds * 1000, 3),
+        }
+
+
+fragment_cache = FragmentCache()
+
+
+def render_page(catalog, name, template, context):
+    """Rendered ``template`` for a page that depends only on the catalog and language."""
+    with timed(LESSONS_SECONDS, 'render'):
+        return fragment_cache.get(catalog, name, lambda: render_to_string(template, context))
+
+
+def render_unit_list(catalog, context, progress):
+    """Render subject_grade.html from the cached skeleton plus this learner's badges."""
+    with timed(LESSONS_SECONDS, 'render'):
+        return _render_unit_list(catalog, context, progress)
+
+
+def _render_unit_list(catalog, context, progress):
+    chunks = fragment_cache.get(catalog, 'subject_grade', lambda: render_to_string(
+        'subject_grade.html', dict(context, units=catalog.units, badge_marker=BADGE_MARKER),
+    ).split(BADGE_MARKER))
+    badge = get_template('progress_badge.html')
+    parts = [chunks[0]]
+    for unit, chunk in zip(catalog.units, chunks[1:]):
+        parts.append(badge.render({'progress': progress.get(unit.id, {})}))
+        parts.append(chunk)
+    return ''.join(parts)
@@ -1,16 +1,178 @@
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 
+from django.conf import settings
+
+from .bundle import LessonBundle, bundle_key
+from .catalog import LessonCatalog, content_hash
+from .metrics import LESSONS_SECONDS, timed
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+
+class LessonPackCache:
+    """Process-wide LRU cache of parsed lesson packs, keyed by (locale, subject, grade).
+
+    Entries remember the file's mtime and are reloaded when it changes. The
+    mtime is only re-checked every ``check_interval`` seconds, so repeat loads
+    inside that window never touch the filesystem. ``loader`` turns a file
+    path into the cached object and defaults to plain JSON parsing.
+    """
+
+    def __init__(self, maxsize=64, check_interval=2.0, loader=None):
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.loader = loader or _read_json
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, path):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                mtime, checked_at, data = entry
+                if now - checked_at < self.check_interval:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return data
+        # Stat outside the lock; a missing file raises FileNotFoundError.
+        try:
+            current_mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(key, None)
+            raise FileNotFoundError(f"Lesson file not found: {path}")
+        if entry is not None and entry[0] == current_mtime:
+            with self._lock:
+                if key in self._entries:
+                    self._entries[key] = (current_mtime, now, entry[2])
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            return entry[2]
+        data = self.loader(path)
+        self._store(key, current_mtime, now, data)
+        return data
+
+    def get_static(self, key, build):
+        """Like ``get`` for sources that never change (the bundle): no stat at all."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+        data = build()
+        self._store(key, None, float('inf'), data)
+        return data
+
+    def _store(self, key, mtime, checked_at, data):
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (mtime, checked_at, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _read_catalog(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return LessonCatalog(json.loads(raw), version=content_hash(raw))
+
+
+def _catalog_from_bytes(body, version):
+    catalog = LessonCatalog(json.loads(body), version=version)
+    # The bundle already holds the canonical encoding; reuse it for the API.
+    catalog.derived('json_body', lambda c: bytes(body))
+    return catalog
+
+
+def _open_bundle(path):
+    if not path or not os.path.exists(path):
+        return None
+    return LessonBundle(path)
+
+
+pack_cache = LessonPackCache(
+    maxsize=getattr(settings, 'LESSON_PACK_CACHE_SIZE', 64),
+    check_interval=getattr(settings, 'LESSON_PACK_CHECK_INTERVAL', 2.0),
+    loader=_read_catalog,
+)
+
+# Memory-mapped once at startup; packs found here skip the filesystem entirely.
+bundle = _open_bundle(getattr(settings, 'LESSON_BUNDLE_PATH', None))
+
+LESSONS_DIR = BASE_DIR / 'data' / 'lessons'
+
+
+def lesson_pack_path(subject, grade, locale):
+    """Path of the lesson JSON for given subject, grade, locale."""
+    return LESSONS_DIR / locale / subject / f'grade{grade}.json'
+
+
+def iter_lesson_pack_files():
+    """Yield (locale, subject, grade, path) for every lesson JSON on disk."""
+    for path in sorted(LESSONS_DIR.glob('*/*/grade*.json')):
+        grade = path.stem[len('grade'):]
+        if grade.isdigit():
+            yield path.parent.parent.name, path.parent.name, int(grade), path
+
+
+def pack_file_signature(path):
+    """(size, mtime) of a pack file, to notice edits without reading it; None if unknown."""
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load_catalog(subject, grade, locale):
+    """Load the indexed LessonCatalog for given subject, grade, locale."""
+    with timed(LESSONS_SECONDS, 'pack_load'):
+        if bundle is not None:
+            key = bundle_key(subject, grade, locale)
+            if key in bundle:
+                return pack_cache.get_static((locale, subject, grade), lambda: _catalog_from_bytes(*bundle.get(key)))
+        file_path = lesson_pack_path(subject, grade, locale)
+        return pack_cache.get((locale, subject, grade), file_path)
+
+
 def load_lesson_pack(subject, grade, locale):
     """Load lesson JSON for given subject, grade, locale."""
-    file_path = BASE_DIR / 'data' / 'lessons' / locale / subject / f'grade{grade}.json'
-    if not file_path.exists():
-        raise FileNotFoundError(f"Lesson file not found: {file_path}")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return load_catalog(subject, grade, locale).as_dict()
+
 
 def validate_lesson_pack(data):
     """Basic validation of lesson JSON structure."""
@@ -20,4 +182,4 @@ def validate_lesson_pack(data):
     for unit in data['units']:
         if 'id' not in unit or 'title' not in unit or 'cards' not in unit or 'quiz' not in unit:
             raise ValueError("Invalid unit structure")
-    return True
\ No newline at end of file
+    return True
@@ -0,0 +1,285 @@
+"""Local tutor backend that answers on the CPU, without the network.
+
+``LocalTutor`` keeps a generator loaded in a small pool of worker threads.
+Questions are queued, and each worker takes up to ``batch_size`` of them at
+a time, so a burst of questions is answered in one pass and identical
+prompts in a batch are generated once. Callers wait at most ``timeout``
+seconds; a question not answered by then (or turned away by a full queue)
+gets the offline reply instead.
+
+Two generators are available:
+
+* ``LlamaGenerator``: a small quantized GGUF chat model run by
+  llama-cpp-python (``pip install llama-cpp-python``), used when
+  ``TUTOR_LOCAL_MODEL_PATH`` is set. Each worker loads its own copy.
+* ``TemplateGenerator``: no model; frames the best-matching lesson snippets
+  in a short per-locale sentence. Also used when the model fails to load.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+from .auditlog import audit_log
+from .metrics import TUTOR_SECONDS, timed
+from .retrieval import lesson_index
+
+# One question with the lesson snippets it is answered from, as ((score, text), ...).
+LocalPrompt = namedtuple('LocalPrompt', 'message subject grade locale context')
+
+TEMPLATES = {
+    'en': "Here's what your lesson says: {}",
+    'es': "Esto dice tu lección: {}",
+}
+
+
+class TemplateGenerator:
+    """Answers from lesson snippets scoring at least ``min_score``, up to ``max_chars`` long."""
+
+    name = 'template'
+
+    def __init__(self, min_score=1.5, max_chars=200):
+        self.min_score = min_score
+        self.max_chars = max_chars
+
+    def load(self):
+        pass
+
+    def generate(self, prompts):
+        return [self._answer(prompt) for prompt in prompts]
+
+    def _answer(self, prompt):
+        texts = []
+        for score, text in prompt.context:
+            if score < self.min_score:
+                break
+            if texts and len(' '.join(texts + [text])) > self.max_chars:
+                break
+            texts.append(text)
+        if not texts:
+            return None
+        return TEMPLATES.get(prompt.locale, TEMPLATES['en']).format(' '.join(texts))
+
+
+class LlamaGenerator:
+    """A quantized chat model on CPU through llama-cpp-python, imported when the worker loads it."""
+
+    name = 'llama'
+
+    def __init__(self, model_path, threads=None, context_size=1024, max_tokens=64):
+        self.model_path = model_path
+        self.threads = threads
+        self.context_size = context_size
+        self.max_tokens = max_tokens
+        self.model = None
+
+    def load(self):
+        from llama_cpp import Llama
+
+        self.model = Llama(model_path=os.fspath(self.model_path), n_ctx=self.context_size,
+                           n_threads=self.threads, verbose=False)
+
+    def generate(self, prompts):
+        # The high-level API generates one sequence at a time; a batch runs
+        # back to back on the loaded model.
+        replies = []
+        for prompt in prompts:
+            result = self.model.create_chat_completion(
+                messages=_chat_messages(prompt), max_tokens=self.max_tokens, temperature=0.3)
+            replies.append(result['choices'][0]['message']['content'].strip() or None)
+        return replies
+
+
+def _chat_messages(prompt):
+    system_msg = (
+        "You are Lumi, a cheerful K-5 tutor. Respond with ONLY one short kid-friendly sentence "
+        f"in plain text. Use language: {prompt.locale}."
+    )
+    if prompt.context:
+        system_msg += " Base your answer on these lesson notes:\n" + "\n".join(
+            f"- {text}" for _score, text in prompt.context)
+    user_msg = f"Subject: {prompt.subject}, Grade: {prompt.grade}. Question: {prompt.message}"
+    return [{"role": "system", "content": system_msg}, {"role": "user", "content": user_msg}]
+
+
+class LocalTutor:
+    """Tutor backend answering from a generator kept loaded in ``workers`` threads.
+
+    Workers start on first use (and again in a forked child, where the
+    parent's threads do not exist). A worker whose generator fails to load
+    falls back to ``TemplateGenerator``.
+    """
+
+    source = 'local'
+
+    def __init__(self, make_generator, workers=1, batch_size=8, batch_wait=0.01, queue_size=64,
+                 timeout=3.0, context_snippets=3):
+        self.make_generator = make_generator
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.context_snippets = context_snippets
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self.generator = None
+        self.submitted = 0
+        self.batches = 0
+        self.generated = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.errors = 0
+
+    def start(self):
+        """Start the workers in this process, if they are not running yet."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_size)
+            for n in range(self.workers):
+                threading.Thread(target=self._work, args=(self._queue,), name=f'local-tutor-{n}',
+                                 daemon=True).start()
+            self._pid = os.getpid()
+
+    def _load(self):
+        generator = self.make_generator()
+        try:
+            generator.load()
+        except Exception as e:
+            audit_log.log('local_error', sample=False, error=f'{generator.name} failed to load: {e!r}')
+            generator = TemplateGenerator()
+        self.generator = generator.name
+        return generator
+
+    def _take_batch(self, jobs):
+        batch = [jobs.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(jobs.get(timeout=remaining) if remaining > 0 else jobs.get_nowait())
+            except queue.Empty:
+                break
+        # Skip questions whose caller already gave up.
+        return [(prompt, future) for prompt, future in batch if future.set_running_or_notify_cancel()]
+
+    def _work(self, jobs):
+        generator = self._load()
+        while True:
+            batch = self._take_batch(jobs)
+            if not batch:
+                continue
+            prompts = list(dict.fromkeys(prompt for prompt, _future in batch))
+            try:
+                replies = dict(zip(prompts, generator.generate(prompts)))
+            except Exception as e:
+                self.errors += 1
+                audit_log.log('local_error', sample=False, error=repr(e), batch=len(prompts))
+                replies = {}
+            self.batches += 1
+            self.generated += len(prompts)
+            for prompt, future in batch:
+                future.set_result(replies.get(prompt))
+
+    def prompt(self, message, subject, grade, locale):
+        try:
+            grade = int(grade)
+        except (TypeError, ValueError):
+            grade = None
+        results = lesson_index.search(message, subject, locale, grade=grade, k=self.context_snippets)
+        return LocalPrompt(message, subject, grade, locale,
+                           tuple((score, snippet.text) for score, snippet in results))
+
+    def submit(self, prompt):
+        """Queue ``prompt``; returns its Future, or None when the queue is full."""
+        self.start()
+        future = Future()
+        try:
+            self._queue.put_nowait((prompt, future))
+        except queue.Full:
+            self.rejected += 1
+            return None
+        self.submitted += 1
+        return future
+
+    def reply(self, message, subject, grade, locale, client_key=None):
+        """Generated reply text, or None when it is not ready within ``timeout``."""
+        with timed(TUTOR_SECONDS, 'local'):
+            future = self.submit(self.prompt(message, subject, grade, locale))
+            if future is None:
+                return None
+            try:
+                return future.result(self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                self.timed_out += 1
+                return None
+
+    async def areply(self, message, subject, grade, locale, client_key=None):
+        """Async ``reply``: waits on the event loop, not a thread."""
+        with timed(TUTOR_SECONDS, 'local'):
+            future = self.submit(self.prompt(message, subject, grade, locale))
+            if future is None:
+                return None
+            try:
+                # Cancelling the wrapper on timeout also cancels a question still queued.
+                return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                return None
+
+    def stream(self, message, subject, grade, locale, client_key=None):
+        """Sync ``astream``."""
+        reply = self.reply(message, subject, grade, locale, client_key)
+        if reply:
+            yield reply
+
+    async def astream(self, message, subject, grade, locale, client_key=None):
+        """The reply as a single piece; generation is batched, not streamed."""
+        reply = await self.areply(message, subject, grade, locale, client_key)
+        if reply:
+            yield reply
+
+    def stats(self):
+        return {
+            'workers': self.workers if self._pid == os.getpid() else 0,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'submitted': self.submitted,
+            'batches': self.batches,
+            'generated': self.generated,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'errors': self.errors,
+        }
+
+
+def make_generator():
+    """The generator the settings ask for: the GGUF model if one is configured, else templates."""
+    model_path = getattr(settings, 'TUTOR_LOCAL_MODEL_PATH', None)
+    if model_path:
+        return LlamaGenerator(
+            model_path,
+            threads=getattr(settings, 'TUTOR_LOCAL_THREADS', None),
+            max_tokens=getattr(settings, 'TUTOR_LOCAL_MAX_TOKENS', 64),
+        )
+    return TemplateGenerator(min_score=getattr(settings, 'TUTOR_LOCAL_MIN_SCORE', 1.5))
+
+
+local_tutor = LocalTutor(
+    make_generator,
+    workers=getattr(settings, 'TUTOR_LOCAL_WORKERS', 1),
+    batch_size=getattr(settings, 'TUTOR_LOCAL_BATCH_SIZE', 8),
+    batch_wait=getattr(settings, 'TUTOR_LOCAL_BATCH_WAIT', 0.01),
+    queue_size=getattr(settings, 'TUTOR_LOCAL_QUEUE_SIZE', 64),
+    timeout=getattr(settings, 'TUTOR_LOCAL_TIMEOUT', 3.0),
+    context_snippets=getattr(settings, 'TUTOR_CONTEXT_SNIPPETS', 3),
+)
@@ -0,0 +1,126 @@
+"""In-process latency histograms, exposed in the Prometheus text format.
+
+Buckets are allocated when a label set is first seen; after that an
+observation is one bisect and two additions with no lock. Under threads an
+increment can occasionally be lost, which is an acceptable trade for
+metrics that are only read as rates and quantiles.
+"""
+import time
+from bisect import bisect_left
+
+# Seconds; spans the sub-millisecond cached paths up to slow AI calls.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Counts per bucket plus a running sum; one per label set."""
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self):
+        """Context manager that observes the elapsed time of its block."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class HistogramFamily:
+    """A named histogram with labels, e.g. ``lightschool_tutor_seconds{stage="ai"}``.
+
+    At most ``max_children`` label sets are kept; past that, new ones are
+    recorded under a single set with every label ``other``.
+    """
+
+    def __init__(self, name, help, labelnames, buckets=LATENCY_BUCKETS, max_children=500):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.max_children = max_children
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(self._children) >= self.max_children:
+                values = ('other',) * len(self.labelnames)
+            child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for values, child in sorted(self._children.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values))
+            sep = ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), list(child.counts)):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {child.sum!r}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = HistogramFamily(
+    'lightschool_request_seconds', 'Time spent handling a request, by view.', ('view', 'method', 'status'))
+TUTOR_SECONDS = HistogramFamily(
+    'lightschool_tutor_seconds', 'Time spent in each tutor reply source.', ('stage',))
+LESSONS_SECONDS = HistogramFamily(
+    'lightschool_lessons_seconds', 'Time spent loading lesson packs and rendering lesson pages.', ('stage',))
+PROGRESS_SECONDS = HistogramFamily(
+    'lightschool_progress_seconds', 'Time spent reading and writing progress, and saving sessions.', ('stage',))
+
+FAMILIES = (REQUEST_SECONDS, TUTOR_SECONDS, LESSONS_SECONDS, PROGRESS_SECONDS)
+
+
+def timed(family, stage):
+    """``with timed(TUTOR_SECONDS, 'ai'):`` records the block under that stage."""
+    return _Timer(family.labels(stage))
+
+
+def render(stats=None):
+    """All histograms, plus ``stats`` ({component: {counter: number}}) as gauges, in text format."""
+    lines = []
+    for family in FAMILIES:
+        lines.extend(family.collect())
+    for component, values in (stats or {}).items():
+        name = f'lightschool_{component}'
+        lines.append(f'# TYPE {name} gauge')
+        for key, value in _flatten(values):
+            lines.append(f'{name}{{stat="{key}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _flatten(values, prefix=''):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f'{prefix}{key}_')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f'{prefix}{key}', value
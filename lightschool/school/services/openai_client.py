@@ -0,0 +1,174 @@
+import asyncio
+import json
+import threading
+import weakref
+
+# requests and httpx are imported on the first upstream call, not at startup.
+_httpx = None  # the module once imported, False when it is not installed
+
+
+def _import_httpx():
+    global _httpx
+    if _httpx is None:
+        try:
+            import httpx
+        except ImportError:  # optional: pip install httpx for native async I/O
+            httpx = False
+        _httpx = httpx
+    return _httpx or None
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when the upstream call cannot be made within limits."""
+
+
+class OpenAIClient:
+    """Pooled, keep-alive HTTP client for the chat completions API.
+
+    ``complete`` serves the threaded WSGI path through a shared
+    ``requests.Session``. ``acomplete`` serves async views under ASGI through
+    one ``httpx.AsyncClient`` per event loop (or the sync session on a worker
+    thread when httpx is missing); it is not for WSGI, where every request
+    runs on a new loop and would get a client of its own.
+
+    The client does not limit concurrency itself: callers are admitted by the
+    tutor's AdmissionGate first, so there is one limit and one queue.
+
+    ``timeout`` is the deadline per call. ``acomplete`` enforces it over the
+    whole call; ``complete`` gives it to connecting and to each read, as
+    requests has no overall deadline.
+    """
+
+    def __init__(self, url, api_key, timeout=10.0, pool_size=32):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+        # Async clients are bound to the loop that created them.
+        self._loop_state = weakref.WeakKeyDictionary()
+
+    @property
+    def headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _get_session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def complete(self, payload):
+        """POST ``payload`` and return (status code, parsed JSON or text)."""
+        response = self._get_session().post(self.url, headers=self.headers, json=payload, timeout=self.timeout)
+        return response.status_code, _body(response.status_code, response.json, response.text)
+
+    def stream(self, payload):
+        """Sync ``astream`` through the shared session, for WSGI."""
+        import requests
+
+        try:
+            with self._get_session().post(self.url, headers=self.headers, json=dict(payload, stream=True),
+                                          stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    raise UpstreamUnavailable(f"Upstream returned {response.status_code}: {response.text[:200]}")
+                response.encoding = 'utf-8'  # text/event-stream without a charset would decode as Latin-1
+                for line in response.iter_lines(decode_unicode=True):
+                    delta = _delta(line)
+                    if delta is _DONE:
+                        break
+                    if delta:
+                        yield delta
+        except requests.RequestException as e:
+            raise UpstreamUnavailable(f"Upstream stream failed: {e}") from e
+
+    def _async_client(self):
+        """httpx client (or None) for the running event loop, which must be long-lived (ASGI)."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._loop_state:
+            client = None
+            httpx = _import_httpx()
+            if httpx is not None:
+                limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+            self._loop_state[loop] = client
+        return self._loop_state[loop]
+
+    async def acomplete(self, payload):
+        """Async version of ``complete``."""
+        client = self._async_client()
+
+        async def call():
+            if client is None:
+                return await asyncio.to_thread(self.complete, payload)
+            response = await client.post(self.url, headers=self.headers, json=payload)
+            return response.status_code, _body(response.status_code, response.json, response.text)
+
+        try:
+            return await asyncio.wait_for(call(), self.timeout)
+        except asyncio.TimeoutError as e:
+            raise UpstreamUnavailable("Upstream deadline exceeded") from e
+
+    async def astream(self, payload):
+        """Yield the reply's text deltas as the upstream streams them (``"stream": true``).
+
+        ``timeout`` bounds connecting and each read rather than the whole stream. Without httpx the full reply is fetched and yielded once.
+        Raises UpstreamUnavailable when the call fails before or during the stream.
+        """
+        client = self._async_client()
+        if client is None:
+            status, body = await self.acomplete(dict(payload, stream=False))
+            if status != 200:
+                raise UpstreamUnavailable(f"Upstream returned {status}")
+            yield body['choices'][0]['message']['content']
+            return
+        try:
+            async with client.stream('POST', self.url, headers=self.headers, json=dict(payload, stream=True)) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise UpstreamUnavailable(f"Upstream returned {response.status_code}: {response.text[:200]}")
+                async for line in response.aiter_lines():
+                    delta = _delta(line)
+                    if delta is _DONE:
+                        break
+                    if delta:
+                        yield delta
+        except _import_httpx().HTTPError as e:
+            raise UpstreamUnavailable(f"Upstream stream failed: {e}") from e
+
+    async def aclose(self):
+        """Close the async client bound to the running loop, if any."""
+        client = self._loop_state.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+_DONE = object()
+
+
+def _delta(line):
+    """Text in one line of a streamed completion: None for lines without any, _DONE at the end."""
+    if not line.startswith('data:'):
+        return None
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return _DONE
+    return json.loads(data)['choices'][0].get('delta', {}).get('content')
+
+
+def _body(status_code, as_json, text):
+    if status_code != 200:
+        return text
+    return as_json()
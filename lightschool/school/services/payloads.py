@@ -0,0 +1,75 @@
+import gzip
+import json
+
+from django.http import HttpResponse, HttpResponseNotModified
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+
+class EncodedPayload:
+    """A response body pre-encoded once, with gzip/brotli variants and strong ETags."""
+
+    __slots__ = ('content_type', 'variants')
+
+    def __init__(self, body, version, content_type='application/json'):
+        self.content_type = content_type
+        # encoding -> (bytes, etag); identity is always present.
+        self.variants = {'identity': (body, f'"{version}"')}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            self.variants['gzip'] = (compressed, f'"{version}-gzip"')
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.variants['br'] = (compressed, f'"{version}-br"')
+
+    def choose_encoding(self, accept_encoding):
+        """Pick the smallest variant allowed by an Accept-Encoding header."""
+        accepted = set()
+        for part in accept_encoding.split(','):
+            name, _, params = part.partition(';')
+            params = params.strip().replace(' ', '')
+            try:
+                quality = float(params[2:]) if params.startswith('q=') else 1.0
+            except ValueError:
+                quality = 0.0
+            if quality > 0:
+                accepted.add(name.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                return encoding
+        return 'identity'
+
+    def response(self, request):
+        """Serve the negotiated variant, or 304 when If-None-Match matches it."""
+        encoding = self.choose_encoding(request.headers.get('Accept-Encoding', ''))
+        body, etag = self.variants[encoding]
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            if etag in tags or '*' in tags:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                response['Vary'] = 'Accept-Encoding'
+                return response
+        response = HttpResponse(body, content_type=self.content_type)
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'no-cache'
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(body))
+        return response
+
+
+def catalog_json_payload(catalog):
+    """Pre-encoded JSON for a LessonCatalog, built once per pack version."""
+    return catalog.derived('json_payload', lambda c: EncodedPayload(catalog_json_body(c), c.version))
+
+
+def catalog_json_body(catalog):
+    """Canonical JSON encoding of a LessonCatalog, built once per pack version."""
+    return catalog.derived('json_body', lambda c: json.dumps(c.as_dict()).encode('utf-8'))
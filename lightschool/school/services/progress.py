@@ -1,19 +1,236 @@
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Progress, ProgressEvent
+from .metrics import PROGRESS_SECONDS, timed
+
+LEARNER_SESSION_KEY = 'learner_id'
+
+MAX_GRADE = 32767  # PositiveSmallIntegerField
+
+
+def get_learner_id(request, create=False):
+    """Anonymous learner id for this session; created (one session write) on demand."""
+    learner = request.session.get(LEARNER_SESSION_KEY)
+    if learner is None and create:
+        learner = uuid.uuid4().hex
+        request.session[LEARNER_SESSION_KEY] = learner
+        _import_session_progress(request, learner)
+    return learner
+
+
+def _import_session_progress(request, learner):
+    """Move progress saved by older versions (a nested dict in the session) into the table."""
+    legacy = request.session.pop('progress', None)
+    if not legacy:
+        return
+    now = timezone.now()
+    rows = [
+        Progress(learner=learner, locale=locale, subject=subject, grade=int(grade), unit_id=unit_id,
+                 status=entry.get('status', ''), score=entry.get('score'), client_ts=now)
+        for locale, loc_progress in legacy.items()
+        for subject, subj_progress in loc_progress.items()
+        for grade, grade_progress in subj_progress.items()
+        for unit_id, entry in grade_progress.items()
+    ]
+    upsert_progress(rows)
+
+
+def upsert_progress(rows):
+    """Insert or update Progress rows in one statement."""
+    if rows:
+        Progress.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['learner', 'locale', 'subject', 'grade', 'unit_id'],
+            update_fields=['status', 'score', 'client_ts', 'updated_at'],
+        )
+
+
+def _nest(rows, depth):
+    """Build the nested progress dict from (subject, grade, unit_id, status, score) rows."""
+    tree = {}
+    for subject, grade, unit_id, status, score in rows:
+        entry = {'status': status}
+        if score is not None:
+            entry['score'] = score
+        if depth == 3:
+            tree.setdefault(subject, {}).setdefault(str(grade), {})[unit_id] = entry
+        else:
+            tree[unit_id] = entry
+    return tree
+
+
 def get_progress(request, locale):
     """Get progress dict for locale."""
-    return request.session.get('progress', {}).get(locale, {})
+    learner = get_learner_id(request)
+    if learner is None:
+        return {}
+    with timed(PROGRESS_SECONDS, 'read'):
+        rows = (Progress.objects.filter(learner=learner, locale=locale)
+                .values_list('subject', 'grade', 'unit_id', 'status', 'score'))
+        return _nest(rows, depth=3)
 
-def set_progress(request, locale, subject, grade, unit_id, status, score=None):
-    """Set progress for a unit."""
-    progress = request.session.setdefault('progress', {})
-    loc_progress = progress.setdefault(locale, {})
-    subj_progress = loc_progress.setdefault(subject, {})
-    grade_progress = subj_progress.setdefault(str(grade), {})
-    grade_progress[unit_id] = {'status': status}
+
+def get_grade_progress(request, locale, subject, grade):
+    """Get progress for one subject/grade, keyed by unit id (one indexed query)."""
+    learner = get_learner_id(request)
+    if learner is None:
+        return {}
+    with timed(PROGRESS_SECONDS, 'read'):
+        rows = (Progress.objects.filter(learner=learner, locale=locale, subject=subject, grade=int(grade))
+                .values_list('subject', 'grade', 'unit_id', 'status', 'score'))
+        return _nest(rows, depth=1)
+
+
+def get_all_progress(request):
+    """Get progress for every locale, as {locale: {subject: {grade: {unit: ...}}}}."""
+    learner = get_learner_id(request)
+    if learner is None:
+        return {}
+    progress = {}
+    with timed(PROGRESS_SECONDS, 'read'):
+        rows = list(Progress.objects.filter(learner=learner)
+                    .values_list('locale', 'subject', 'grade', 'unit_id', 'status', 'score'))
+    for locale, *row in rows:
+        progress.setdefault(locale, []).append(row)
+    return {locale: _nest(loc_rows, depth=3) for locale, loc_rows in progress.items()}
+
+
+def clean_progress(locale, subject, grade, unit_id, status, score=None):
+    """(locale, subject, grade, unit_id, status, score) checked against the Progress columns.
+
+    Raises ValueError, TypeError or OverflowError for a value that does not fit.
+    """
+    if not all(isinstance(v, str) and v for v in (locale, subject, unit_id, status)):
+        raise ValueError("locale, subject, unitId and status must be non-empty strings")
+    for field, value in (('locale', locale), ('subject', subject), ('unit_id', unit_id), ('status', status)):
+        if len(value) > Progress._meta.get_field(field).max_length:
+            raise ValueError(f"{field} is too long")
+    grade = int(grade)
+    if not 0 <= grade <= MAX_GRADE:
+        raise ValueError("grade out of range")
     if score is not None:
-        grade_progress[unit_id]['score'] = score
-    request.session.modified = True
-    return progress
+        score = int(score)
+        if not 0 <= score <= 100:
+            raise ValueError("score must be between 0 and 100")
+    return locale, subject, grade, unit_id, status, score
+
+
+def set_progress(request, locale, subject, grade, unit_id, status, score=None):
+    """Set progress for a unit; raises as ``clean_progress`` does for invalid values."""
+    locale, subject, grade, unit_id, status, score = clean_progress(locale, subject, grade, unit_id, status, score)
+    learner = get_learner_id(request, create=True)
+    with timed(PROGRESS_SECONDS, 'write'):
+        upsert_progress([Progress(learner=learner, locale=locale, subject=subject, grade=grade,
+                                  unit_id=unit_id, status=status, score=score, client_ts=timezone.now())])
+    return get_all_progress(request)
+
+
+def _parse_event(event, default_locale):
+    """Validate one sync event; return a normalized dict or raise ValueError."""
+    if not isinstance(event, dict):
+        raise ValueError("Event must be an object")
+    locale, subject, grade, unit_id, status, score = clean_progress(
+        event.get('locale') or default_locale, event.get('subject'), event.get('grade'),
+        event.get('unitId'), event.get('status'), event.get('score'))
+    key = event.get('idempotencyKey')
+    if key is not None and (not isinstance(key, str) or len(key) > 64):
+        raise ValueError("Invalid idempotencyKey")
+    client_ts = event.get('clientTs')
+    if client_ts is None:
+        client_ts = timezone.now()
+    else:
+        client_ts = datetime.fromtimestamp(float(client_ts) / 1000, tz=dt_timezone.utc)
+    return {
+        'locale': locale, 'subject': subject, 'grade': grade,
+        'unit_id': unit_id, 'status': status, 'score': score, 'key': key, 'client_ts': client_ts,
+    }
+
+
+def merge_progress(row, event):
+    """Apply one event to a row: last write (by client time) wins for status, best score wins."""
+    if row.client_ts is None or event['client_ts'] >= row.client_ts:
+        row.status = event['status']
+        row.client_ts = event['client_ts']
+    if event['score'] is not None and (row.score is None or event['score'] > row.score):
+        row.score = event['score']
+
+
+def _unit_key(event):
+    return event['locale'], event['subject'], event['grade'], event['unit_id']
+
+
+def sync_progress(request, locale, events):
+    """Apply a batch of offline progress events in one transaction.
+
+    Each event carries a client timestamp and an optional idempotency key;
+    replayed keys are skipped. Returns counts plus a delta holding only the
+    units whose stored progress changed.
+    """
+    learner = get_learner_id(request, create=True)
+    parsed, rejected = [], []
+    for i, event in enumerate(events):
+        try:
+            parsed.append(_parse_event(event, locale))
+        except (TypeError, ValueError, OverflowError):
+            rejected.append(i)
+
+    with timed(PROGRESS_SECONDS, 'sync'), transaction.atomic():
+        keys = {e['key'] for e in parsed if e['key']}
+        seen = set(ProgressEvent.objects.filter(learner=learner, key__in=keys).values_list('key', flat=True))
+        fresh = []
+        for e in parsed:
+            if e['key']:
+                if e['key'] in seen:
+                    continue
+                seen.add(e['key'])
+            fresh.append(e)
+        duplicates = len(parsed) - len(fresh)
+
+        existing = {
+            (r.locale, r.subject, r.grade, r.unit_id): r
+            for r in Progress.objects.select_for_update().filter(
+                learner=learner,
+                locale__in={e['locale'] for e in fresh},
+                unit_id__in={e['unit_id'] for e in fresh},
+            )
+        }
+        before = {key: (r.status, r.score, r.client_ts) for key, r in existing.items()}
+        for e in sorted(fresh, key=lambda e: e['client_ts']):
+            row = existing.get(_unit_key(e))
+            if row is None:
+                existing[_unit_key(e)] = Progress(
+                    learner=learner, locale=e['locale'], subject=e['subject'], grade=e['grade'],
+                    unit_id=e['unit_id'], status=e['status'], score=e['score'], client_ts=e['client_ts'])
+            else:
+                merge_progress(row, e)
+        # Rows that changed at all are saved; only visible changes go in the delta.
+        changed = {key: r for key, r in existing.items() if before.get(key) != (r.status, r.score, r.client_ts)}
+        upsert_progress([r for r in changed.values() if r.pk is None])
+        updated = [r for r in changed.values() if r.pk is not None]
+        if updated:
+            now = timezone.now()
+            for r in updated:
+                r.updated_at = now
+            Progress.objects.bulk_update(updated, ['status', 'score', 'client_ts', 'updated_at'])
+        ProgressEvent.objects.bulk_create(
+            [ProgressEvent(learner=learner, key=e['key']) for e in fresh if e['key']])
+
+    delta = {}
+    for (loc, subject, grade, unit_id), row in changed.items():
+        if before.get((loc, subject, grade, unit_id), ())[:2] == (row.status, row.score):
+            continue
+        entry = {'status': row.status}
+        if row.score is not None:
+            entry['score'] = row.score
+        delta.setdefault(loc, {}).setdefault(subject, {}).setdefault(str(grade), {})[unit_id] = entry
+    return {'applied': len(fresh), 'duplicates': duplicates, 'rejected': rejected, 'delta': delta}
+
 
 def get_subject_progress(progress, subject, grade):
     """Get progress for subject/grade."""
-    return progress.get(subject, {}).get(str(grade), {})
\ No newline at end of file
+    return progress.get(subject, {}).get(str(grade), {})
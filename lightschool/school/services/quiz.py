@@ -0,0 +1,115 @@
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, When
+from django.utils import timezone
+
+from ..models import Progress, QuestionStat, QuizAttempt, UnitStat
+from .metrics import PROGRESS_SECONDS, timed
+from .progress import get_learner_id, merge_progress, upsert_progress
+
+PASS_SCORE = getattr(settings, 'QUIZ_PASS_SCORE', 60)
+
+
+def grade_quiz(catalog, unit_id, answers):
+    """Grade ``answers`` ({question id: option index}) against the pack's answer key.
+
+    Returns None for an unknown unit. Unanswered, malformed or out-of-range answers
+    count as wrong and are recorded as not answered.
+    """
+    meta = catalog.quiz_meta(unit_id)
+    if meta is None:
+        return None
+    unit = catalog.get_unit(unit_id)
+    results = []
+    for question in unit.quiz:
+        chosen = answers.get(question.id)
+        try:
+            chosen = None if chosen is None or chosen == '' else int(chosen)
+        except (TypeError, ValueError):
+            chosen = None
+        if chosen is not None and not 0 <= chosen < len(question.options):
+            chosen = None
+        results.append({
+            'id': question.id,
+            'chosen': chosen,
+            'correct': chosen is not None and chosen == meta.answer_key[question.id],
+            'answerIndex': question.answer_index,
+            'explanation': question.explanation,
+        })
+    correct = sum(r['correct'] for r in results)
+    score = round(correct * 100 / meta.count) if meta.count else 0
+    return {'score': score, 'correct': correct, 'total': meta.count, 'results': results}
+
+
+def submit_quiz(request, catalog, unit_id, answers):
+    """Grade a submission, record it and update progress plus the running stats.
+
+    The stats tables are bumped in place with one UPDATE each, so reading
+    analytics never has to rescan the attempts log.
+    """
+    graded = grade_quiz(catalog, unit_id, answers)
+    if graded is None:
+        return None
+    learner = get_learner_id(request, create=True)
+    unit_key = {'locale': catalog.locale, 'subject': catalog.subject, 'grade': catalog.grade, 'unit_id': unit_id}
+    submission = uuid.uuid4().hex
+    results = graded['results']
+    right = [r['id'] for r in results if r['correct']]
+    passed = graded['score'] >= PASS_SCORE
+
+    with timed(PROGRESS_SECONDS, 'quiz_submit'), transaction.atomic():
+        QuizAttempt.objects.bulk_create([
+            QuizAttempt(submission=submission, learner=learner, question_id=r['id'],
+                        chosen=r['chosen'], correct=r['correct'], **unit_key)
+            for r in results
+        ])
+        QuestionStat.objects.bulk_create(
+            [QuestionStat(question_id=r['id'], **unit_key) for r in results], ignore_conflicts=True)
+        QuestionStat.objects.filter(question_id__in=[r['id'] for r in results], **unit_key).update(
+            attempts=F('attempts') + 1,
+            correct=F('correct') + Case(When(question_id__in=right, then=1), default=0,
+                                        output_field=IntegerField()),
+        )
+        UnitStat.objects.bulk_create([UnitStat(**unit_key)], ignore_conflicts=True)
+        UnitStat.objects.filter(**unit_key).update(
+            submissions=F('submissions') + 1, passed=F('passed') + int(passed))
+        # A retake updates the status but keeps the best score, as an offline sync would.
+        completed = {'status': 'completed', 'score': graded['score'], 'client_ts': timezone.now()}
+        row = Progress.objects.select_for_update().filter(learner=learner, **unit_key).first()
+        if row is None:
+            upsert_progress([Progress(learner=learner, **completed, **unit_key)])
+        else:
+            merge_progress(row, completed)
+            row.save(update_fields=['status', 'score', 'client_ts', 'updated_at'])
+    graded['passed'] = passed
+    return graded
+
+
+def _rate(part, whole):
+    return round(part / whole, 3) if whole else None
+
+
+def unit_analytics(locale, subject, grade, unit_id=None):
+    """Per-unit completion rates and per-question difficulty from the running stats.
+
+    Difficulty is the share of attempts answered wrongly (0 easy .. 1 hard).
+    """
+    filters = {'locale': locale, 'subject': subject, 'grade': int(grade)}
+    if unit_id:
+        filters['unit_id'] = unit_id
+    units = {}
+    for unit, submissions, passed in UnitStat.objects.filter(**filters).values_list(
+            'unit_id', 'submissions', 'passed'):
+        units[unit] = {'submissions': submissions, 'passed': passed,
+                       'completionRate': _rate(passed, submissions), 'questions': {}}
+    for unit, question, attempts, correct in QuestionStat.objects.filter(**filters).values_list(
+            'unit_id', 'question_id', 'attempts', 'correct'):
+        entry = units.get(unit)
+        if entry is not None:
+            entry['questions'][question] = {
+                'attempts': attempts, 'correct': correct,
+                'difficulty': _rate(attempts - correct, attempts),
+            }
+    return units
@@ -0,0 +1,48 @@
+"""Background refresh for data derived from the lesson packs and static files.
+
+The lesson index and the sync manifest are rebuilt here, off the request
+path: requests read whatever was built last and never wait for a rescan.
+"""
+import os
+import threading
+import time
+
+from .auditlog import audit_log
+
+
+class Refresher:
+    """Calls ``refresh`` every ``interval`` seconds on a daemon thread, one per process.
+
+    ``ensure_started`` is cheap enough to call on every request. It starts
+    the thread on first use, and again in a forked child, where the parent's
+    thread does not exist. A refresh that raises is logged and retried on
+    the next tick.
+    """
+
+    def __init__(self, name, refresh, interval):
+        self.name = name
+        self.refresh = refresh
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self.runs = 0
+        self.errors = 0
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or self.interval <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name=self.name, daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                self.errors += 1
+                audit_log.log('refresh_error', sample=False, name=self.name, error=repr(e))
+            self.runs += 1
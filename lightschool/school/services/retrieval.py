@@ -0,0 +1,196 @@
+"""BM25 search over lesson cards and quiz explanations.
+
+The tutor uses it to answer from real lesson text when the AI is
+unavailable, and to send the AI a few relevant snippets as context. There
+is one inverted index per (locale, subject), rebuilt from per-pack tokens
+when one of its packs changes, so a lesson edit re-tokenizes only that pack.
+"""
+import math
+import threading
+
+from django.conf import settings
+
+from .lessons import iter_lesson_pack_files, load_catalog, pack_file_signature
+from .refresher import Refresher
+from .text import normalize_tokens
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Snippets from the learner's own grade outrank equally good ones from other grades.
+GRADE_BOOST = 1.5
+
+
+class Snippet:
+    """One searchable piece of lesson text."""
+
+    __slots__ = ('text', 'subject', 'grade', 'unit_id', 'kind')
+
+    def __init__(self, text, subject, grade, unit_id, kind):
+        self.text = text
+        self.subject = subject
+        self.grade = grade
+        self.unit_id = unit_id
+        self.kind = kind
+
+    def __repr__(self):
+        return f'Snippet({self.subject}/{self.grade}/{self.unit_id}: {self.text!r})'
+
+
+def pack_snippets(catalog):
+    """Yield (snippet, indexed text) for every card and quiz explanation in a pack."""
+    for unit in catalog.units:
+        for card in unit.cards:
+            if not card.body:
+                continue
+            text = card.body if card.title else f'{unit.title}: {card.body}'
+            indexed = ' '.join(filter(None, (unit.title, card.title, card.body, card.caption)))
+            yield Snippet(text, catalog.subject, catalog.grade, unit.id, 'card'), indexed
+        for question in unit.quiz:
+            if question.explanation:
+                indexed = ' '.join(filter(None, (unit.title, question.prompt, question.explanation)))
+                yield Snippet(question.explanation, catalog.subject, catalog.grade, unit.id, 'quiz'), indexed
+
+
+class BM25Index:
+    """Inverted index (token -> {doc id: term frequency})."""
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}
+        self.lengths = {}
+        self.total_length = 0
+        self._next_id = 0
+
+    def add(self, snippet, tokens):
+        doc_id = self._next_id
+        self._next_id += 1
+        self.docs[doc_id] = snippet
+        self.lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+        for token in tokens:
+            postings = self.postings.setdefault(token, {})
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+        return doc_id
+
+    def search(self, tokens, k, grade=None, min_match=0.0):
+        """Return up to ``k`` (score, snippet) pairs, best first.
+
+        ``min_match`` is the share of distinct query tokens a snippet must contain.
+        """
+        n = len(self.docs)
+        terms = set(tokens)
+        if not n or not terms:
+            return []
+        avg_length = self.total_length / n
+        scores = {}
+        matched = {}
+        for token in terms:
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+        needed = min_match * len(terms)
+        results = []
+        for doc_id, score in scores.items():
+            if matched[doc_id] < needed:
+                continue
+            if grade is not None and self.docs[doc_id].grade == grade:
+                score *= GRADE_BOOST
+            results.append((score, doc_id))
+        results.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, self.docs[doc_id]) for score, doc_id in results[:k]]
+
+
+class LessonIndex:
+    """BM25 indexes for every lesson pack, kept in step with the pack versions.
+
+    ``refresh`` builds new indexes to the side and swaps them in with one
+    assignment, so ``search`` reads them without a lock and never waits for
+    a rebuild. Only packs whose file changed are reloaded, and only packs
+    whose version changed are re-tokenized. After the first build a
+    background thread refreshes every ``check_interval`` seconds; with 0,
+    every search checks instead (tests, development).
+    """
+
+    def __init__(self, packs=iter_lesson_pack_files, load=load_catalog, check_interval=2.0):
+        self.packs = packs
+        self.load = load
+        self.check_interval = check_interval
+        self._indexes = None  # (locale, subject) -> BM25Index; replaced whole, never changed in place
+        self._packs = {}  # (locale, subject, grade) -> (file signature, version, [(snippet, tokens)])
+        self._lock = threading.Lock()  # one refresh at a time
+        self._refresher = Refresher('lesson-index', self.refresh, check_interval)
+
+    def refresh(self, force=False):
+        """Re-read changed packs (every pack with ``force``) and swap in the new indexes."""
+        with self._lock:
+            packs = {}
+            changed = set()
+            for locale, subject, grade, path in self.packs():
+                key = (locale, subject, grade)
+                signature = pack_file_signature(path)
+                old = self._packs.get(key)
+                if old is not None and not force and signature is not None and old[0] == signature:
+                    packs[key] = old
+                    continue
+                try:
+                    catalog = self.load(subject, grade, locale)
+                except (OSError, ValueError, KeyError, TypeError):
+                    if old is not None:
+                        packs[key] = old
+                    continue
+                if old is not None and old[1] == catalog.version:
+                    packs[key] = (signature, old[1], old[2])
+                    continue
+                packs[key] = (signature, catalog.version, self._tokenize(catalog, locale))
+                changed.add((locale, subject))
+            changed.update(key[:2] for key in self._packs.keys() - packs.keys())
+            indexes = dict(self._indexes or {})
+            for locale, subject in changed:
+                index = BM25Index()
+                for key in sorted(packs):
+                    if key[:2] == (locale, subject):
+                        for snippet, tokens in packs[key][2]:
+                            index.add(snippet, tokens)
+                if index.docs:
+                    indexes[(locale, subject)] = index
+                else:
+                    indexes.pop((locale, subject), None)
+            self._packs = packs
+            self._indexes = indexes
+
+    @staticmethod
+    def _tokenize(catalog, locale):
+        docs = []
+        for snippet, text in pack_snippets(catalog):
+            tokens = normalize_tokens(text, locale)
+            if tokens:
+                docs.append((snippet, tokens))
+        return docs
+
+    def search(self, query, subject, locale, grade=None, k=3, min_match=0.0):
+        """Top ``k`` (score, Snippet) pairs for ``query`` within one subject and locale."""
+        if self._indexes is None or self.check_interval <= 0:
+            self.refresh()
+        if self.check_interval > 0:
+            self._refresher.ensure_started()
+        index = self._indexes.get((locale, subject))
+        if index is None:
+            return []
+        return index.search(normalize_tokens(query, locale), k, grade=grade, min_match=min_match)
+
+    def stats(self):
+        indexes = self._indexes or {}
+        return {
+            'packs': len(self._packs),
+            'snippets': sum(len(index.docs) for index in indexes.values()),
+            'terms': sum(len(index.postings) for index in indexes.values()),
+            'refresh_errors': self._refresher.errors,
+        }
+
+
+lesson_index = LessonIndex(check_interval=getattr(settings, 'LESSON_PACK_CHECK_INTERVAL', 2.0))
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    One process-wide table maps each in-flight key to a
+    ``concurrent.futures.Future``. The first caller for a key runs the work;
+    callers arriving while it is in flight share its result or exception.
+    ``do`` blocks the calling thread and ``ado`` awaits with
+    ``asyncio.wrap_future``, so threads and every event loop in the process
+    (under WSGI, a new one per request) wait on the same call.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def _join(self, key):
+        """(future, True if this caller runs the work)."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            # Running futures cannot be cancelled, so no waiter can cancel it for the others.
+            future.set_running_or_notify_cancel()
+            self.executed += 1
+            return future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def ado(self, key, coro_fn):
+        """Async ``do``. The shared work runs as its own task, so a caller that
+        is cancelled (say, a closed connection) does not cancel it for everyone else."""
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.get_running_loop().create_task(coro_fn())
+            task.add_done_callback(lambda t: self._finish(key, future, t))
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _finish(self, key, future, task):
+        if task.cancelled():
+            self._settle(key, future, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._settle(key, future, error=task.exception())
+        else:
+            self._settle(key, future, task.result())
+
+    def stats(self):
+        return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
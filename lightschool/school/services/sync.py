@@ -0,0 +1,203 @@
+"""Offline sync for the service worker.
+
+``SyncManifest`` lists every lesson pack and static asset with a content
+hash. The service worker keeps the copy it last synced and, on the next
+sync, downloads only what changed; a grade's packs are fetched together
+in one batch (``batch_cache``). Both responses are pre-encoded and carry
+ETags, so an unchanged manifest costs a 304.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .auditlog import audit_log
+from .catalog import content_hash
+from .lessons import iter_lesson_pack_files, load_catalog, pack_file_signature
+from .payloads import EncodedPayload, catalog_json_body
+from .refresher import Refresher
+
+# The service worker is served from the site root (see service_worker_payload), not as an asset.
+SERVICE_WORKER = 'sw.js'
+
+
+def pack_key(locale, subject, grade):
+    return f'{locale}/{subject}/{grade}'
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return content_hash(f.read())
+
+
+class SyncManifest:
+    """Content hashes of all lesson packs and static assets, rebuilt only when something changed.
+
+    After the first build a background thread rescans the filesystem every
+    ``check_interval`` seconds (with 0, every ``payload`` call does), so
+    requests are served the last manifest built and never wait for a scan.
+    An asset is only rehashed, and a pack only reloaded, when its size or
+    mtime changed. A pack that fails to load is logged and left out.
+    """
+
+    def __init__(self, static_dirs, static_url='/static/', packs=iter_lesson_pack_files,
+                 load=load_catalog, check_interval=2.0):
+        self.static_dirs = [os.fspath(d) for d in static_dirs]
+        self.static_url = static_url
+        self.packs = packs
+        self.load = load
+        self.check_interval = check_interval
+        self._lock = threading.Lock()  # one rebuild at a time
+        self._file_hashes = {}  # path -> ((size, mtime), hash)
+        self._pack_versions = {}  # pack key -> (file signature, version or None when it failed to load)
+        self._payload = None
+        self._state = None
+        self._refresher = Refresher('sync-manifest', self.rebuild, check_interval)
+        self.builds = 0
+        self.bad_packs = 0
+
+    def assets(self):
+        """{url: content hash} for every file under the static dirs except the service worker."""
+        hashes = {}
+        for root in self.static_dirs:
+            for dirpath, _dirnames, filenames in os.walk(root):
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    relative = os.path.relpath(path, root).replace(os.sep, '/')
+                    if relative == SERVICE_WORKER:
+                        continue
+                    stat = os.stat(path)
+                    signature = (stat.st_size, stat.st_mtime_ns)
+                    cached = self._file_hashes.get(path)
+                    if cached is None or cached[0] != signature:
+                        cached = self._file_hashes[path] = (signature, _file_hash(path))
+                    hashes[self.static_url + relative] = cached[1]
+        return dict(sorted(hashes.items()))
+
+    def pack_versions(self):
+        """{"locale/subject/grade": pack version} for every lesson pack that loads."""
+        cached, versions = {}, {}
+        for locale, subject, grade, path in self.packs():
+            key = pack_key(locale, subject, grade)
+            signature = pack_file_signature(path)
+            entry = self._pack_versions.get(key)
+            if entry is None or signature is None or entry[0] != signature:
+                try:
+                    entry = (signature, self.load(subject, grade, locale).version)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    # Logged once per file version; the other packs still sync.
+                    entry = (signature, None)
+                    self.bad_packs += 1
+                    audit_log.log('sync_error', sample=False, pack=key, error=repr(e))
+            cached[key] = entry
+            if entry[1] is not None:
+                versions[key] = entry[1]
+        self._pack_versions = cached
+        return versions
+
+    def rebuild(self):
+        """Rescan the packs and assets and swap in a new payload if anything changed."""
+        with self._lock:
+            state = (self.pack_versions(), self.assets())
+            if state != self._state:
+                packs, assets = state
+                body = json.dumps({'packs': packs, 'assets': assets}, sort_keys=True).encode('utf-8')
+                version = content_hash(body)
+                body = json.dumps({'version': version, 'packs': packs, 'assets': assets}).encode('utf-8')
+                self._payload = EncodedPayload(body, version)
+                self._state = state
+                self.builds += 1
+
+    def payload(self):
+        """The manifest as an EncodedPayload whose ETag is the manifest's own hash."""
+        if self._payload is None or self.check_interval <= 0:
+            self.rebuild()
+        if self.check_interval > 0:
+            self._refresher.ensure_started()
+        return self._payload
+
+    def stats(self):
+        return {'builds': self.builds, 'assets': len(self._file_hashes), 'bad_packs': self.bad_packs,
+                'refresh_errors': self._refresher.errors}
+
+
+sync_manifest = SyncManifest(
+    getattr(settings, 'STATICFILES_DIRS', []),
+    static_url=getattr(settings, 'STATIC_URL', '/static/'),
+    check_interval=getattr(settings, 'LESSON_PACK_CHECK_INTERVAL', 2.0),
+)
+
+
+class BatchCache:
+    """Recently requested pack batches, reused while none of their packs changed."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, locale, grade, catalogs):
+        """Pre-encoded batch of ``catalogs``, rebuilt when one of them changes."""
+        key = (locale, grade, tuple(c.subject for c in catalogs))
+        versions = tuple(c.version for c in catalogs)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                return entry[1]
+        payload = _batch_payload(locale, grade, catalogs)
+        with self._lock:
+            self._entries[key] = (versions, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return payload
+
+
+batch_cache = BatchCache()
+
+
+def grade_catalogs(locale, grade, subjects=None):
+    """Catalogs of a grade's packs in ``locale``, optionally only for ``subjects``."""
+    available = sorted(subject for pack_locale, subject, pack_grade, _path in iter_lesson_pack_files()
+                       if pack_locale == locale and pack_grade == grade)
+    if subjects is not None:
+        available = [subject for subject in available if subject in subjects]
+    return [load_catalog(subject, grade, locale) for subject in available]
+
+
+def _batch_payload(locale, grade, catalogs):
+    # Splice the packs' cached canonical JSON rather than re-encoding them.
+    packs = b','.join(
+        json.dumps(catalog.subject).encode('utf-8')
+        + b':{"version":' + json.dumps(catalog.version).encode('utf-8')
+        + b',"data":' + catalog_json_body(catalog) + b'}'
+        for catalog in catalogs
+    )
+    head = json.dumps({'locale': locale, 'grade': grade})[:-1].encode('utf-8')
+    body = head + b',"packs":{' + packs + b'}}'
+    return EncodedPayload(body, content_hash(body))
+
+
+_service_worker = {}
+
+
+def service_worker_payload():
+    """The service worker script, re-read when the file changes."""
+    path = None
+    for root in getattr(settings, 'STATICFILES_DIRS', []):
+        candidate = os.path.join(root, SERVICE_WORKER)
+        if os.path.exists(candidate):
+            path = candidate
+            break
+    if path is None:
+        return None
+    mtime = os.stat(path).st_mtime_ns
+    cached = _service_worker.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            body = f.read()
+        cached = _service_worker[path] = (mtime, EncodedPayload(body, content_hash(body), 'text/javascript'))
+    return cached[1]
@@ -0,0 +1,90 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# Words, plus arithmetic symbols so "2 + 3" and "2 - 3" stay distinct.
+_WORD_RE = re.compile(r"[^\W_]+|[+\-*/×÷=<>]", re.UNICODE)
+
+CONTRACTIONS = {
+    'en': {"what's": 'what is', "whats": 'what is', "how's": 'how is', "where's": 'where is',
+           "who's": 'who is', "it's": 'it is', "that's": 'that is', "don't": 'do not',
+           "doesn't": 'does not', "can't": 'can not', "i'm": 'i am'},
+    'es': {},
+}
+
+STOPWORDS = {
+    'en': frozenset("""
+        a an the is are was were be been am do does did what whats which who whom how why when
+        where can could would should will shall may might must i me my you your we our it its
+        this that these those of to in on at for by with about from and or but so if then please
+        tell explain mean means meaning lumi hey hi hello there some any not
+    """.split()),
+    'es': frozenset("""
+        el la los las un una unos unas que es son era fue ser esta estan de del al a en con por
+        para y o pero si como cual cuales quien donde cuando me mi mis tu tus te se lo le les
+        su sus por favor dime explica explicame significa hola lumi no
+    """.split()),
+}
+
+# Question keys keep the words that change what is asked: "why" vs "how",
+# "is it even" vs "is it not even".
+QUESTION_KEY_STOPWORDS = {
+    'en': STOPWORDS['en'] - frozenset('what whats which who whom how why when where not'.split()),
+    'es': STOPWORDS['es'] - frozenset('que cual cuales quien donde cuando como no'.split()),
+}
+
+_SUFFIXES = {
+    'en': (('ies', 'y'), ('ing', ''), ('ed', ''), ('es', ''), ('s', '')),
+    'es': (('ciones', 'cion'), ('es', ''), ('s', '')),
+}
+
+
+_CONTRACTION_RES = {
+    locale: re.compile(r"\b(" + "|".join(re.escape(short) for short in table) + r")(?!\w)")
+    for locale, table in CONTRACTIONS.items() if table
+}
+
+
+def fold(text):
+    """Lowercase and strip accents so 'Qué' and 'que' compare equal."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+@lru_cache(maxsize=16384)
+def stem(token, locale):
+    """Very light suffix stripping; good enough to match 'nouns' with 'noun'."""
+    for suffix, replacement in _SUFFIXES.get(locale, _SUFFIXES['en']):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            if suffix == 's' and token.endswith('ss'):
+                return token
+            return token[:-len(suffix)] + replacement
+    return token
+
+
+def tokenize(text, locale='en'):
+    """Split text into folded, contraction-expanded word tokens (stopwords kept)."""
+    text = fold((text or '').replace('’', "'"))
+    contractions = _CONTRACTION_RES.get(locale)
+    if contractions is not None and ("'" in text or 'whats' in text):
+        table = CONTRACTIONS[locale]
+        text = contractions.sub(lambda m: table[m.group(1)], text)
+    return _WORD_RE.findall(text)
+
+
+def normalize_tokens(text, locale='en'):
+    """Content tokens of ``text``: folded, stopwords removed, lightly stemmed."""
+    stopwords = STOPWORDS.get(locale, STOPWORDS['en'])
+    return [stem(token, locale) for token in tokenize(text, locale) if token not in stopwords]
+
+
+def normalize_question(text, locale='en'):
+    """Canonical form of a question, used as a cache / dedup key; '' when it has no content words."""
+    tokens = tokenize(text, locale)
+    stopwords = STOPWORDS.get(locale, STOPWORDS['en'])
+    if all(token in stopwords for token in tokens):
+        return ''
+    kept_stopwords = QUESTION_KEY_STOPWORDS.get(locale, QUESTION_KEY_STOPWORDS['en'])
+    return ' '.join(stem(token, locale) for token in tokens if token not in kept_stopwords)
@@ -1,172 +1,233 @@
 import json
-import requests
-import random
-import re
-import ast
 import os
+import time
 from pathlib import Path
 
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import calculator
+from .admission import AdmissionGate, CircuitBreaker, RateLimiter
+from .auditlog import audit_log
+from .metrics import TUTOR_SECONDS, timed
+from .openai_client import OpenAIClient
+from .retrieval import lesson_index
+from .singleflight import SingleFlight
+from .tutor_cache import reply_cache
+from .tutor_rules import RuleEngine
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # OpenAI configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+OPENAI_URL = os.getenv('OPENAI_URL', "https://api.openai.com/v1/chat/completions")
+
+# Shared by all requests so connections are pooled and kept alive.
+openai_client = OpenAIClient(
+    OPENAI_URL,
+    OPENAI_API_KEY,
+    timeout=getattr(settings, 'TUTOR_AI_TIMEOUT', 10.0),
+    pool_size=getattr(settings, 'TUTOR_AI_POOL_SIZE', 32),
+)
+
+# Concurrent identical questions wait on one upstream call, from any thread or event loop.
+ai_flight = SingleFlight()
+
+# Admission control for upstream calls; a question turned away by any of
+# these gets the offline reply straight away.
+ai_rate_limiter = RateLimiter(
+    getattr(settings, 'TUTOR_AI_RATE_PER_MINUTE', 10) / 60,
+    getattr(settings, 'TUTOR_AI_BURST', 5),
+)
+ai_gate = AdmissionGate(
+    getattr(settings, 'TUTOR_AI_MAX_CONCURRENCY', 32),
+    queue_size=getattr(settings, 'TUTOR_AI_QUEUE_SIZE', 16),
+    queue_timeout=getattr(settings, 'TUTOR_AI_QUEUE_TIMEOUT', 1.0),
+)
+ai_breaker = CircuitBreaker(
+    getattr(settings, 'TUTOR_AI_BREAKER_FAILURES', 5),
+    getattr(settings, 'TUTOR_AI_BREAKER_RESET', 30.0),
+)
+
+TUTOR_RULES_PATH = BASE_DIR / 'data' / 'tutor_rules.json'
+
+# Compiled once and hot-reloaded when the rules file changes.
+rule_engine = RuleEngine(TUTOR_RULES_PATH, check_interval=getattr(settings, 'TUTOR_RULES_CHECK_INTERVAL', 2.0))
+
+# Lesson snippets sent to the AI as context, and what a snippet needs (BM25
+# score, share of the question's words) to be used as an offline answer.
+TUTOR_CONTEXT_SNIPPETS = getattr(settings, 'TUTOR_CONTEXT_SNIPPETS', 3)
+TUTOR_LESSON_MIN_SCORE = getattr(settings, 'TUTOR_LESSON_MIN_SCORE', 2.0)
+TUTOR_LESSON_MIN_MATCH = getattr(settings, 'TUTOR_LESSON_MIN_MATCH', 0.6)
+
 
 def load_tutor_rules():
     """Load tutor rules JSON."""
-    file_path = BASE_DIR / 'data' / 'tutor_rules.json'
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open(TUTOR_RULES_PATH, 'r', encoding='utf-8') as f:
         return json.load(f)
 
 def get_rule_based_reply(message, subject, grade, locale):
     """Get fallback reply from rules."""
-    rules = load_tutor_rules()
-    loc_rules = rules.get(locale, {})
-    key = f"{subject}:{message.lower().split()[0]}"  # simple heuristic
-    if key in loc_rules:
-        return random.choice(loc_rules[key])
-    # default
+    reply = rule_engine.reply(message, subject, locale)
+    if reply:
+        return reply
+    return _default_reply(locale)
+
+
+def _default_reply(locale):
     return "Keep practicing! You're doing great." if locale == 'en' else "¡Sigue practicando! Lo estás haciendo genial."
 
 
+def _grade_number(grade):
+    try:
+        return int(grade)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_lesson_reply(message, subject, grade, locale):
+    """Best-matching lesson card or quiz explanation for the question, or None."""
+    results = lesson_index.search(message, subject, locale, grade=_grade_number(grade), k=1,
+                                  min_match=TUTOR_LESSON_MIN_MATCH)
+    if results and results[0][0] >= TUTOR_LESSON_MIN_SCORE:
+        return results[0][1].text
+    return None
+
+
+def get_offline_reply(message, subject, grade, locale):
+    """Reply without the AI: a matching rule, else lesson text, else encouragement."""
+    with timed(TUTOR_SECONDS, 'rules'):
+        reply = rule_engine.reply(message, subject, locale)
+    if reply:
+        return {"reply": reply, "source": "rules"}
+    with timed(TUTOR_SECONDS, 'lessons'):
+        reply = get_lesson_reply(message, subject, grade, locale)
+    if reply:
+        return {"reply": reply, "source": "lessons"}
+    return {"reply": _default_reply(locale), "source": "rules"}
+
+
+def _lesson_context(message, subject, grade, locale):
+    """Texts of the lesson snippets most relevant to the question."""
+    if not TUTOR_CONTEXT_SNIPPETS:
+        return []
+    results = lesson_index.search(message, subject, locale, grade=_grade_number(grade), k=TUTOR_CONTEXT_SNIPPETS)
+    return [snippet.text for _score, snippet in results]
+
+
 def _extract_arithmetic_expression(text: str) -> str | None:
     """Try to extract a simple arithmetic expression from text.
 
     This converts common words like 'plus' -> '+' and then looks for a sequence
     of digits/operators. Returns the expression string or None.
     """
-    if not text or not re.search(r"\d", text):
-        return None
-    t = text.lower()
-    # word -> symbol map
-    words = {
-        r"plus": "+",
-        r"minus": "-",
-        r"times|multiplied by|multiply by": "*",
-        r"x\b": "*",
-        r"divided by|over|divide by": "/",
-        r"what is|what's|calculate|compute|=": "",
-        r"\?": "",
-    }
-    for pat, rep in words.items():
-        t = re.sub(pat, rep, t)
-    # keep only digits, whitespace and arithmetic symbols/parentheses/dot
-    m = re.search(r"[0-9\s\+\-\*\/\(\)\.]+", t)
-    if not m:
-        return None
-    expr = m.group(0).strip()
-    # quick sanity: must contain at least one operator
-    if not re.search(r"[\+\-\*\/]", expr):
-        return None
-    return expr
+    return calculator.extract_expression(text)
 
 
 def _safe_eval(expr: str) -> float | int:
-    """Safely evaluate a simple arithmetic expression using ast parsing.
+    """Safely evaluate a simple arithmetic expression.
 
-    Allows only numeric constants and + - * / and parentheses.
-    Raises ValueError on disallowed nodes or parse errors.
+    Allows only numeric constants and + - * / and parentheses, within the
+    calculator's size and nesting limits. Raises ValueError otherwise.
     """
-    node = ast.parse(expr, mode='eval')
-
-    def _eval(n):
-        if isinstance(n, ast.Expression):
-            return _eval(n.body)
-        if isinstance(n, ast.Constant):
-            if isinstance(n.value, (int, float)):
-                return n.value
-            raise ValueError("Invalid constant")
-        if isinstance(n, ast.BinOp):
-            left = _eval(n.left)
-            right = _eval(n.right)
-            if isinstance(n.op, ast.Add):
-                return left + right
-            if isinstance(n.op, ast.Sub):
-                return left - right
-            if isinstance(n.op, ast.Mult):
-                return left * right
-            if isinstance(n.op, ast.Div):
-                return left / right
-            raise ValueError("Operator not allowed")
-        if isinstance(n, ast.UnaryOp) and isinstance(n.op, (ast.UAdd, ast.USub)):
-            val = _eval(n.operand)
-            return +val if isinstance(n.op, ast.UAdd) else -val
-        # disallow everything else
-        raise ValueError("Disallowed expression")
-
-    return _eval(node)
+    return calculator.evaluate(expr)
 
-def get_ai_reply(message, subject, grade, locale):
-    """Get reply from OpenAI API."""
-    if not OPENAI_API_KEY:
-        print("ERROR: No OpenAI API key found")
-        return None
-        
-    print("\n=== DEBUG: Starting OpenAI Request ===")
-    print(f"Message: {message}")
-    print(f"Subject: {subject}")
-    print(f"Grade: {grade}")
-    print(f"Locale: {locale}")
-    
+def _build_ai_payload(message, subject, grade, locale, stream=False):
+    """Chat completion request body for a tutor question.
+
+    Streamed replies are shown as they arrive, so they ask for plain text
+    instead of the JSON wrapper.
+    """
     # Construct the system and user messages
-    system_msg = (
-        "You are Lumi, a cheerful K-5 tutor. You MUST respond with ONLY a single line containing "
-        "a JSON object in this EXACT format: {\"answer\":\"your response here\"} where your response "
-        f"is one short kid-friendly sentence. Use language: {locale}. Keep the answer under 140 characters."
-    )
-    
+    if stream:
+        system_msg = (
+            "You are Lumi, a cheerful K-5 tutor. Respond with ONLY one short kid-friendly sentence "
+            f"in plain text. Use language: {locale}. Keep the answer under 140 characters."
+        )
+    else:
+        system_msg = (
+            "You are Lumi, a cheerful K-5 tutor. You MUST respond with ONLY a single line containing "
+            "a JSON object in this EXACT format: {\"answer\":\"your response here\"} where your response "
+            f"is one short kid-friendly sentence. Use language: {locale}. Keep the answer under 140 characters."
+        )
+
+    context = _lesson_context(message, subject, grade, locale)
+    if context:
+        system_msg += " Base your answer on these lesson notes:\n" + "\n".join(f"- {text}" for text in context)
+
     user_msg = f"Subject: {subject}, Grade: {grade}. Question: {message}"
-    
+
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": user_msg}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 150,
+        "stream": stream,
+    }
+
+
+def _parse_ai_response(status_code, body):
+    """Extract the answer from an upstream response, or None."""
+    if status_code != 200:
+        audit_log.log('ai_error', sample=False, status=status_code, error=str(body))
+        return None
     try:
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": user_msg}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 150
-        }
-        
-        print("Sending request to OpenAI...")
-        response = requests.post(OPENAI_URL, headers=headers, json=payload, timeout=10)
-        print(f"OpenAI response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                reply = data['choices'][0]['message']['content'].strip()
-                print(f"Raw reply: {reply}")
-                
-                # Try to parse as JSON
-                try:
-                    parsed = json.loads(reply)
-                    if isinstance(parsed, dict) and 'answer' in parsed:
-                        return parsed['answer'].strip()
-                except:
-                    print("Could not parse response as JSON")
-                    
-            except Exception as e:
-                print(f"Error parsing response: {str(e)}")
-                
-        else:
-            print(f"Error from OpenAI API: {response.text}")
-            
+        reply = body['choices'][0]['message']['content'].strip()
     except Exception as e:
-        print(f"Error making request: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        audit_log.log('ai_error', sample=False, status=status_code, error=f"Unexpected response shape: {e!r}")
         return None
+    audit_log.log('ai_response', raw_reply=reply)
+    # Try to parse as JSON
+    try:
+        parsed = json.loads(reply)
+        if isinstance(parsed, dict) and 'answer' in parsed:
+            return parsed['answer'].strip()
+    except (ValueError, AttributeError):
+        pass
+    audit_log.log('ai_error', sample=False, status=status_code, error="Reply is not the expected JSON", raw_reply=reply)
     return None
 
-def get_tutor_reply(message, subject, grade, locale):
-    """Get tutor reply, try OpenAI first, fallback to rules."""
-    # Short-circuit: if this is a simple arithmetic question, answer immediately
+
+def get_ai_reply(message, subject, grade, locale):
+    """Get reply from OpenAI API."""
+    if not openai_client.api_key:
+        return None
+    try:
+        status_code, body = openai_client.complete(_build_ai_payload(message, subject, grade, locale))
+    except Exception as e:
+        ai_breaker.record_failure()
+        audit_log.log('ai_error', sample=False, error=repr(e))
+        return None
+    _record_upstream_status(status_code)
+    return _parse_ai_response(status_code, body)
+
+
+async def aget_ai_reply(message, subject, grade, locale):
+    """Get reply from OpenAI API without blocking the event loop."""
+    if not openai_client.api_key:
+        return None
+    try:
+        status_code, body = await openai_client.acomplete(_build_ai_payload(message, subject, grade, locale))
+    except Exception as e:
+        ai_breaker.record_failure()
+        audit_log.log('ai_error', sample=False, error=repr(e))
+        return None
+    _record_upstream_status(status_code)
+    return _parse_ai_response(status_code, body)
+
+
+def _record_upstream_status(status_code):
+    # Only upstream errors count against the breaker; a badly formatted reply still means it is up.
+    if status_code == 200:
+        ai_breaker.record_success()
+    else:
+        ai_breaker.record_failure()
+
+def get_calculator_reply(message):
+    """Answer simple arithmetic questions immediately, or return None."""
     expr = _extract_arithmetic_expression(message)
     if expr:
         try:
@@ -175,12 +236,271 @@ def get_tutor_reply(message, subject, grade, locale):
             if isinstance(val, float) and val.is_integer():
                 val = int(val)
             return {"reply": str(val), "source": "calculator"}
-        except Exception:
+        except calculator.CalculatorError:
             # fall through to normal behavior
             pass
+    return None
+
+
+def _fetch_ai_reply(message, subject, grade, locale):
+    """AI reply for a question, with identical concurrent questions sharing one call."""
+    key = reply_cache.make_key(message, subject, grade, locale)
+
+    def fetch():
+        if not ai_gate.acquire():
+            return None
+        try:
+            # Asked only once a slot is held, so a trial call the breaker lets through is made.
+            if not ai_breaker.allow():
+                return None
+            reply = get_ai_reply(message, subject, grade, locale)
+        finally:
+            ai_gate.release()
+        if reply:
+            reply_cache.set(message, subject, grade, locale, reply)
+        return reply
+
+    return ai_flight.do(key, fetch) if key else fetch()
+
+
+async def _afetch_ai_reply(message, subject, grade, locale):
+    """Async _fetch_ai_reply."""
+    key = reply_cache.make_key(message, subject, grade, locale)
+
+    async def fetch():
+        if not await ai_gate.aacquire():
+            return None
+        try:
+            if not ai_breaker.allow():
+                return None
+            reply = await aget_ai_reply(message, subject, grade, locale)
+        finally:
+            ai_gate.release()
+        if reply:
+            reply_cache.set(message, subject, grade, locale, reply)
+        return reply
+
+    return await ai_flight.ado(key, fetch) if key else await fetch()
+
+
+class OpenAIBackend:
+    """The chat completions API behind rate limiting, admission control, coalescing and the reply cache."""
+
+    source = 'ai'
+
+    def start(self):
+        pass
+
+    def reply(self, message, subject, grade, locale, client_key=None):
+        if not ai_rate_limiter.allow(client_key):
+            return None
+        with timed(TUTOR_SECONDS, 'ai'):
+            return _fetch_ai_reply(message, subject, grade, locale)
+
+    async def areply(self, message, subject, grade, locale, client_key=None):
+        if not ai_rate_limiter.allow(client_key):
+            return None
+        with timed(TUTOR_SECONDS, 'ai'):
+            return await _afetch_ai_reply(message, subject, grade, locale)
+
+    def stream(self, message, subject, grade, locale, client_key=None):
+        """Sync ``astream``."""
+        if not (openai_client.api_key and ai_rate_limiter.allow(client_key) and ai_gate.acquire()):
+            return
+        parts = []
+        try:
+            if not ai_breaker.allow():
+                return
+            for text in openai_client.stream(_build_ai_payload(message, subject, grade, locale, stream=True)):
+                parts.append(text)
+                yield text
+            ai_breaker.record_success()
+        except Exception as e:
+            ai_breaker.record_failure()
+            audit_log.log('ai_error', sample=False, error=repr(e), tokens=len(parts), stream=True)
+            return
+        finally:
+            ai_gate.release()
+        reply = ''.join(parts).strip()
+        if reply:
+            reply_cache.set(message, subject, grade, locale, reply)
+
+    async def astream(self, message, subject, grade, locale, client_key=None):
+        """Yield reply text as the upstream generates it; a complete reply is cached."""
+        if not (openai_client.api_key and ai_rate_limiter.allow(client_key) and await ai_gate.aacquire()):
+            return
+        parts = []
+        try:
+            if not ai_breaker.allow():
+                return
+            async for text in openai_client.astream(_build_ai_payload(message, subject, grade, locale, stream=True)):
+                parts.append(text)
+                yield text
+            ai_breaker.record_success()
+        except Exception as e:
+            ai_breaker.record_failure()
+            audit_log.log('ai_error', sample=False, error=repr(e), tokens=len(parts), stream=True)
+            return
+        finally:
+            ai_gate.release()
+        reply = ''.join(parts).strip()
+        if reply:
+            reply_cache.set(message, subject, grade, locale, reply)
+
+    def stats(self):
+        return {'configured': int(bool(openai_client.api_key))}
+
+
+def make_backends(names):
+    """Tutor backends by name: 'openai', 'local', or the dotted path of a backend class."""
+    backends = []
+    for name in names:
+        if name == 'openai':
+            backends.append(OpenAIBackend())
+        elif name == 'local':
+            from .local_model import local_tutor
+            backends.append(local_tutor)
+        elif '.' in name:
+            backends.append(import_string(name)())
+        else:
+            raise ValueError(f"Unknown tutor backend: {name}")
+    return backends
+
+
+# Asked in order for questions the calculator and cache cannot answer; the
+# first reply wins, and with none the offline reply is used.
+tutor_backends = make_backends(getattr(settings, 'TUTOR_BACKENDS', ['openai']))
+
+
+def start_backends():
+    """Start backends that keep a model loaded, so the first question does not wait for it."""
+    for backend in tutor_backends:
+        backend.start()
+
+
+def _immediate_reply(message, subject, grade, locale):
+    """Calculator or cached AI reply, when there is one; both answer without waiting."""
+    # Short-circuit: if this is a simple arithmetic question, answer immediately
+    with timed(TUTOR_SECONDS, 'calculator'):
+        calculated = get_calculator_reply(message)
+    if calculated:
+        return calculated
+    with timed(TUTOR_SECONDS, 'cache'):
+        cached = reply_cache.get(message, subject, grade, locale)
+    if cached:
+        return {"reply": cached, "source": "cache"}
+    return None
+
+
+def get_tutor_reply(message, subject, grade, locale, client_key=None):
+    """Get tutor reply: calculator, then cached AI replies, then the tutor backends, fallback to rules.
+
+    ``client_key`` (the session) is rate limited before the AI is asked.
+    """
+    immediate = _immediate_reply(message, subject, grade, locale)
+    if immediate:
+        return immediate
+
+    for backend in tutor_backends:
+        reply = backend.reply(message, subject, grade, locale, client_key)
+        if reply:
+            return {"reply": reply, "source": backend.source}
+    return get_offline_reply(message, subject, grade, locale)
 
-    reply = get_ai_reply(message, subject, grade, locale)
-    source = "ai" if reply else "rules"
+
+async def aget_tutor_reply(message, subject, grade, locale, client_key=None):
+    """Async get_tutor_reply: the upstream call does not hold a thread."""
+    immediate = _immediate_reply(message, subject, grade, locale)
+    if immediate:
+        return immediate
+
+    for backend in tutor_backends:
+        reply = await backend.areply(message, subject, grade, locale, client_key)
+        if reply:
+            return {"reply": reply, "source": backend.source}
+    return get_offline_reply(message, subject, grade, locale)
+
+
+def stream_tutor_reply(message, subject, grade, locale, client_key=None):
+    """Yield (event, data) pairs for a streamed tutor reply.
+
+    Calculator, cached and rule replies arrive whole in one ``reply`` event;
+    backend replies arrive as ``token`` events while they are generated.
+    Every stream ends with a ``done`` event naming the source. Time to first
+    token and total time go to the audit log separately.
+    """
+    start = time.perf_counter()
+    immediate = _immediate_reply(message, subject, grade, locale)
+    if immediate:
+        first_token_at = time.perf_counter()
+        yield 'reply', immediate
+        source, reply = immediate['source'], immediate['reply']
+    else:
+        first_token_at = source = None
+        parts = []
+        for backend in tutor_backends:
+            for text in backend.stream(message, subject, grade, locale, client_key):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(text)
+                yield 'token', {'text': text}
+            if parts:
+                source = backend.source
+                TUTOR_SECONDS.labels(f'{source}_first_token').observe(first_token_at - start)
+                TUTOR_SECONDS.labels(f'{source}_stream').observe(time.perf_counter() - start)
+                break
+        reply = ''.join(parts).strip()
+    yield from _end_stream(message, subject, grade, locale, start, first_token_at, source, reply)
+
+
+async def astream_tutor_reply(message, subject, grade, locale, client_key=None):
+    """Async stream_tutor_reply: waiting on the upstream does not hold a thread."""
+    start = time.perf_counter()
+    immediate = _immediate_reply(message, subject, grade, locale)
+    if immediate:
+        first_token_at = time.perf_counter()
+        yield 'reply', immediate
+        source, reply = immediate['source'], immediate['reply']
+    else:
+        first_token_at = source = None
+        parts = []
+        for backend in tutor_backends:
+            async for text in backend.astream(message, subject, grade, locale, client_key):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(text)
+                yield 'token', {'text': text}
+            if parts:
+                source = backend.source
+                TUTOR_SECONDS.labels(f'{source}_first_token').observe(first_token_at - start)
+                TUTOR_SECONDS.labels(f'{source}_stream').observe(time.perf_counter() - start)
+                break
+        reply = ''.join(parts).strip()
+    for event in _end_stream(message, subject, grade, locale, start, first_token_at, source, reply):
+        yield event
+
+
+def _end_stream(message, subject, grade, locale, start, first_token_at, source, reply):
+    """The closing events of a stream: the offline reply if nothing answered, then ``done``; logs the timings."""
     if not reply:
-        reply = get_rule_based_reply(message, subject, grade, locale)
-    return {"reply": reply, "source": source}
\ No newline at end of file
+        offline = get_offline_reply(message, subject, grade, locale)
+        source, reply = offline['source'], offline['reply']
+        first_token_at = time.perf_counter()
+        yield 'reply', offline
+    end = time.perf_counter()
+    audit_log.log('tutor_stream', subject=subject, grade=grade, locale=locale, message=message,
+                  source=source, reply=reply, ttft_ms=round((first_token_at - start) * 1000, 1),
+                  total_ms=round((end - start) * 1000, 1))
+    yield 'done', {'source': source}
+
+
+def tutor_stats():
+    """Counters for the tutor's reply cache, upstream call coalescing, admission control and backends."""
+    return {
+        'cache': reply_cache.stats(),
+        'coalescing': ai_flight.stats(),
+        'rate_limit': ai_rate_limiter.stats(),
+        'gate': ai_gate.stats(),
+        'breaker': ai_breaker.stats(),
+        'backends': {backend.source: backend.stats() for backend in tutor_backends},
+    }
@@ -0,0 +1,128 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .text import normalize_question
+
+
+class LocalCacheBackend:
+    """In-process dict with TTL and LRU eviction."""
+
+    def __init__(self, max_entries=2048, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """Shares cached replies between processes through a Django cache alias."""
+
+    def __init__(self, alias='default', ttl=3600, prefix='tutor-reply'):
+        self.alias = alias
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key):
+        # Hash so keys are safe for memcached (no spaces, bounded length).
+        return f'{self.prefix}:{hashlib.sha1(key.encode("utf-8")).hexdigest()}'
+
+    def get(self, key):
+        return caches[self.alias].get(self._key(key))
+
+    def set(self, key, value):
+        caches[self.alias].set(self._key(key), value, self.ttl)
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+class TutorReplyCache:
+    """Caches AI tutor replies keyed by the normalized question and its context."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(message, subject, grade, locale):
+        """Cache key, or None when the question has no content words to key on."""
+        question = normalize_question(message, locale)
+        if not question:
+            return None
+        return f'{locale}|{subject}|{grade}|{question}'
+
+    def get(self, message, subject, grade, locale):
+        key = self.make_key(message, subject, grade, locale)
+        reply = self.backend.get(key) if key else None
+        if reply is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return reply
+
+    def set(self, message, subject, grade, locale, reply):
+        key = self.make_key(message, subject, grade, locale)
+        if key and reply:
+            self.backend.set(key, reply)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def make_backend(name, ttl, max_entries, alias):
+    if name == 'django':
+        return DjangoCacheBackend(alias=alias, ttl=ttl)
+    if name == 'local':
+        return LocalCacheBackend(max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unknown tutor cache backend: {name}")
+
+
+reply_cache = TutorReplyCache(make_backend(
+    getattr(settings, 'TUTOR_CACHE_BACKEND', 'local'),
+    ttl=getattr(settings, 'TUTOR_CACHE_TTL', 3600),
+    max_entries=getattr(settings, 'TUTOR_CACHE_MAX_ENTRIES', 2048),
+    alias=getattr(settings, 'TUTOR_CACHE_ALIAS', 'default'),
+))
@@ -0,0 +1,111 @@
+import json
+import os
+import random
+import threading
+import time
+
+from .auditlog import audit_log
+from .text import stem, tokenize
+
+# Keyword matches from the rule key itself ("math:addition" -> "addition")
+# outrank aliases listed under "_keywords".
+PRIMARY_WEIGHT = 2
+ALIAS_WEIGHT = 1
+
+
+class CompiledRules:
+    """Tutor rules with an inverted index per (locale, subject): token -> {rule key: weight}."""
+
+    def __init__(self, rules):
+        keywords = rules.get('_keywords', {})
+        self.replies = {}
+        self.index = {}
+        self.order = {}
+        for locale, loc_rules in rules.items():
+            if locale.startswith('_'):
+                continue
+            self.replies[locale] = {key: tuple(replies) for key, replies in loc_rules.items()}
+            self.order[locale] = {key: i for i, key in enumerate(loc_rules)}
+            for key in loc_rules:
+                subject, _, keyword = key.partition(':')
+                index = self.index.setdefault((locale, subject), {})
+                self._add(index, key, keyword, locale, PRIMARY_WEIGHT)
+                for alias in keywords.get(locale, {}).get(key, ()):
+                    self._add(index, key, alias, locale, ALIAS_WEIGHT)
+
+    @staticmethod
+    def _add(index, key, phrase, locale, weight):
+        for token in tokenize(phrase, locale):
+            postings = index.setdefault(stem(token, locale), {})
+            postings[key] = max(postings.get(key, 0), weight)
+
+    def match(self, message, subject, locale):
+        """Return the best-scoring rule key for ``subject``, or None."""
+        index = self.index.get((locale, subject))
+        if not index:
+            return None
+        scores = {}
+        for token in tokenize(message, locale):
+            postings = index.get(stem(token, locale))
+            if postings:
+                for key, weight in postings.items():
+                    scores[key] = scores.get(key, 0) + weight
+        if not scores:
+            return None
+        order = self.order[locale]
+        return max(scores, key=lambda key: (scores[key], -order[key]))
+
+    def reply(self, message, subject, locale):
+        key = self.match(message, subject, locale)
+        if key is None:
+            return None
+        return random.choice(self.replies[locale][key])
+
+
+class RuleEngine:
+    """Loads tutor rules once and recompiles them when the file changes.
+
+    The file's mtime is re-checked at most every ``check_interval`` seconds,
+    so lookups in between do no disk I/O. A reload that fails (a half-written
+    or broken file) is logged and the last good rules stay in use; only the
+    first load raises.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if self._compiled is not None and mtime == self._mtime:
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        self._compiled = CompiledRules(rules)
+        self._mtime = mtime
+
+    def _reload(self):
+        try:
+            self._load()
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            if self._compiled is None:
+                raise
+            audit_log.log('rules_error', sample=False, error=repr(e), path=str(self.path))
+
+    @property
+    def compiled(self):
+        now = time.monotonic()
+        if self._compiled is None or now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if self._compiled is None or now - self._checked_at >= self.check_interval:
+                    self._reload()
+                    self._checked_at = now
+        return self._compiled
+
+    def reply(self, message, subject, locale):
+        """Best rule reply for the message, or None when nothing matches."""
+        return self.compiled.reply(message, subject, locale)
@@ -0,0 +1,182 @@
+"""Startup warm-up: load, validate and index lesson data before serving.
+
+``warm_up`` parses and validates every lesson pack on a thread pool (file
+reads overlap; JSON parsing itself still takes turns on the GIL), checking
+the copy the server reads (the lesson bundle's, when there is one), puts the
+catalogs and their API payloads in the pack cache, compiles the tutor rules,
+builds the lesson index and sync manifest, and starts tutor backends that
+keep a model loaded. With ``freeze=True`` it ends with ``gc.freeze()`` so
+that workers forked afterwards (gunicorn with ``preload_app``) share the
+loaded objects copy-on-write instead of copying the pages the garbage
+collector would otherwise touch; those workers start their backends after
+the fork.
+
+``warm_up_server`` runs it as WARMUP_MODE asks. The WSGI and ASGI entry
+points call it, so management commands (migrate, shell, test, ...) never
+warm up and never fail on a bad pack.
+"""
+import gc
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from . import lessons
+from .bundle import bundle_key
+from .catalog import footprint
+from .lessons import iter_lesson_pack_files, load_catalog, pack_cache, validate_lesson_pack
+from .payloads import catalog_json_payload
+
+
+# The report from startup, when warm_up_server() ran the warm-up; shown on /metrics/.
+last_report = None
+
+
+class WarmupReport:
+    """What was loaded, how long each stage took, and the memory held per locale."""
+
+    def __init__(self):
+        self.stages = {}  # stage -> seconds
+        self.locales = {}  # locale -> {'packs', 'seconds', 'bytes'}
+        self.errors = []  # "path: message" for data that failed to load
+        self.warnings = []
+        self.total_seconds = 0.0
+        self.frozen = 0
+
+    def add_pack(self, locale, seconds, size):
+        entry = self.locales.setdefault(locale, {'packs': 0, 'seconds': 0.0, 'bytes': 0})
+        entry['packs'] += 1
+        entry['seconds'] += seconds
+        entry['bytes'] += size
+
+    def summary(self):
+        lines = [f'warm-up: {self.total_seconds * 1000:.1f} ms'
+                 + (f', {self.frozen} objects frozen' if self.frozen else '')]
+        for stage, seconds in self.stages.items():
+            lines.append(f'  {stage:<12} {seconds * 1000:8.1f} ms')
+        for locale, entry in sorted(self.locales.items()):
+            lines.append(f"  locale {locale:<5} {entry['packs']:3d} packs {entry['seconds'] * 1000:8.1f} ms "
+                         f"{entry['bytes'] / 1024:8.1f} KiB")
+        lines.extend(f'  warning: {warning}' for warning in self.warnings)
+        lines.extend(f'  invalid: {error}' for error in self.errors)
+        return '\n'.join(lines)
+
+    def stats(self):
+        return {
+            'seconds': round(self.total_seconds, 4),
+            'errors': len(self.errors),
+            'frozen': self.frozen,
+            'stages': {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+            'locales': {locale: {'packs': entry['packs'], 'bytes': entry['bytes']}
+                        for locale, entry in self.locales.items()},
+        }
+
+
+def _served_from(locale, subject, grade, path):
+    """Where ``load_catalog`` reads the pack: the bundle when it holds the pack, else ``path``."""
+    key = bundle_key(subject, grade, locale)
+    if lessons.bundle is not None and key in lessons.bundle:
+        return f'{lessons.bundle.path}[{key}]'
+    return path
+
+
+def _load_pack(locale, subject, grade, path):
+    """Validate one pack as served and load it into the cache; returns (seconds, catalog)."""
+    start = time.perf_counter()
+    if _served_from(locale, subject, grade, path) != path:
+        body, _version = lessons.bundle.get(bundle_key(subject, grade, locale))
+    else:
+        with open(path, 'rb') as f:
+            body = f.read()
+    validate_lesson_pack(json.loads(body))
+    catalog = load_catalog(subject, grade, locale)
+    catalog_json_payload(catalog)
+    return time.perf_counter() - start, catalog
+
+
+def warm_up_server():
+    """Warm up before serving when WARMUP_MODE asks for it; returns the report, or None.
+
+    Raises ImproperlyConfigured on invalid lesson data unless WARMUP_STRICT is off.
+    """
+    global last_report
+    mode = getattr(settings, 'WARMUP_MODE', 'off')
+    if mode == 'off':
+        return None
+    if mode not in ('on', 'prefork'):
+        raise ImproperlyConfigured(f"WARMUP_MODE must be 'off', 'on' or 'prefork', not {mode!r}")
+    report = last_report = warm_up(workers=getattr(settings, 'WARMUP_WORKERS', 8), freeze=mode == 'prefork')
+    sys.stderr.write(report.summary() + '\n')
+    if report.errors and getattr(settings, 'WARMUP_STRICT', True):
+        raise ImproperlyConfigured("Invalid lesson data:\n" + "\n".join(report.errors))
+    return report
+
+
+def warm_up(workers=8, freeze=False):
+    """Preload everything the first requests would otherwise load; returns a WarmupReport.
+
+    Invalid packs are listed in ``report.errors`` rather than raised, so the
+    caller decides whether to refuse to start.
+    """
+    from .retrieval import lesson_index
+    from .sync import sync_manifest
+    from .tutor import rule_engine, start_backends
+
+    report = WarmupReport()
+    start = time.perf_counter()
+
+    stage = time.perf_counter()
+    packs = list(iter_lesson_pack_files())
+    if len(packs) > pack_cache.maxsize:
+        report.warnings.append(f'{len(packs)} packs but LESSON_PACK_CACHE_SIZE is {pack_cache.maxsize}; '
+                               'not all of them stay loaded')
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(_load_pack, *pack): pack for pack in packs}
+        # Objects shared between packs (interned text, skeletons) count once,
+        # for the first locale that holds them.
+        seen = set()
+        for future, (locale, subject, grade, path) in sorted(futures.items(), key=lambda item: item[1][0]):
+            try:
+                seconds, catalog = future.result()
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                report.errors.append(f'{_served_from(locale, subject, grade, path)}: {e!r}')
+                continue
+            report.add_pack(locale, seconds, footprint(catalog, seen))
+    report.stages['packs'] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    try:
+        rule_engine.compiled
+    except (OSError, ValueError) as e:
+        report.errors.append(f'{rule_engine.path}: {e!r}')
+    report.stages['rules'] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    try:
+        lesson_index.refresh(force=True)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        report.errors.append(f'lesson index: {e!r}')
+    report.stages['index'] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    try:
+        sync_manifest.payload()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        report.errors.append(f'sync manifest: {e!r}')
+    report.stages['manifest'] = time.perf_counter() - stage
+
+    if not freeze:
+        # Threads do not survive a fork; pre-forked workers start their backends in post_fork.
+        stage = time.perf_counter()
+        start_backends()
+        report.stages['backends'] = time.perf_counter() - stage
+
+    if freeze:
+        gc.collect()
+        gc.freeze()
+        report.frozen = gc.get_freeze_count()
+    report.total_seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,11 @@
+from django.contrib.sessions.backends.file import SessionStore as FileSessionStore
+
+from .services.metrics import PROGRESS_SECONDS, timed
+
+
+class SessionStore(FileSessionStore):
+    """The file session backend, with saves timed for /metrics/."""
+
+    def save(self, must_create=False):
+        with timed(PROGRESS_SECONDS, 'session_save'):
+            super().save(must_create=must_create)
@@ -29,4 +29,62 @@ window.addEventListener('beforeinstallprompt', (e) => {
         deferredPrompt.userChoice.then(() => deferredPrompt = null);
     };
     document.querySelector('.nav-right').appendChild(btn);
-});
\ No newline at end of file
+});
+
+// Offline progress queue: events wait in localStorage and are synced in one batch.
+const PROGRESS_QUEUE_KEY = 'lightschool-progress-queue';
+const PROGRESS_SYNC_BATCH = 500;
+
+function readProgressQueue() {
+    try {
+        return JSON.parse(localStorage.getItem(PROGRESS_QUEUE_KEY) || '[]');
+    } catch (e) {
+        return [];
+    }
+}
+
+function queueProgressEvent(event) {
+    const queue = readProgressQueue();
+    queue.push(Object.assign({
+        clientTs: Date.now(),
+        idempotencyKey: `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`,
+    }, event));
+    localStorage.setItem(PROGRESS_QUEUE_KEY, JSON.stringify(queue));
+    return flushProgressQueue();
+}
+
+function flushProgressQueue() {
+    const batch = readProgressQueue().slice(0, PROGRESS_SYNC_BATCH);
+    if (!batch.length || !navigator.onLine) return Promise.resolve(null);
+    return fetch('/api/progress/sync/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken(),
+        },
+        body: JSON.stringify({events: batch}),
+    }).then(r => {
+        if (!r.ok) throw new Error('Progress sync failed');
+        // Drop what was sent; events queued in the meantime stay for the next flush.
+        const sent = new Set(batch.map(e => e.idempotencyKey));
+        const remaining = readProgressQueue().filter(e => !sent.has(e.idempotencyKey));
+        localStorage.setItem(PROGRESS_QUEUE_KEY, JSON.stringify(remaining));
+        return r.json();
+    }).catch(() => null);
+}
+
+window.addEventListener('online', flushProgressQueue);
+window.addEventListener('load', flushProgressQueue);
+
+// Offline lessons: the service worker downloads what changed since its last sync.
+function postToServiceWorker(message) {
+    if (!('serviceWorker' in navigator)) return;
+    navigator.serviceWorker.ready.then(registration => registration.active?.postMessage(message));
+}
+
+function precacheGrade(locale, grade) {
+    postToServiceWorker({type: 'precache-grade', locale, grade});
+}
+
+window.addEventListener('online', () => postToServiceWorker({type: 'sync'}));
+window.addEventListener('load', () => postToServiceWorker({type: 'sync'}));
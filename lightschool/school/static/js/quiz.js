@@ -10,36 +10,54 @@ function initQuiz(unit, subject, grade, locale) {
 
 function submitQuiz(unit, subject, grade, locale) {
     const formData = new FormData(document.getElementById('quiz-form'));
-    let correct = 0;
-    const explanations = [];
+    const answers = {};
     unit.quiz.forEach(q => {
         const answer = formData.get(`q${q.id}`);
-        if (parseInt(answer) === q.answerIndex) {
+        if (answer !== null) {
+            answers[q.id] = parseInt(answer);
+        }
+    });
+    // Graded on the server, which also records the answers and saves progress
+    fetch('/api/quiz/submit/', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json', 'X-CSRFToken': getCSRFToken()},
+        body: JSON.stringify({subject: subject, grade: grade, unitId: unit.id, answers: answers}),
+    })
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(result => showResults(unit, result.score))
+        .catch(() => gradeOffline(unit, subject, grade, locale, answers));
+}
+
+function gradeOffline(unit, subject, grade, locale, answers) {
+    let correct = 0;
+    unit.quiz.forEach(q => {
+        if (answers[q.id] === q.answerIndex) {
             correct++;
         }
-        explanations.push(`<p><strong>${q.prompt}</strong><br>${q.explanation}</p>`);
     });
     const score = Math.round((correct / unit.quiz.length) * 100);
+    showResults(unit, score);
+
+    // Queue progress; it is synced in one batch when back online
+    queueProgressEvent({
+        locale: locale,
+        subject: subject,
+        grade: grade,
+        unitId: unit.id,
+        status: 'completed',
+        score: score,
+    });
+}
+
+function showResults(unit, score) {
+    const explanations = unit.quiz.map(q => `<p><strong>${q.prompt}</strong><br>${q.explanation}</p>`);
     document.getElementById('score').textContent = score;
     document.getElementById('explanations').innerHTML = explanations.join('');
     document.getElementById('feedback').style.display = 'block';
     document.getElementById('quiz-form').style.display = 'none';
-
-    // Post progress
-    fetch('/api/progress/set/', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-            'X-CSRFToken': getCSRFToken(),
-        },
-        body: JSON.stringify({
-            subject: subject,
-            grade: grade,
-            unitId: unit.id,
-            status: 'completed',
-            score: score,
-        }),
-    });
 }
 
 function getCSRFToken() {
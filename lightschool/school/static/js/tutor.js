@@ -2,6 +2,9 @@
 
 let currentSubject, currentGrade, currentLocale;
 
+// Reply sources that mean the AI was not used
+const OFFLINE_SOURCES = ['rules', 'lessons', 'local'];
+
 function openTutor() {
     document.getElementById('tutor-bubble').classList.remove('hidden');
     // Get current subject and grade
@@ -45,24 +48,80 @@ function sendTutorMessage() {
         locale: currentLocale
     });
 
+    const body = JSON.stringify({
+        message: message,
+        subject: currentSubject,
+        grade: currentGrade,
+        locale: currentLocale,
+    });
+    streamTutorReply(body).catch(error => {
+        console.warn('Tutor stream unavailable, asking for the whole reply:', error);
+        fetchTutorReply(body);
+    });
+}
+
+// Read the SSE stream from /api/tutor/stream/, showing tokens as they arrive.
+// Rejects (so the caller can fall back) only if nothing was shown yet.
+async function streamTutorReply(body) {
+    const response = await fetch('/api/tutor/stream/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken(),
+        },
+        body: body,
+    });
+    if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let msg = null;
+    const show = text => {
+        if (!msg) msg = addMessage('lumi', '');
+        msg.textContent += text;
+        msg.parentNode.scrollTop = msg.parentNode.scrollHeight;
+    };
+    try {
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let end;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+                const event = block.match(/^event: (.*)$/m)?.[1];
+                const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+                if (event === 'token') {
+                    show(data.text);
+                } else if (event === 'reply') {
+                    show(data.reply);
+                } else if (event === 'done' && OFFLINE_SOURCES.includes(data.source)) {
+                    document.getElementById('tutor-badge').classList.remove('hidden');
+                }
+            }
+        }
+    } catch (error) {
+        if (!msg) throw error;
+        console.error('Tutor stream interrupted:', error);
+    }
+    if (!msg) throw new Error('Empty tutor stream');
+}
+
+function fetchTutorReply(body) {
     fetch('/api/tutor/', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
             'X-CSRFToken': getCSRFToken(),
         },
-        body: JSON.stringify({
-            message: message,
-            subject: currentSubject,
-            grade: currentGrade,
-            locale: currentLocale,
-        }),
+        body: body,
     }).then(r => {
         if (!r.ok) throw new Error('Network response was not ok');
         return r.json();
     }).then(data => {
         addMessage('lumi', data.reply);
-        if (data.source === 'rules') {
+        if (OFFLINE_SOURCES.includes(data.source)) {
             document.getElementById('tutor-badge').classList.remove('hidden');
         }
     }).catch(error => {
@@ -84,6 +143,7 @@ function addMessage(sender, text) {
     msg.textContent = text;
     container.appendChild(msg);
     container.scrollTop = container.scrollHeight;
+    return msg;
 }
 
 function getCSRFToken() {
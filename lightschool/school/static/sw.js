@@ -1,58 +1,198 @@
 // Service Worker for PWA
+//
+// Served from /sw.js so it controls every page. Offline data is kept in sync
+// with /api/sync/manifest/, which lists a content hash for every lesson pack
+// and static asset. The manifest from the last sync is stored with the
+// caches; each sync downloads only the entries whose hash changed. Packs are
+// only kept for grades this device has opened (see precacheGrade in app.js),
+// and a grade's packs arrive in one batched request.
 
-const CACHE_NAME = 'lightschool-v1';
-const urlsToCache = [
-    '/',
-    '/static/css/theme.css',
-    '/static/js/app.js',
-    '/static/js/lesson.js',
-    '/static/js/quiz.js',
-    '/static/js/tutor.js',
-    '/static/manifest.json',
-    // Add icons
-];
+const STATIC_CACHE = 'lightschool-static';
+const LESSON_CACHE = 'lightschool-lessons';
+const PAGE_CACHE = 'lightschool-pages';
+const SYNC_CACHE = 'lightschool-sync';
+const CACHE_NAMES = [STATIC_CACHE, LESSON_CACHE, PAGE_CACHE, SYNC_CACHE];
+
+const MANIFEST_URL = '/api/sync/manifest/';
+const SYNCED_KEY = '/sync/synced.json';  // what this device has: {version, locale, assets, packs}
+const MIN_SYNC_INTERVAL = 60 * 1000;  // routine syncs (page loads) at most once a minute
+
+let lastSync = 0;
+let syncing = Promise.resolve();
+
+function packUrl(locale, subject, grade) {
+    return `/api/lessons/?subject=${subject}&grade=${grade}&locale=${locale}`;
+}
+
+function pageUrls(subject, grade, units) {
+    const urls = [`/subject/${subject}/grade/${grade}/`];
+    for (const unit of units) {
+        urls.push(`/lesson/${subject}/${grade}/${unit.id}/`, `/quiz/${subject}/${grade}/${unit.id}/`);
+    }
+    return urls;
+}
+
+async function readSynced() {
+    const response = await (await caches.open(SYNC_CACHE)).match(SYNCED_KEY);
+    return response ? response.json() : {version: null, locale: null, assets: {}, packs: {}};
+}
+
+async function writeSynced(synced) {
+    const cache = await caches.open(SYNC_CACHE);
+    await cache.put(SYNCED_KEY, new Response(JSON.stringify(synced), {
+        headers: {'Content-Type': 'application/json'},
+    }));
+}
+
+async function fetchManifest() {
+    // no-cache revalidates with the ETag, so an unchanged manifest is a 304.
+    const response = await fetch(MANIFEST_URL, {cache: 'no-cache'});
+    if (!response.ok) throw new Error('Sync manifest unavailable');
+    return response.json();
+}
+
+async function syncAssets(manifest, synced) {
+    const cache = await caches.open(STATIC_CACHE);
+    const changed = Object.keys(manifest.assets).filter(url => synced.assets[url] !== manifest.assets[url]);
+    await Promise.all(changed.map(async (url) => {
+        const response = await fetch(url, {cache: 'reload'});
+        if (response.ok) {
+            await cache.put(url, response);
+            synced.assets[url] = manifest.assets[url];
+        }
+    }));
+    for (const url of Object.keys(synced.assets)) {
+        if (!(url in manifest.assets)) {
+            await cache.delete(url);
+            delete synced.assets[url];
+        }
+    }
+}
+
+async function cachePages(urls) {
+    const cache = await caches.open(PAGE_CACHE);
+    await Promise.all(urls.map(async (url) => {
+        const response = await fetch(url, {credentials: 'same-origin'});
+        if (response.ok) await cache.put(url, response);
+    }));
+}
+
+async function fetchGrade(locale, grade, subjects, synced) {
+    // One request for all of a grade's changed packs.
+    const params = new URLSearchParams({locale, grade, subjects: subjects.join(',')});
+    const response = await fetch(`/api/lessons/batch/?${params}`);
+    if (!response.ok) return;
+    const batch = await response.json();
+    const cache = await caches.open(LESSON_CACHE);
+    for (const [subject, pack] of Object.entries(batch.packs)) {
+        await cache.put(packUrl(locale, subject, grade), new Response(JSON.stringify(pack.data), {
+            headers: {'Content-Type': 'application/json', 'ETag': `"${pack.version}"`},
+        }));
+        // Pages are rendered in the session's language, so only refresh that locale's.
+        if (locale === synced.locale) {
+            await cachePages(pageUrls(subject, grade, pack.data.units));
+        }
+        synced.packs[`${locale}/${subject}/${grade}`] = pack.version;
+    }
+}
+
+async function syncPacks(manifest, synced, request) {
+    const lessonCache = await caches.open(LESSON_CACHE);
+    const groups = new Map();  // "locale/grade" -> [subject, ...]
+    const wanted = (key) => {
+        const [locale, subject, grade] = key.split('/');
+        const group = `${locale}/${grade}`;
+        if (!groups.has(group)) groups.set(group, []);
+        groups.get(group).push(subject);
+    };
+    for (const key of Object.keys(synced.packs)) {
+        if (!(key in manifest.packs)) {
+            const [locale, subject, grade] = key.split('/');
+            await lessonCache.delete(packUrl(locale, subject, grade));
+            delete synced.packs[key];
+        } else if (synced.packs[key] !== manifest.packs[key]) {
+            wanted(key);
+        }
+    }
+    if (request) {
+        for (const key of Object.keys(manifest.packs)) {
+            const [locale, , grade] = key.split('/');
+            if (locale === request.locale && Number(grade) === request.grade && !(key in synced.packs)) {
+                wanted(key);
+            }
+        }
+    }
+    for (const [group, subjects] of groups) {
+        const [locale, grade] = group.split('/');
+        await fetchGrade(locale, grade, subjects, synced);
+    }
+}
+
+function runSync(request) {
+    // Syncs run one at a time; a failed one (say, offline) keeps what is cached.
+    syncing = syncing.then(async () => {
+        const synced = await readSynced();
+        if (request) synced.locale = request.locale;
+        const manifest = await fetchManifest();
+        lastSync = Date.now();
+        if (manifest.version === synced.version && !request) return;
+        await syncAssets(manifest, synced);
+        await syncPacks(manifest, synced, request);
+        synced.version = manifest.version;
+        await writeSynced(synced);
+    }).catch(() => {});
+    return syncing;
+}
 
 self.addEventListener('install', (event) => {
+    event.waitUntil(runSync().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (event) => {
     event.waitUntil(
-        caches.open(CACHE_NAME).then((cache) => {
-            return cache.addAll(urlsToCache);
-        })
+        caches.keys()
+            .then(names => Promise.all(names.filter(name => !CACHE_NAMES.includes(name)).map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
     );
 });
 
-self.addEventListener('fetch', (event) => {
-    if (event.request.url.includes('/school/data/lessons/')) {
-        // Cache lessons JSON
-        event.respondWith(
-            caches.match(event.request).then((response) => {
-                return response || fetch(event.request).then((response) => {
-                    return caches.open(CACHE_NAME).then((cache) => {
-                        cache.put(event.request, response.clone());
-                        return response;
-                    });
-                });
-            })
-        );
-    } else {
-        // Cache-first for static
-        event.respondWith(
-            caches.match(event.request).then((response) => {
-                return response || fetch(event.request);
-            })
-        );
+self.addEventListener('message', (event) => {
+    const message = event.data || {};
+    if (message.type === 'precache-grade') {
+        event.waitUntil(runSync({locale: message.locale, grade: Number(message.grade)}));
+    } else if (message.type === 'sync' && Date.now() - lastSync >= MIN_SYNC_INTERVAL) {
+        event.waitUntil(runSync());
     }
 });
 
-self.addEventListener('activate', (event) => {
-    event.waitUntil(
-        caches.keys().then((cacheNames) => {
-            return Promise.all(
-                cacheNames.map((cacheName) => {
-                    if (cacheName !== CACHE_NAME) {
-                        return caches.delete(cacheName);
-                    }
-                })
-            );
-        })
-    );
-});
\ No newline at end of file
+async function cacheFirst(cacheName, request, key) {
+    const cached = await (await caches.open(cacheName)).match(key || request);
+    return cached || fetch(request);
+}
+
+async function networkFirst(cacheName, request) {
+    const cache = await caches.open(cacheName);
+    try {
+        const response = await fetch(request);
+        if (response.ok) await cache.put(request, response.clone());
+        return response;
+    } catch (e) {
+        return (await cache.match(request)) || (await cache.match('/')) || Response.error();
+    }
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+    if (url.pathname.startsWith('/static/')) {
+        event.respondWith(cacheFirst(STATIC_CACHE, request, url.pathname));
+    } else if (url.pathname === '/api/lessons/') {
+        // Synced packs are stored under one canonical URL per pack.
+        const params = url.searchParams;
+        const key = packUrl(params.get('locale') || 'en', params.get('subject'), params.get('grade'));
+        event.respondWith(cacheFirst(LESSON_CACHE, request, key));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(PAGE_CACHE, request));
+    }
+});
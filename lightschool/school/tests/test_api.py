@@ -1,7 +1,12 @@
+import gzip
 import json
 from django.test import TestCase, Client
 from django.urls import reverse
 
+from school.models import Progress, QuestionStat, QuizAttempt, UnitStat
+from school.services.lessons import load_catalog
+from school.services.metrics import HistogramFamily
+
 class APITestCase(TestCase):
     def setUp(self):
         self.client = Client()
@@ -29,6 +34,133 @@ class APITestCase(TestCase):
         data = response.json()
         self.assertIn('add_basics', data)
 
+    def test_api_progress_upserts_one_row(self):
+        for score in (40, 90):
+            self.client.post('/api/progress/set/', {
+                'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed', 'score': score,
+            }, content_type='application/json')
+        row = Progress.objects.get()
+        self.assertEqual((row.locale, row.subject, row.grade, row.unit_id, row.score), ('en', 'math', 1, 'add_basics', 90))
+        data = self.client.get('/api/progress/get/?subject=math&grade=1').json()
+        self.assertEqual(data, {'add_basics': {'status': 'completed', 'score': 90}})
+
+    def test_api_progress_rejects_bad_grade(self):
+        for grade in ('one', None, -1):
+            response = self.client.post('/api/progress/set/', {
+                'subject': 'math', 'grade': grade, 'unitId': 'add_basics', 'status': 'completed',
+            }, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+        self.assertFalse(Progress.objects.exists())
+
+    def test_api_progress_rejects_bad_fields(self):
+        valid = {'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed'}
+        for bad in ({'score': 'abc'}, {'score': 10 ** 30}, {'score': -5}, {'subject': ['math']},
+                    {'unitId': {'id': 1}}, {'status': 's' * 21}, {'unitId': ''}):
+            response = self.client.post('/api/progress/set/', dict(valid, **bad), content_type='application/json')
+            self.assertEqual(response.status_code, 400, bad)
+        self.assertFalse(Progress.objects.exists())
+
+    def test_legacy_session_progress_is_imported(self):
+        session = self.client.session
+        session['progress'] = {'en': {'math': {'1': {'sub_basics': {'status': 'completed', 'score': 70}}}}}
+        session.save()
+        response = self.client.post('/api/progress/set/', {
+            'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'in_progress',
+        }, content_type='application/json')
+        self.assertEqual(set(response.json()['en']['math']['1']), {'sub_basics', 'add_basics'})
+        self.assertNotIn('progress', self.client.session)
+
+    def sync(self, events):
+        return self.client.post('/api/progress/sync/', {'events': events}, content_type='application/json')
+
+    def test_api_progress_sync_batch(self):
+        events = [
+            {'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed', 'score': 60,
+             'clientTs': 1000, 'idempotencyKey': 'a'},
+            {'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed', 'score': 40,
+             'clientTs': 2000, 'idempotencyKey': 'b'},
+            {'subject': 'math', 'grade': 1, 'unitId': 'sub_basics', 'status': 'in_progress',
+             'clientTs': 1500, 'idempotencyKey': 'c'},
+            {'subject': 'math', 'unitId': 'broken'},
+        ]
+        data = self.sync(events).json()
+        self.assertEqual(data['applied'], 3)
+        self.assertEqual(data['rejected'], [3])
+        self.assertEqual(data['delta'], {'en': {'math': {'1': {
+            'add_basics': {'status': 'completed', 'score': 60},
+            'sub_basics': {'status': 'in_progress'},
+        }}}})
+        self.assertEqual(Progress.objects.count(), 2)
+
+    def test_api_progress_sync_rejects_out_of_range_events(self):
+        event = {'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed', 'score': 80}
+        events = [
+            dict(event, grade=-1),
+            dict(event, score=10 ** 30),
+            dict(event, score=101),
+            dict(event, subject='m' * 33),
+            dict(event, unitId='u' * 65),
+            dict(event, idempotencyKey='k' * 65),
+            event,
+        ]
+        data = self.sync(events).json()
+        self.assertEqual((data['applied'], data['rejected']), (1, [0, 1, 2, 3, 4, 5]))
+        self.assertEqual(Progress.objects.get().score, 80)
+
+    def test_api_progress_sync_is_idempotent_and_last_write_wins(self):
+        event = {'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed',
+                 'score': 80, 'clientTs': 5000, 'idempotencyKey': 'k1'}
+        self.sync([event])
+        data = self.sync([event]).json()
+        self.assertEqual((data['applied'], data['duplicates'], data['delta']), (0, 1, {}))
+        # An older status loses; a newer one wins but keeps the best score.
+        data = self.sync([dict(event, status='in_progress', score=10, clientTs=4000, idempotencyKey='k2')]).json()
+        self.assertEqual(data['delta'], {})
+        data = self.sync([dict(event, status='in_progress', score=10, clientTs=6000, idempotencyKey='k3')]).json()
+        self.assertEqual(data['delta']['en']['math']['1']['add_basics'], {'status': 'in_progress', 'score': 80})
+
+    def submit_quiz(self, client, answers, unit_id='add_basics'):
+        return client.post('/api/quiz/submit/', {
+            'subject': 'math', 'grade': 1, 'unitId': unit_id, 'answers': answers,
+        }, content_type='application/json')
+
+    def test_api_quiz_submit_grades_on_server(self):
+        data = self.submit_quiz(self.client, {'q1': 1, 'q2': 0}).json()
+        self.assertEqual((data['correct'], data['total']), (1, 5))
+        self.assertEqual(data['score'], 20)
+        self.assertEqual([r['correct'] for r in data['results']], [True, False, False, False, False])
+        self.assertEqual(QuizAttempt.objects.count(), 5)
+        row = Progress.objects.get()
+        self.assertEqual((row.unit_id, row.status, row.score), ('add_basics', 'completed', 20))
+        self.assertEqual(self.submit_quiz(self.client, {}, unit_id='nope').status_code, 404)
+
+    def test_api_quiz_ignores_out_of_range_choices(self):
+        data = self.submit_quiz(self.client, {'q1': 10 ** 30, 'q2': -1}).json()
+        self.assertEqual([r['chosen'] for r in data['results'][:2]], [None, None])
+        self.assertEqual(QuizAttempt.objects.filter(chosen__isnull=True).count(), 5)
+
+    def test_api_quiz_rejects_bad_unit_id(self):
+        for unit_id in (['add_basics'], {'id': 'add_basics'}, '', None):
+            self.assertEqual(self.submit_quiz(self.client, {}, unit_id=unit_id).status_code, 400, unit_id)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+    def test_api_quiz_retake_keeps_best_score(self):
+        self.submit_quiz(self.client, {'q1': 1})
+        self.submit_quiz(self.client, {})
+        self.assertEqual(Progress.objects.get().score, 20)
+
+    def test_api_quiz_analytics_rollups(self):
+        self.submit_quiz(self.client, {'q1': 1, 'q2': 1, 'q3': 1, 'q4': 0})
+        self.submit_quiz(Client(), {'q1': 1, 'q2': 0})
+        data = self.client.get('/api/quiz/analytics/?subject=math&grade=1&locale=en').json()
+        unit = data['add_basics']
+        self.assertEqual((unit['submissions'], unit['passed'], unit['completionRate']), (2, 1, 0.5))
+        self.assertEqual(unit['questions']['q1'], {'attempts': 2, 'correct': 2, 'difficulty': 0.0})
+        self.assertEqual(unit['questions']['q2']['difficulty'], 0.5)
+        self.assertEqual(QuestionStat.objects.count(), 5)
+        self.assertEqual(UnitStat.objects.count(), 1)
+
     def test_api_tutor(self):
         response = self.client.post('/api/tutor/', {
             'message': 'What is addition?',
@@ -39,4 +171,93 @@ class APITestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         data = response.json()
         self.assertIn('reply', data)
-        self.assertIn('source', data)
\ No newline at end of file
+        self.assertIn('source', data)
+    def test_api_lessons_etag(self):
+        response = self.client.get('/api/lessons/?subject=math&grade=1&locale=en')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        response = self.client.get('/api/lessons/?subject=math&grade=1&locale=en', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_api_lessons_gzip(self):
+        response = self.client.get('/api/lessons/?subject=math&grade=1&locale=en', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(data['subject'], 'math')
+
+    def test_api_lessons_not_found(self):
+        response = self.client.get('/api/lessons/?subject=math&grade=9&locale=en')
+        self.assertEqual(response.status_code, 404)
+
+    def test_sync_manifest_lists_pack_and_asset_hashes(self):
+        response = self.client.get('/api/sync/manifest/')
+        self.assertEqual(response.status_code, 200)
+        manifest = response.json()
+        self.assertEqual(manifest['packs']['en/math/1'], load_catalog('math', 1, 'en').version)
+        self.assertIn('/static/js/app.js', manifest['assets'])
+        self.assertNotIn('/static/sw.js', manifest['assets'])
+        self.assertEqual(response['ETag'], f'"{manifest["version"]}"')
+        response = self.client.get('/api/sync/manifest/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_api_lessons_batch(self):
+        response = self.client.get('/api/lessons/batch/?grade=1&locale=en')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['locale'], data['grade']), ('en', 1))
+        self.assertIn('english', data['packs'])
+        math = data['packs']['math']
+        self.assertEqual(math['version'], load_catalog('math', 1, 'en').version)
+        self.assertEqual(math['data'], load_catalog('math', 1, 'en').as_dict())
+        response = self.client.get('/api/lessons/batch/?grade=1&locale=en&subjects=math', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(list(json.loads(gzip.decompress(response.content))['packs']), ['math'])
+        self.assertEqual(self.client.get('/api/lessons/batch/?locale=en').status_code, 400)
+        self.assertEqual(self.client.get('/api/lessons/batch/?grade=9&locale=en').status_code, 404)
+
+    def test_service_worker_served_from_root(self):
+        response = self.client.get('/sw.js')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/javascript')
+        self.assertIn(b'/api/sync/manifest/', response.content)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/lesson/math/1/add_basics/')
+        self.client.post('/api/progress/set/', {
+            'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed',
+        }, content_type='application/json')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('lightschool_request_seconds_count{view="school:lesson",method="GET",status="2xx"}', body)
+        for stage in ('lightschool_lessons_seconds_count{stage="pack_load"}',
+                      'lightschool_lessons_seconds_count{stage="render"}',
+                      'lightschool_progress_seconds_count{stage="write"}',
+                      'lightschool_progress_seconds_count{stage="session_save"}'):
+            self.assertIn(stage, body)
+        self.assertIn('lightschool_pack_cache{stat="hits"}', body)
+
+    def test_metrics_bound_the_method_label(self):
+        for method in ('FOO1', 'FOO2'):
+            self.client.generic(method, '/api/lessons/')
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('method="other"', body)
+        self.assertNotIn('FOO', body)
+
+    def test_histogram_family_caps_label_sets(self):
+        family = HistogramFamily('test_seconds', 'Test.', ('stage',), max_children=2)
+        for stage in ('a', 'b', 'c', 'd'):
+            family.labels(stage).observe(0.5)
+        lines = family.collect()
+        self.assertIn('test_seconds_count{stage="b"} 1', lines)
+        self.assertIn('test_seconds_count{stage="other"} 2', lines)
+        self.assertFalse([line for line in lines if 'stage="c"' in line])
+
+    def test_histogram_buckets_are_cumulative(self):
+        family = HistogramFamily('test_seconds', 'Test.', ('stage',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5):
+            family.labels('a').observe(value)
+        lines = family.collect()
+        self.assertIn('test_seconds_bucket{stage="a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="a",le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{stage="a",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{stage="a"} 4', lines)
@@ -0,0 +1,292 @@
+import gc
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+
+from school.services.catalog import LessonCatalog, UnitProgress, footprint
+from school.services.bundle import LessonBundle, bundle_key, write_bundle
+from school.services import lessons, warmup
+from school.services.lessons import LessonPackCache, iter_lesson_pack_files, lesson_pack_path, pack_cache
+from school.services.sync import SyncManifest
+
+
+class LessonPackCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / 'grade1.json'
+        self.write({'subject': 'math', 'grade': 1, 'locale': 'en', 'units': []})
+
+    def write(self, data, mtime_ns=None):
+        self.path.write_text(json.dumps(data), encoding='utf-8')
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_repeat_loads_hit_cache(self):
+        cache = LessonPackCache(maxsize=4, check_interval=60)
+        first = cache.get(('en', 'math', 1), self.path)
+        second = cache.get(('en', 'math', 1), self.path)
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_reloads_when_mtime_changes(self):
+        cache = LessonPackCache(maxsize=4, check_interval=0)
+        cache.get(('en', 'math', 1), self.path)
+        self.write({'subject': 'math', 'grade': 1, 'locale': 'en', 'units': [{'id': 'u'}]}, mtime_ns=10**18)
+        data = cache.get(('en', 'math', 1), self.path)
+        self.assertEqual(len(data['units']), 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_lru_eviction(self):
+        cache = LessonPackCache(maxsize=2, check_interval=60)
+        for grade in (1, 2, 3):
+            cache.get(('en', 'math', grade), self.path)
+        stats = cache.stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['evictions'], 1)
+
+    def test_missing_file(self):
+        cache = LessonPackCache()
+        with self.assertRaises(FileNotFoundError):
+            cache.get(('en', 'math', 9), Path(self.tmp.name) / 'missing.json')
+
+
+class LessonCatalogTestCase(SimpleTestCase):
+    def setUp(self):
+        self.catalog = LessonCatalog({
+            'subject': 'math', 'grade': 1, 'locale': 'en',
+            'units': [
+                {'id': 'a', 'title': 'A', 'cards': [], 'quiz': [{'id': 'q1', 'answerIndex': 2}]},
+                {'id': 'b', 'title': 'B', 'cards': [], 'quiz': []},
+            ],
+        })
+
+    def test_units_are_read_only(self):
+        unit = self.catalog.get_unit('a')
+        with self.assertRaises(AttributeError):
+            unit.title = 'changed'
+        self.assertEqual(self.catalog.get_unit('a').title, 'A')
+        self.assertIsNone(self.catalog.get_unit('missing'))
+
+    def test_progress_overlay_leaves_unit_untouched(self):
+        unit = self.catalog.get_unit('a')
+        view = UnitProgress(unit, {'status': 'completed'})
+        self.assertEqual(view.title, 'A')
+        self.assertEqual(view.progress['status'], 'completed')
+        self.assertFalse(hasattr(unit, 'progress'))
+
+    def test_round_trips_to_dict(self):
+        data = self.catalog.as_dict()
+        self.assertEqual(data['units'][0]['quiz'][0]['answerIndex'], 2)
+        self.assertEqual(LessonCatalog(data).as_dict(), data)
+
+    def test_compact_footprint_smaller_than_dicts(self):
+        path = Path(__file__).resolve().parent.parent / 'data' / 'lessons' / 'en' / 'math' / 'grade1.json'
+        data = json.loads(path.read_text(encoding='utf-8'))
+        self.assertLess(footprint(LessonCatalog(data)), footprint(data))
+
+    def test_neighbours_and_quiz_meta(self):
+        self.assertEqual(self.catalog.neighbours('a'), (None, 'b'))
+        self.assertEqual(self.catalog.neighbours('b'), ('a', None))
+        self.assertEqual(self.catalog.quiz_meta('a').answer_key, {'q1': 2})
+
+    def read_pack(self, locale):
+        path = Path(__file__).resolve().parent.parent / 'data' / 'lessons' / locale / 'math' / 'grade1.json'
+        return LessonCatalog(json.loads(path.read_text(encoding='utf-8')))
+
+    def test_locales_share_structure_and_strings(self):
+        en, es = self.read_pack('en'), self.read_pack('es')
+        self.assertIs(en.skeleton, es.skeleton)
+        self.assertEqual((es.subject, es.grade, es.locale), ('math', 1, 'es'))
+        self.assertIs(en.units[0].id, es.units[0].id)
+        self.assertIs(en.units[0].cards[1].src, es.units[0].cards[1].src)
+        self.assertNotEqual(en.units[0].title, es.units[0].title)
+        # With English loaded, Spanish adds little beyond its own text.
+        seen = set()
+        footprint(en, seen)
+        self.assertLess(footprint(es, seen), footprint(es) * 0.8)
+
+    def test_changed_structure_gets_its_own_skeleton(self):
+        data = self.catalog.as_dict()
+        data['units'][0]['quiz'][0]['answerIndex'] = 0
+        changed = LessonCatalog(data)
+        self.assertIsNot(changed.skeleton, self.catalog.skeleton)
+        self.assertEqual(changed.quiz_meta('a').answer_key, {'q1': 0})
+        self.assertEqual(self.catalog.quiz_meta('a').answer_key, {'q1': 2})
+
+
+class SyncManifestTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.static = Path(self.tmp.name)
+        (self.static / 'js').mkdir()
+        (self.static / 'js' / 'app.js').write_text('one', encoding='utf-8')
+        (self.static / 'sw.js').write_text('worker', encoding='utf-8')
+        self.versions = {'math': 'v1', 'english': 'v1'}
+        self.manifest = self.make_manifest(check_interval=0)
+
+    def make_manifest(self, check_interval):
+        return SyncManifest(
+            [self.static],
+            packs=lambda: [('en', subject, 1, None) for subject in sorted(self.versions)],
+            load=lambda subject, grade, locale: LessonCatalog(
+                {'subject': subject, 'grade': grade, 'locale': locale, 'units': []}, version=self.versions[subject]),
+            check_interval=check_interval,
+        )
+
+    def read(self):
+        return json.loads(self.manifest.payload().variants['identity'][0])
+
+    def test_lists_packs_and_assets(self):
+        manifest = self.read()
+        self.assertEqual(manifest['packs'], {'en/english/1': 'v1', 'en/math/1': 'v1'})
+        self.assertEqual(list(manifest['assets']), ['/static/js/app.js'])
+
+    def test_rebuilds_only_on_change(self):
+        first = self.read()
+        self.assertEqual(self.read(), first)
+        self.assertEqual(self.manifest.builds, 1)
+        self.versions['math'] = 'v2'
+        second = self.read()
+        self.assertEqual(second['packs']['en/math/1'], 'v2')
+        self.assertNotEqual(second['version'], first['version'])
+        (self.static / 'js' / 'app.js').write_text('two!', encoding='utf-8')
+        third = self.read()
+        self.assertNotEqual(third['assets']['/static/js/app.js'], second['assets']['/static/js/app.js'])
+        self.assertEqual(self.manifest.builds, 3)
+
+
+    def test_bad_pack_is_left_out(self):
+        load = self.manifest.load
+
+        def broken_math(subject, grade, locale):
+            if subject == 'math':
+                raise KeyError('units')
+            return load(subject, grade, locale)
+
+        self.manifest.load = broken_math
+        self.assertEqual(self.read()['packs'], {'en/english/1': 'v1'})
+        self.assertEqual(self.manifest.stats()['bad_packs'], 1)
+
+    def test_requests_do_not_rescan(self):
+        self.manifest = self.make_manifest(check_interval=60)
+        first = self.read()
+        (self.static / 'js' / 'app.js').write_text('two!', encoding='utf-8')
+        with mock.patch.object(self.manifest, 'assets', side_effect=AssertionError('scanned on a request')):
+            self.assertEqual(self.read(), first)
+        self.manifest.rebuild()
+        self.assertNotEqual(self.read()['assets'], first['assets'])
+        self.assertEqual(self.manifest.builds, 2)
+
+
+class WarmupTestCase(SimpleTestCase):
+    def with_invalid_pack(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        bad = Path(tmp.name) / 'grade9.json'
+        bad.write_text(json.dumps({'subject': 'math', 'grade': 9, 'locale': 'en'}), encoding='utf-8')
+        packs = list(iter_lesson_pack_files()) + [('en', 'math', 9, bad)]
+        patcher = mock.patch.object(warmup, 'iter_lesson_pack_files', lambda: packs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return bad
+
+    def test_preloads_every_pack(self):
+        pack_cache.clear()
+        report = warmup.warm_up(workers=4)
+        self.assertEqual(report.errors, [])
+        packs = list(iter_lesson_pack_files())
+        self.assertEqual(sum(entry['packs'] for entry in report.locales.values()), len(packs))
+        self.assertEqual(set(report.locales), {'en', 'es'})
+        self.assertTrue(all(entry['bytes'] > 0 for entry in report.locales.values()))
+        self.assertEqual(pack_cache.stats()['misses'], len(packs))
+        self.assertEqual(set(report.stages), {'packs', 'rules', 'index', 'manifest', 'backends'})
+
+    def test_invalid_pack_is_reported(self):
+        bad = self.with_invalid_pack()
+        report = warmup.warm_up(workers=2)
+        self.assertEqual(len(report.errors), 1)
+        self.assertIn(str(bad), report.errors[0])
+        self.assertIn('invalid:', report.summary())
+
+    def test_validates_the_bundle_when_it_serves(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = Path(tmp.name) / 'lessons.bundle'
+        write_bundle(path, {bundle_key('math', 1, 'en'): (b'{"subject": "math"}', 'v1')})
+        bundle = LessonBundle(path)
+        self.addCleanup(bundle.close)
+        pack_cache.clear()
+        self.addCleanup(pack_cache.clear)
+        with mock.patch.object(lessons, 'bundle', bundle):
+            report = warmup.warm_up(workers=2)
+        # The file on disk is valid; the bundled copy the server would serve is not.
+        self.assertEqual(report.errors[0], f"{path}[en/math/1]: ValueError('Invalid lesson pack structure')")
+
+    def test_server_warm_up_refuses_invalid_data(self):
+        self.with_invalid_pack()
+        self.addCleanup(setattr, warmup, 'last_report', None)
+        with override_settings(WARMUP_MODE='on'), mock.patch('sys.stderr', io.StringIO()):
+            with self.assertRaises(ImproperlyConfigured):
+                warmup.warm_up_server()
+        with override_settings(WARMUP_MODE='on', WARMUP_STRICT=False), mock.patch('sys.stderr', io.StringIO()):
+            warmup.warm_up_server()
+        self.assertEqual(warmup.last_report.stats()['errors'], 1)
+
+    def test_app_loading_does_not_warm_up(self):
+        self.with_invalid_pack()
+        with override_settings(WARMUP_MODE='on'), mock.patch.object(warmup, 'warm_up') as warm_up:
+            apps.get_app_config('school').ready()
+        warm_up.assert_not_called()
+
+    def test_prefork_freezes_loaded_objects(self):
+        self.addCleanup(gc.unfreeze)
+        report = warmup.warm_up(workers=2, freeze=True)
+        self.assertGreater(report.frozen, 0)
+        self.assertGreater(gc.get_freeze_count(), 0)
+
+
+class LessonBundleTestCase(SimpleTestCase):
+    def test_build_and_read_bundle(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / 'lessons.bundle'
+            call_command('build_lesson_bundle', output=str(output), stdout=io.StringIO())
+            bundle = LessonBundle(output)
+            self.addCleanup(bundle.close)
+            body, version = bundle.get(bundle_key('math', 1, 'es'))
+            expected = json.loads(lesson_pack_path('math', 1, 'es').read_text(encoding='utf-8'))
+            self.assertEqual(json.loads(body), expected)
+            self.assertEqual(len(version), 20)
+            self.assertIsNone(bundle.get(bundle_key('math', 9, 'es')))
+
+    def test_build_reports_malformed_packs(self):
+        unit = {'id': 'u1', 'title': 'Unit', 'cards': [], 'quiz': []}
+        malformed = {
+            'no_question_id': {'units': [dict(unit, quiz=[{'prompt': 'Two plus two?'}])]},
+            'cards_not_a_list': {'units': [dict(unit, cards=5)]},
+            'units_not_a_list': {'units': 5},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            packs = []
+            for name, pack in malformed.items():
+                path = Path(tmp) / f'{name}.json'
+                path.write_text(json.dumps(dict(pack, subject='math', grade=9, locale='en')), encoding='utf-8')
+                packs.append(('en', 'math', 9, path))
+            with mock.patch('school.management.commands.build_lesson_bundle.iter_lesson_pack_files',
+                            lambda: packs):
+                with self.assertRaises(CommandError) as raised:
+                    call_command('build_lesson_bundle', output=str(Path(tmp) / 'lessons.bundle'),
+                                 stdout=io.StringIO())
+            for name in malformed:
+                self.assertIn(f'{name}.json: ', str(raised.exception))
+            self.assertFalse((Path(tmp) / 'lessons.bundle').exists())
@@ -1,4 +1,14 @@
-from django.test import TestCase, Client
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, Client
+
+from school.services import fragments
+from school.services.lessons import load_catalog
 
 class PageTestCase(TestCase):
     def setUp(self):
@@ -22,4 +32,60 @@ class PageTestCase(TestCase):
     def test_quiz_page(self):
         response = self.client.get('/quiz/math/1/add_basics/')
         self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'Quiz')
\ No newline at end of file
+        self.assertContains(response, 'Quiz')
+
+    def test_lesson_page_rendered_once_per_pack_version(self):
+        cache = fragments.FragmentCache()
+        with mock.patch.object(fragments, 'fragment_cache', cache):
+            first = self.client.get('/lesson/math/1/add_basics/').content
+            second = self.client.get('/lesson/math/1/add_basics/').content
+        self.assertEqual(first, second)
+        # The catalog may already hold this render from an earlier test.
+        self.assertEqual(cache.hits + cache.misses, 2)
+        self.assertGreaterEqual(cache.hits, 1)
+        self.assertIn(('fragment', 'lesson:add_basics', 'en'), load_catalog('math', 1, 'en')._derived)
+
+    def test_subject_grade_merges_learner_badges(self):
+        self.client.get('/subject/math/grade/1/')
+        self.client.post('/api/progress/set/', {
+            'subject': 'math', 'grade': 1, 'unitId': 'add_basics', 'status': 'completed', 'score': 80,
+        }, content_type='application/json')
+        response = self.client.get('/subject/math/grade/1/')
+        self.assertContains(response, '80%')
+        self.assertContains(response, 'Not Started')
+        self.assertNotContains(response, fragments.BADGE_MARKER)
+        response = Client().get('/subject/math/grade/1/')
+        self.assertNotContains(response, '80%')
+
+
+# Run in a fresh interpreter: the profile decides INSTALLED_APPS, which are fixed once Django is set up.
+KIOSK_SCRIPT = """
+import json, sys, tempfile
+import django
+django.setup()
+from django.conf import settings
+from django.test import Client
+settings.SESSION_FILE_PATH = tempfile.mkdtemp()
+client = Client(HTTP_HOST='localhost')
+print(json.dumps({
+    'apps': settings.INSTALLED_APPS,
+    'home': client.get('/').status_code,
+    'lessons': client.get('/api/lessons/?subject=math&grade=1&locale=en').status_code,
+    'set_lang': client.post('/set-lang/', {'lang': 'es'}).status_code,
+    'admin': client.get('/admin/').status_code,
+    'lazy': [name for name in ('requests', 'httpx', 'django.contrib.admin') if name not in sys.modules],
+}))
+"""
+
+
+class KioskProfileTestCase(SimpleTestCase):
+    def test_serves_school_without_admin_auth_or_messages(self):
+        env = dict(os.environ, LIGHTSCHOOL_PROFILE='kiosk', DJANGO_SETTINGS_MODULE='lightschool.settings')
+        proc = subprocess.run([sys.executable, '-c', KIOSK_SCRIPT], cwd=Path(__file__).resolve().parents[2],
+                              env=env, capture_output=True, text=True, timeout=60)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        self.assertEqual(result['apps'], ['django.contrib.staticfiles', 'school'])
+        self.assertEqual((result['home'], result['lessons'], result['set_lang']), (200, 200, 200))
+        self.assertEqual(result['admin'], 404)
+        self.assertEqual(result['lazy'], ['requests', 'httpx', 'django.contrib.admin'])
@@ -0,0 +1,673 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.conf import settings
+from django.test import Client, TestCase
+
+from school.services import calculator, tutor
+from school.services.admission import AdmissionGate, CircuitBreaker, RateLimiter
+from school.services.auditlog import AuditLog
+from school.services.catalog import LessonCatalog
+from school.services.local_model import LocalTutor, TemplateGenerator
+from school.services.openai_client import OpenAIClient
+from school.services.retrieval import LessonIndex
+from school.services.singleflight import SingleFlight
+from school.services.tutor_cache import LocalCacheBackend, TutorReplyCache
+from school.services.tutor_rules import RuleEngine
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers every chat completion with a fixed tutor reply."""
+
+    protocol_version = 'HTTP/1.1'
+    answer = 'Addition means putting numbers together!'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length))
+        self.server.requests.append(request)
+        time.sleep(self.server.delay)
+        if request.get('stream'):
+            return self.stream()
+        content = json.dumps({'answer': self.answer})
+        body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': content}}]}).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass  # the client timed out first
+
+    def stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for word in self.answer.split(' '):
+            chunk = {'choices': [{'delta': {'content': word + ' '}}]}
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubOpenAIServer:
+    """Local stand-in for the OpenAI chat completions endpoint."""
+
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StubOpenAIHandler)
+        self.httpd.requests = []
+        self.httpd.delay = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}/v1/chat/completions'
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TutorAITestCase(TestCase):
+    def setUp(self):
+        self.server = StubOpenAIServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        client = OpenAIClient(self.server.url, 'test-key', timeout=5)
+        patches = (
+            ('openai_client', client),
+            ('reply_cache', TutorReplyCache(LocalCacheBackend())),
+            ('ai_flight', SingleFlight()),
+            ('ai_rate_limiter', RateLimiter(10 / 60, 5)),
+            ('ai_gate', AdmissionGate(32, queue_size=16)),
+            ('ai_breaker', CircuitBreaker(5, 30.0)),
+            ('tutor_backends', [tutor.OpenAIBackend()]),
+        )
+        for name, value in patches:
+            patcher = mock.patch.object(tutor, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post_tutor(self, client, message):
+        return client.post('/api/tutor/', {
+            'message': message, 'subject': 'math', 'grade': 1, 'locale': 'en',
+        }, content_type='application/json')
+
+    def test_sync_reply_uses_stub(self):
+        reply = tutor.get_tutor_reply('What is addition?', 'math', 1, 'en')
+        self.assertEqual(reply, {'reply': StubOpenAIHandler.answer, 'source': 'ai'})
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_repeat_question_served_from_cache(self):
+        tutor.get_tutor_reply('What is addition?', 'math', 1, 'en')
+        reply = tutor.get_tutor_reply("what's ADDITION", 'math', 1, 'en')
+        self.assertEqual(reply['source'], 'cache')
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(tutor.reply_cache.stats()['hits'], 1)
+
+    def test_concurrent_identical_questions_coalesce(self):
+        self.server.httpd.delay = 0.3
+        questions = ['What is addition?', "what's addition", 'WHAT IS ADDITION'] * 4
+        with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+            replies = list(pool.map(lambda q: tutor.get_tutor_reply(q, 'math', 1, 'en'), questions))
+        self.assertEqual({r['reply'] for r in replies}, {StubOpenAIHandler.answer})
+        self.assertEqual(len(self.server.requests), 1)
+        stats = tutor.ai_flight.stats()
+        self.assertEqual(stats['executed'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_different_questions_do_not_coalesce(self):
+        self.server.httpd.delay = 0.3
+        questions = ['Why do we add numbers?', 'How do we add numbers?'] * 2
+        with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+            list(pool.map(lambda q: tutor.get_tutor_reply(q, 'math', 1, 'en'), questions))
+        asked = sorted(request['messages'][-1]['content'] for request in self.server.requests)
+        self.assertEqual(len(asked), 2)
+        self.assertIn('How do we add', asked[0])
+        self.assertIn('Why do we add', asked[1])
+        self.assertEqual(tutor.ai_flight.stats(), {'executed': 2, 'coalesced': 2, 'in_flight': 0})
+
+    async def test_async_identical_questions_coalesce(self):
+        self.server.httpd.delay = 0.2
+        replies = await asyncio.gather(*(
+            tutor.aget_tutor_reply('What is a noun?', 'english', 1, 'en') for _ in range(10)))
+        self.assertEqual({r['source'] for r in replies}, {'ai'})
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(tutor.ai_flight.stats()['coalesced'], 9)
+        await tutor.openai_client.aclose()
+
+    def test_concurrent_wsgi_requests_coalesce(self):
+        # Under WSGI each request runs the async view on its own event loop.
+        self.server.httpd.delay = 0.3
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(
+                lambda n: self.post_tutor(Client(REMOTE_ADDR=f'10.0.0.{n}'), 'What is addition?'), range(8)))
+        self.assertEqual({r.json()['source'] for r in responses}, {'ai'})
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(tutor.ai_flight.stats(), {'executed': 1, 'coalesced': 7, 'in_flight': 0})
+        # The sync path served them: no per-loop async clients were left behind.
+        self.assertEqual(len(tutor.openai_client._loop_state), 0)
+
+    async def test_async_api_tutor_uses_stub(self):
+        response = await self.post_tutor(self.async_client, 'What is addition?')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'reply': StubOpenAIHandler.answer, 'source': 'ai'})
+        await tutor.openai_client.aclose()
+
+    async def read_stream(self, message):
+        response = await self.async_client.post('/api/tutor/stream/', {
+            'message': message, 'subject': 'math', 'grade': 1, 'locale': 'en',
+        }, content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        events = []
+        for block in body.strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return events
+
+    async def test_stream_relays_tokens(self):
+        events = await self.read_stream('What is addition?')
+        tokens = [data['text'] for event, data in events if event == 'token']
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(''.join(tokens).strip(), StubOpenAIHandler.answer)
+        self.assertEqual(events[-1], ('done', {'source': 'ai'}))
+        self.assertTrue(self.server.requests[0]['stream'])
+        # The finished stream is cached for the next identical question.
+        events = await self.read_stream("what's addition")
+        self.assertEqual(events[0], ('reply', {'reply': StubOpenAIHandler.answer, 'source': 'cache'}))
+        await tutor.openai_client.aclose()
+
+    def test_wsgi_stream_is_not_buffered(self):
+        response = Client().post('/api/tutor/stream/', {
+            'message': 'What is addition?', 'subject': 'math', 'grade': 1, 'locale': 'en',
+        }, content_type='application/json')
+        chunks = iter(response.streaming_content)
+        # Nothing has been asked yet: the events are produced as the server iterates.
+        self.assertEqual(self.server.requests, [])
+        first = next(chunks).decode()
+        self.assertTrue(first.startswith('event: token\n'))
+        rest = b''.join(chunks).decode()
+        self.assertTrue(rest.endswith('event: done\ndata: {"source": "ai"}\n\n'))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(len(tutor.openai_client._loop_state), 0)
+
+    async def test_stream_answers_arithmetic_and_rules_instantly(self):
+        events = await self.read_stream('What is 2 + 3?')
+        self.assertEqual(events, [('reply', {'reply': '5', 'source': 'calculator'}), ('done', {'source': 'calculator'})])
+        tutor.openai_client.url = 'http://127.0.0.1:9/v1/chat/completions'
+        events = await self.read_stream('What is addition?')
+        self.assertEqual([e for e, _ in events], ['reply', 'done'])
+        self.assertEqual(events[-1][1], {'source': 'rules'})
+        await tutor.openai_client.aclose()
+
+    async def test_unreachable_upstream_falls_back_to_rules(self):
+        tutor.openai_client.url = 'http://127.0.0.1:9/v1/chat/completions'
+        response = await self.post_tutor(self.async_client, 'What is addition?')
+        self.assertEqual(response.json()['source'], 'rules')
+        await tutor.openai_client.aclose()
+
+
+    def test_rate_limited_session_gets_offline_reply(self):
+        tutor.ai_rate_limiter.burst = 2
+        replies = [tutor.get_tutor_reply(f'Why is {n} special?', 'math', 1, 'en', client_key='kid')
+                   for n in range(4)]
+        self.assertEqual([r['source'] for r in replies], ['ai', 'ai', 'rules', 'rules'])
+        self.assertEqual(len(self.server.requests), 2)
+        # Another session has its own bucket.
+        reply = tutor.get_tutor_reply('Why is 9 special?', 'math', 1, 'en', client_key='other kid')
+        self.assertEqual(reply['source'], 'ai')
+
+    def test_requests_without_a_session_cookie_are_limited(self):
+        tutor.ai_rate_limiter.burst = 2
+        # A new Client per request sends no session cookie, or a made-up one.
+        responses = []
+        for n in range(4):
+            client = Client()
+            if n % 2:
+                client.cookies[settings.SESSION_COOKIE_NAME] = f'madeupsessionkey{n:016d}'
+            responses.append(self.post_tutor(client, f'Why is {n} special?'))
+        self.assertEqual([r.json()['source'] for r in responses], ['ai', 'ai', 'rules', 'rules'])
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertFalse([r for r in responses if settings.SESSION_COOKIE_NAME in r.cookies])
+
+    def test_full_gate_degrades_immediately(self):
+        tutor.ai_gate = AdmissionGate(0, queue_size=0)
+        start = time.perf_counter()
+        reply = tutor.get_tutor_reply('What is addition?', 'math', 1, 'en')
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(reply['source'], 'rules')
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(tutor.ai_gate.stats()['rejected'], 1)
+
+    async def test_breaker_skips_failing_upstream(self):
+        tutor.openai_client.url = 'http://127.0.0.1:9/v1/chat/completions'
+        tutor.ai_breaker.failure_threshold = 2
+        with mock.patch.object(tutor.openai_client, 'acomplete', wraps=tutor.openai_client.acomplete) as call:
+            for n in range(4):
+                reply = await tutor.aget_tutor_reply(f'Why is {n} special?', 'math', 1, 'en')
+                self.assertEqual(reply['source'], 'rules')
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(tutor.ai_breaker.stats(), {'open': 1, 'failures': 2, 'opens': 1, 'skipped': 2})
+        await tutor.openai_client.aclose()
+
+    def test_gate_rejection_keeps_breaker_trial(self):
+        tutor.ai_breaker.failure_threshold = 1
+        tutor.ai_breaker.reset_timeout = 0.05
+        tutor.ai_breaker.record_failure()
+        time.sleep(0.06)
+        gate = AdmissionGate(1)
+        self.assertTrue(gate.acquire())
+        with mock.patch.object(tutor, 'ai_gate', gate):
+            self.assertEqual(tutor.get_tutor_reply('What is addition?', 'math', 1, 'en')['source'], 'rules')
+            gate.release()
+            # The turned-away question did not use up the trial call.
+            self.assertEqual(tutor.get_tutor_reply('What is addition?', 'math', 1, 'en')['source'], 'ai')
+        self.assertFalse(tutor.ai_breaker.is_open)
+
+    async def test_stream_is_rate_limited(self):
+        tutor.ai_rate_limiter.burst = 1
+        events = await self.read_stream('Why is 7 special?')
+        self.assertEqual(events[-1], ('done', {'source': 'ai'}))
+        events = await self.read_stream('Why is 8 special?')
+        self.assertEqual(events[-1], ('done', {'source': 'rules'}))
+        self.assertEqual(len(self.server.requests), 1)
+        await tutor.openai_client.aclose()
+
+    def with_local_backend(self):
+        tutor.tutor_backends.append(LocalTutor(TemplateGenerator, timeout=2))
+        tutor.openai_client.url = 'http://127.0.0.1:9/v1/chat/completions'
+
+    async def test_local_backend_answers_when_upstream_is_down(self):
+        self.with_local_backend()
+        reply = await tutor.aget_tutor_reply('What is addition?', 'math', 1, 'en')
+        self.assertEqual(reply['source'], 'local')
+        self.assertIn('Adding means putting things together!', reply['reply'])
+        # Nothing in the lessons to answer from: the rules still reply.
+        reply = tutor.get_tutor_reply('Why is the sky blue?', 'science', 1, 'en')
+        self.assertEqual(reply['source'], 'rules')
+        await tutor.openai_client.aclose()
+
+    async def test_stream_falls_through_to_local_backend(self):
+        self.with_local_backend()
+        events = await self.read_stream('How do I subtract numbers?')
+        self.assertEqual([e for e, _ in events], ['token', 'done'])
+        self.assertIn('Subtracting two-digit numbers.', events[0][1]['text'])
+        self.assertEqual(events[-1], ('done', {'source': 'local'}))
+        self.assertEqual(tutor.tutor_stats()['backends']['local']['submitted'], 1)
+        await tutor.openai_client.aclose()
+
+
+class SlowGenerator:
+    """Echoes each prompt after ``delay`` seconds, recording its batches."""
+
+    name = 'slow'
+    loads = 0
+
+    def __init__(self, delay=0.05, fail_load=False):
+        self.delay = delay
+        self.fail_load = fail_load
+        self.batches = []
+
+    def load(self):
+        SlowGenerator.loads += 1
+        if self.fail_load:
+            raise OSError('no model file')
+
+    def generate(self, prompts):
+        self.batches.append(len(prompts))
+        time.sleep(self.delay)
+        return [f'echo: {prompt.message}' for prompt in prompts]
+
+
+class LocalTutorTestCase(TestCase):
+    def test_template_answers_from_lessons(self):
+        local = LocalTutor(TemplateGenerator)
+        reply = local.reply('¿Qué es la suma?', 'math', 1, 'es')
+        self.assertTrue(reply.startswith('Esto dice tu lección: ¡Sumar significa juntar cosas!'))
+        self.assertIsNone(local.reply('What is a noun?', 'math', 1, 'en'))
+
+    def test_concurrent_questions_share_batches_and_model(self):
+        generator = SlowGenerator()
+        SlowGenerator.loads = 0
+        local = LocalTutor(lambda: generator, workers=1, batch_size=8, batch_wait=0.02)
+        questions = ['What is addition?', 'What is addition?', 'Why is 1 odd?', 'Why is 2 even?'] * 3
+        with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+            replies = list(pool.map(lambda q: local.reply(q, 'math', 1, 'en'), questions))
+        self.assertEqual(replies, [f'echo: {q}' for q in questions])
+        stats = local.stats()
+        self.assertLess(stats['batches'], len(questions))
+        self.assertLess(stats['generated'], len(questions))  # identical prompts answered once per batch
+        self.assertEqual(SlowGenerator.loads, 1)
+
+    async def test_slow_generation_falls_back_within_budget(self):
+        local = LocalTutor(lambda: SlowGenerator(delay=0.5), timeout=0.05)
+        start = time.perf_counter()
+        self.assertIsNone(await local.areply('What is addition?', 'math', 1, 'en'))
+        self.assertLess(time.perf_counter() - start, 0.3)
+        self.assertEqual(local.stats()['timed_out'], 1)
+
+    def test_failed_model_load_uses_templates(self):
+        local = LocalTutor(lambda: SlowGenerator(fail_load=True))
+        self.assertIn('Adding means', local.reply('What is addition?', 'math', 1, 'en'))
+        self.assertEqual(local.generator, 'template')
+
+
+class AdmissionTestCase(TestCase):
+    def test_token_bucket_refills(self):
+        limiter = RateLimiter(rate=20, burst=2)
+        self.assertEqual([limiter.allow('a') for _ in range(3)], [True, True, False])
+        self.assertTrue(limiter.allow('b'))
+        time.sleep(0.06)
+        self.assertTrue(limiter.allow('a'))
+        self.assertEqual(limiter.stats(), {'allowed': 4, 'limited': 1, 'sessions': 2})
+
+    def test_token_buckets_are_bounded(self):
+        limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+        for key in 'abc':
+            limiter.allow(key)
+        self.assertEqual(limiter.stats()['sessions'], 2)
+
+    def test_gate_queues_then_rejects(self):
+        gate = AdmissionGate(1, queue_size=1, queue_timeout=2)
+        self.assertTrue(gate.acquire())
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            waiting = pool.submit(gate.acquire)
+            while gate.stats()['waiting'] == 0:
+                time.sleep(0.001)
+            self.assertFalse(gate.acquire())  # queue full: turned away at once
+            gate.release()
+            self.assertTrue(waiting.result(timeout=2))
+        gate.release()
+        self.assertEqual(gate.stats(), {
+            'in_flight': 0, 'waiting': 0, 'admitted': 2, 'queued': 1, 'rejected': 1, 'timed_out': 0})
+
+    async def test_async_gate_wait_times_out(self):
+        gate = AdmissionGate(1, queue_size=2, queue_timeout=0.05)
+        self.assertTrue(await gate.aacquire())
+        self.assertFalse(await gate.aacquire())
+        released = asyncio.get_running_loop().call_later(0.01, gate.release)
+        self.assertTrue(await gate.aacquire())
+        released.cancel()
+        gate.release()
+        self.assertEqual(gate.stats()['in_flight'], 0)
+        self.assertEqual(gate.stats()['timed_out'], 1)
+
+    def test_breaker_allows_one_trial_after_reset(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # only one trial per reset window
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.is_open)
+
+
+class TutorReplyCacheTestCase(TestCase):
+    def test_normalized_keys(self):
+        key = TutorReplyCache.make_key
+        self.assertEqual(key('What is a noun?', 'english', 1, 'en'), key("what's NOUNS", 'english', 1, 'en'))
+        self.assertNotEqual(key('What is a noun?', 'english', 1, 'en'), key('What is a noun?', 'english', 2, 'en'))
+        self.assertEqual(key('¿Qué es la suma?', 'math', 1, 'es'), key('que es suma', 'math', 1, 'es'))
+        self.assertIsNone(key('what is?', 'math', 1, 'en'))
+
+    def test_keys_keep_question_words_and_negations(self):
+        key = TutorReplyCache.make_key
+        pairs = [
+            ('Why do we add numbers?', 'How do we add numbers?', 'en'),
+            ('Why do we add numbers?', 'When do we add numbers?', 'en'),
+            ('is 7 an even number', 'is 7 not an even number', 'en'),
+            ('¿Es un sustantivo o no?', '¿Es un sustantivo?', 'es'),
+        ]
+        for first, second, locale in pairs:
+            self.assertNotEqual(key(first, 'math', 1, locale), key(second, 'math', 1, locale))
+
+    def test_ttl_and_lru(self):
+        backend = LocalCacheBackend(max_entries=1, ttl=0)
+        backend.set('a', 'x')
+        self.assertIsNone(backend.get('a'))
+        backend = LocalCacheBackend(max_entries=1, ttl=60)
+        backend.set('a', 'x')
+        backend.set('b', 'y')
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual(backend.get('b'), 'y')
+        self.assertEqual(backend.evictions, 1)
+
+
+class RuleEngineTestCase(TestCase):
+    RULES = {
+        'en': {'math:addition': ['add it'], 'math:help': ['help'], 'english:nouns': ['noun']},
+        'es': {'math:addition': ['suma']},
+        '_keywords': {'en': {'math:addition': ['plus']}, 'es': {'math:addition': ['suma']}},
+    }
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.write(self.RULES)
+        self.engine = RuleEngine(self.path, check_interval=0)
+
+    def write(self, rules, mtime_ns=None):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(rules, f)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_matches_any_token(self):
+        self.assertEqual(self.engine.reply('Can you help me with addition?', 'math', 'en'), 'add it')
+        self.assertEqual(self.engine.reply('what is 2 plus 2', 'math', 'en'), 'add it')
+        self.assertEqual(self.engine.reply('¿Qué es la SUMA?', 'math', 'es'), 'suma')
+        self.assertEqual(self.engine.reply('nouns', 'english', 'en'), 'noun')
+
+    def test_no_match(self):
+        self.assertIsNone(self.engine.reply('', 'math', 'en'))
+        self.assertIsNone(self.engine.reply('nouns', 'math', 'en'))
+        self.assertIsNone(self.engine.reply('addition', 'math', 'fr'))
+
+    def test_hot_reload(self):
+        self.engine.reply('addition', 'math', 'en')
+        self.write({'en': {'math:addition': ['reloaded']}}, mtime_ns=10**18)
+        self.assertEqual(self.engine.reply('addition', 'math', 'en'), 'reloaded')
+
+    def test_broken_reload_keeps_last_good_rules(self):
+        self.engine.reply('addition', 'math', 'en')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"en": {"math:addit')
+        os.utime(self.path, ns=(10**18, 10**18))
+        with mock.patch.object(tutor, 'rule_engine', self.engine):
+            reply = tutor.get_offline_reply('What is addition?', 'math', 1, 'en')
+        self.assertEqual(reply, {'reply': 'add it', 'source': 'rules'})
+        os.remove(self.path)
+        self.addCleanup(self.write, self.RULES)
+        self.assertEqual(self.engine.reply('addition', 'math', 'en'), 'add it')
+
+    def test_empty_message_falls_back_to_default(self):
+        self.assertEqual(tutor.get_rule_based_reply('', 'math', 1, 'en'), "Keep practicing! You're doing great.")
+
+
+class LessonIndexTestCase(TestCase):
+    def pack(self, grade, title, body):
+        return LessonCatalog({'subject': 'math', 'grade': grade, 'locale': 'en', 'units': [{
+            'id': f'u{grade}', 'title': 'Numbers',
+            'cards': [{'type': 'text', 'title': title, 'body': body}],
+            'quiz': [{'id': 'q1', 'prompt': 'What is 9 + 3?', 'options': ['12'], 'answerIndex': 0,
+                      'explanation': 'Nine plus three is twelve.'}],
+        }]})
+
+    def setUp(self):
+        self.packs = {
+            1: self.pack(1, 'Carrying', 'Carry the one to the tens place.'),
+            2: self.pack(2, 'Borrowing', 'Borrow from the tens.'),
+        }
+        self.loads = []
+
+        def load(subject, grade, locale):
+            self.loads.append(grade)
+            return self.packs[grade]
+
+        self.index = LessonIndex(packs=lambda: [('en', 'math', g, None) for g in list(self.packs)],
+                                 load=load, check_interval=0)
+
+    def texts(self, query, **kwargs):
+        return [snippet.text for _score, snippet in self.index.search(query, 'math', 'en', **kwargs)]
+
+    def test_search_ranks_lesson_text(self):
+        self.assertEqual(self.texts('how do I carry?', k=1), ['Carry the one to the tens place.'])
+        self.assertEqual(self.texts('what is nine plus three', k=1), ['Nine plus three is twelve.'])
+        self.assertEqual(self.texts('tens', grade=2, k=1), ['Borrow from the tens.'])
+        self.assertEqual(self.texts('tens', grade=1, k=1), ['Carry the one to the tens place.'])
+        self.assertEqual(self.texts('carry elephants', min_match=0.6), [])
+        self.assertEqual(self.index.search('carry', 'english', 'en'), [])
+
+    def test_reindexes_only_changed_packs(self):
+        self.index.refresh()
+        terms = self.index.stats()['terms']
+        self.packs[2] = self.pack(2, 'Regrouping', 'Regroup a ten into ones.')
+        self.index.refresh()
+        self.assertEqual(self.texts('borrow'), [])
+        self.assertEqual(self.texts('regroup'), ['Regroup a ten into ones.'])
+        del self.packs[1]
+        self.index.refresh()
+        self.assertEqual(self.texts('carry'), [])
+        self.assertEqual(self.index.stats()['packs'], 1)
+        self.assertLess(self.index.stats()['terms'], terms)
+
+    def test_search_does_not_wait_for_a_refresh(self):
+        index = LessonIndex(packs=self.index.packs, load=self.index.load, check_interval=60)
+        index.refresh()
+        with index._lock:  # a refresh is running
+            results = index.search('carry', 'math', 'en', k=1)
+        self.assertEqual([snippet.text for _score, snippet in results], ['Carry the one to the tens place.'])
+
+    def test_reloads_only_packs_whose_file_changed(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        paths = {grade: os.path.join(tmp.name, f'grade{grade}.json') for grade in self.packs}
+        for path in paths.values():
+            open(path, 'w').close()
+        self.index.packs = lambda: [('en', 'math', g, paths[g]) for g in list(self.packs)]
+        self.index.refresh()
+        self.index.refresh()
+        self.assertEqual(sorted(self.loads), [1, 2])
+        self.packs[2] = self.pack(2, 'Regrouping', 'Regroup a ten into ones.')
+        os.utime(paths[2], ns=(10**18, 10**18))
+        self.index.refresh()
+        self.assertEqual(sorted(self.loads), [1, 2, 2])
+        self.assertEqual(self.texts('regroup'), ['Regroup a ten into ones.'])
+
+    def test_offline_reply_uses_lessons(self):
+        reply = tutor.get_offline_reply('what does borrow mean', 'math', 2, 'en')
+        self.assertEqual(reply['source'], 'lessons')
+        self.assertIn('borrow', reply['reply'])
+        self.assertEqual(tutor.get_offline_reply('What is addition?', 'math', 1, 'en')['source'], 'rules')
+
+
+class AuditLogTestCase(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'audit.jsonl')
+
+    def read(self, path=None):
+        with open(path or self.path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_writes_json_lines_in_background(self):
+        log = AuditLog(self.path, flush_interval=0.05)
+        log.log('tutor', message='What is 2 + 3?', reply='5')
+        log.log('ai_error', sample=False, error='boom')
+        log.close()
+        records = self.read()
+        self.assertEqual([r['event'] for r in records], ['tutor', 'ai_error'])
+        self.assertEqual(records[0]['reply'], '5')
+        self.assertEqual(log.stats()['written'], 2)
+
+    def test_sampling_keeps_errors(self):
+        log = AuditLog(self.path, sample_rate=0.0, flush_interval=0.05)
+        for _ in range(10):
+            log.log('tutor', message='hi')
+        log.log('ai_error', sample=False, error='boom')
+        log.close()
+        self.assertEqual([r['event'] for r in self.read()], ['ai_error'])
+        self.assertEqual(log.stats()['sampled_out'], 10)
+
+    def test_rotates_by_size(self):
+        log = AuditLog(self.path, max_bytes=200, backup_count=2, batch_size=1, flush_interval=0.05)
+        for i in range(20):
+            log.log('tutor', message='x' * 50, i=i)
+        log.close()
+        self.assertGreater(log.stats()['rotations'], 2)
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        kept = [r['i'] for path in (self.path + '.2', self.path + '.1', self.path) for r in self.read(path)]
+        self.assertEqual(kept, list(range(20 - len(kept), 20)))
+
+    def test_failed_rotation_keeps_writing(self):
+        log = AuditLog(self.path, max_bytes=200, backup_count=2, batch_size=1, flush_interval=0.05)
+        with mock.patch('school.services.auditlog.os.replace', side_effect=PermissionError('in use')):
+            for i in range(5):
+                log.log('tutor', message='x' * 50, i=i)
+            deadline = time.monotonic() + 2
+            while log.stats()['written'] < 5 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertTrue(log._thread.is_alive())
+        log.close()
+        self.assertEqual([r['i'] for r in self.read()], list(range(5)))
+        self.assertEqual((log.stats()['rotations'], log.stats()['written']), (0, 5))
+        self.assertGreater(log.stats()['rotation_errors'], 0)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        log = AuditLog(self.path, queue_size=1, flush_interval=0.05)
+        with mock.patch.object(AuditLog, '_run'):
+            for _ in range(5):
+                log.log('tutor', message='hi')
+        self.assertEqual(log.stats()['dropped'], 4)
+
+
+class CalculatorTestCase(TestCase):
+    def test_calculator_replies(self):
+        cases = {
+            'What is 2 + 3?': '5',
+            "what's 12 divided by 3?": '4',
+            '3 times (4 - 1)': '9',
+            'can you help me with 15 - 7': '8',
+            '-3 + 5': '2',
+            'what is 2.5 + 2.5': '5',
+        }
+        for message, expected in cases.items():
+            self.assertEqual(tutor.get_calculator_reply(message), {'reply': expected, 'source': 'calculator'})
+
+    def test_not_arithmetic(self):
+        self.assertIsNone(tutor.get_calculator_reply('Tell me about nouns'))
+        self.assertIsNone(tutor.get_calculator_reply('I have 3 apples'))
+
+    def test_limits(self):
+        for expr in ('1/0', '9' * 13 + '+1', '99999999*99999999*99999', '(' * 40 + '1' + ')' * 40,
+                     '2**99999', '1+' * 100 + '1', '2+'):
+            with self.assertRaises(calculator.CalculatorError):
+                calculator.evaluate(expr)
@@ -10,7 +10,15 @@ urlpatterns = [
     path('lesson/<str:subject>/<int:grade>/<str:unit_id>/', views.lesson, name='lesson'),
     path('quiz/<str:subject>/<int:grade>/<str:unit_id>/', views.quiz, name='quiz'),
     path('api/lessons/', views.api_lessons, name='api_lessons'),
+    path('api/lessons/batch/', views.api_lessons_batch, name='api_lessons_batch'),
+    path('api/sync/manifest/', views.api_sync_manifest, name='api_sync_manifest'),
     path('api/progress/set/', views.api_progress_set, name='api_progress_set'),
     path('api/progress/get/', views.api_progress_get, name='api_progress_get'),
+    path('api/progress/sync/', views.api_progress_sync, name='api_progress_sync'),
+    path('api/quiz/submit/', views.api_quiz_submit, name='api_quiz_submit'),
+    path('api/quiz/analytics/', views.api_quiz_analytics, name='api_quiz_analytics'),
     path('api/tutor/', views.api_tutor, name='api_tutor'),
+    path('api/tutor/stream/', views.api_tutor_stream, name='api_tutor_stream'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('sw.js', views.service_worker, name='service_worker'),
 ]
\ No newline at end of file
@@ -1,11 +1,25 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.translation import activate
 import json
-from .services.lessons import load_lesson_pack
-from .services.progress import get_progress, set_progress, get_subject_progress
-from .services.tutor import get_tutor_reply
+import time
+import traceback
+from .services import metrics, warmup
+from .services.auditlog import audit_log
+from .services.fragments import fragment_cache, render_page, render_unit_list
+from .services.lessons import load_catalog, pack_cache
+from .services.payloads import catalog_json_payload
+from .services.progress import get_grade_progress, set_progress, sync_progress
+from .services.quiz import submit_quiz, unit_analytics
+from .services.retrieval import lesson_index
+from .services.sync import batch_cache, grade_catalogs, service_worker_payload, sync_manifest
+from .services.tutor import (
+    aget_tutor_reply, astream_tutor_reply, get_tutor_reply, stream_tutor_reply, tutor_stats,
+)
 
 def home(request):
     """Home page: choose subject and grade."""
@@ -22,98 +36,239 @@ def subject_grade(request, subject, grade):
     """List units for subject/grade."""
     locale = request.session.get('django_language', 'en')
     try:
-        lesson_pack = load_lesson_pack(subject, int(grade), locale)
+        catalog = load_catalog(subject, int(grade), locale)
     except FileNotFoundError:
         return render(request, 'error.html', {'message': 'Lesson not found'})
-    progress = get_progress(request, locale)
-    subj_progress = get_subject_progress(progress, subject, grade)
-    units = lesson_pack['units']
-    for unit in units:
-        unit['progress'] = subj_progress.get(unit['id'], {})
-    return render(request, 'subject_grade.html', {
+    subj_progress = get_grade_progress(request, locale, subject, grade)
+    return HttpResponse(render_unit_list(catalog, {
         'subject': subject,
         'grade': grade,
-        'units': units,
         'locale': locale
-    })
+    }, subj_progress))
 
 def lesson(request, subject, grade, unit_id):
     """Render lesson cards."""
     locale = request.session.get('django_language', 'en')
-    lesson_pack = load_lesson_pack(subject, int(grade), locale)
-    unit = next((u for u in lesson_pack['units'] if u['id'] == unit_id), None)
+    catalog = load_catalog(subject, int(grade), locale)
+    unit = catalog.get_unit(unit_id)
     if not unit:
         return render(request, 'error.html', {'message': 'Unit not found'})
-    return render(request, 'lesson.html', {
+    return HttpResponse(render_page(catalog, f'lesson:{unit_id}', 'lesson.html', {
         'subject': subject,
         'grade': grade,
         'unit': unit,
         'locale': locale
-    })
+    }))
 
 def quiz(request, subject, grade, unit_id):
     """Render quiz."""
     locale = request.session.get('django_language', 'en')
-    lesson_pack = load_lesson_pack(subject, int(grade), locale)
-    unit = next((u for u in lesson_pack['units'] if u['id'] == unit_id), None)
+    catalog = load_catalog(subject, int(grade), locale)
+    unit = catalog.get_unit(unit_id)
     if not unit:
         return render(request, 'error.html', {'message': 'Unit not found'})
-    return render(request, 'quiz.html', {
+    _, next_id = catalog.neighbours(unit_id)
+    return HttpResponse(render_page(catalog, f'quiz:{unit_id}', 'quiz.html', {
         'subject': subject,
         'grade': grade,
         'unit': unit,
+        'next_unit_id': next_id,
         'locale': locale
-    })
+    }))
 
 # API views
 
+MAX_SYNC_EVENTS = 500
+
 def api_lessons(request):
-    """Get lesson pack JSON."""
+    """Get lesson pack JSON, pre-encoded and conditional on its ETag."""
     subject = request.GET.get('subject')
     grade = request.GET.get('grade')
     locale = request.GET.get('locale', 'en')
     try:
-        data = load_lesson_pack(subject, int(grade), locale)
-        return JsonResponse(data)
-    except:
+        catalog = load_catalog(subject, int(grade), locale)
+    except (TypeError, ValueError, FileNotFoundError):
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return catalog_json_payload(catalog).response(request)
+
+def api_lessons_batch(request):
+    """Every pack of one grade (or the listed subjects) in one response, for offline precaching."""
+    locale = request.GET.get('locale', 'en')
+    grade = request.GET.get('grade')
+    subjects = request.GET.get('subjects')
+    if not grade or not grade.isdigit():
+        return JsonResponse({'error': 'grade is required'}, status=400)
+    catalogs = grade_catalogs(locale, int(grade), set(subjects.split(',')) if subjects else None)
+    if not catalogs:
         return JsonResponse({'error': 'Not found'}, status=404)
+    return batch_cache.get(locale, int(grade), catalogs).response(request)
+
+def api_sync_manifest(request):
+    """Content hashes of every lesson pack and static asset, diffed by the service worker."""
+    return sync_manifest.payload().response(request)
+
+def service_worker(request):
+    """The service worker, served from the site root so its scope covers every page."""
+    payload = service_worker_payload()
+    if payload is None:
+        raise Http404
+    return payload.response(request)
 
 @csrf_exempt
 def api_progress_set(request):
     """Set progress."""
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
-    data = json.loads(request.body)
     locale = request.session.get('django_language', 'en')
-    progress = set_progress(request, locale, data['subject'], data['grade'], data['unitId'], data['status'], data.get('score'))
+    try:
+        data = json.loads(request.body)
+        progress = set_progress(request, locale, data['subject'], data['grade'], data['unitId'], data['status'],
+                                data.get('score'))
+    except KeyError as e:
+        return JsonResponse({'error': f'Missing {e}'}, status=400)
+    except (ValueError, TypeError, OverflowError) as e:
+        return JsonResponse({'error': str(e) or 'Invalid progress'}, status=400)
     return JsonResponse(progress)
 
+@csrf_exempt
+def api_progress_sync(request):
+    """Apply a batch of offline progress events; returns only what changed."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    try:
+        data = json.loads(request.body)
+        events = data['events']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"events": [...]}'}, status=400)
+    if not isinstance(events, list) or len(events) > MAX_SYNC_EVENTS:
+        return JsonResponse({'error': f'events must be a list of at most {MAX_SYNC_EVENTS}'}, status=400)
+    locale = request.session.get('django_language', 'en')
+    return JsonResponse(sync_progress(request, locale, events))
+
+@csrf_exempt
+def api_quiz_submit(request):
+    """Grade a quiz on the server, record each answer and save the unit's progress."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    try:
+        data = json.loads(request.body)
+        answers = data['answers']
+        catalog = load_catalog(data['subject'], int(data['grade']), request.session.get('django_language', 'en'))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected subject, grade, unitId and answers'}, status=400)
+    except FileNotFoundError:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    if not isinstance(answers, dict):
+        return JsonResponse({'error': 'answers must be an object'}, status=400)
+    unit_id = data.get('unitId')
+    if not isinstance(unit_id, str) or not unit_id:
+        return JsonResponse({'error': 'unitId must be a non-empty string'}, status=400)
+    result = submit_quiz(request, catalog, unit_id, answers)
+    if result is None:
+        return JsonResponse({'error': 'Unit not found'}, status=404)
+    return JsonResponse(result)
+
+def api_quiz_analytics(request):
+    """Completion rate per unit and difficulty per question for one subject/grade."""
+    subject = request.GET.get('subject')
+    grade = request.GET.get('grade')
+    locale = request.GET.get('locale', 'en')
+    if not subject or not grade or not grade.isdigit():
+        return JsonResponse({'error': 'subject and grade are required'}, status=400)
+    return JsonResponse(unit_analytics(locale, subject, grade, request.GET.get('unitId')))
+
 def api_progress_get(request):
     """Get progress for subject/grade."""
     subject = request.GET.get('subject')
     grade = request.GET.get('grade')
     locale = request.session.get('django_language', 'en')
-    progress = get_progress(request, locale)
-    subj_progress = get_subject_progress(progress, subject, grade)
-    return JsonResponse(subj_progress)
+    if not subject or not grade or not grade.isdigit():
+        return JsonResponse({})
+    return JsonResponse(get_grade_progress(request, locale, subject, grade))
+
+async def _client_key(request):
+    """Key the tutor rate limit applies to: the session, else the client address.
+
+    The session where there is one, since a whole classroom often shares an
+    address. A request without a stored session shares its address's bucket
+    instead of getting a new session, so dropping (or forging) the cookie does
+    not lift the limit and does not write a session per request.
+    """
+    key = request.session.session_key
+    if key and await request.session.aexists(key):
+        return key
+    return 'addr:' + request.META.get('REMOTE_ADDR', '')
 
 @csrf_exempt
-def api_tutor(request):
-    """Get tutor reply."""
+async def api_tutor(request):
+    """Get tutor reply; async so waiting on the AI upstream does not pin a worker thread.
+
+    Only under ASGI, where the event loop outlives the request. Under WSGI
+    each request gets a throwaway loop, so the reply comes from the sync path
+    on the worker thread, with the shared HTTP session and concurrency limit.
+    """
+    start = time.perf_counter()
     try:
         if request.method != 'POST':
             return JsonResponse({'error': 'Method not allowed'}, status=405)
-        print("=== API Tutor Request ===")
-        print(f"Request body: {request.body.decode()}")
         data = json.loads(request.body)
-        print(f"Parsed data: {data}")
-        reply = get_tutor_reply(data['message'], data['subject'], data['grade'], data['locale'])
-        print(f"Got reply: {reply}")
-        return JsonResponse(reply)
+        args = (data['message'], data['subject'], data['grade'], data['locale'])
+        client_key = await _client_key(request)
+        if isinstance(request, ASGIRequest):
+            reply = await aget_tutor_reply(*args, client_key=client_key)
+        else:
+            reply = await sync_to_async(get_tutor_reply)(*args, client_key=client_key)
     except Exception as e:
-        import traceback
-        print("=== Error in api_tutor ===")
-        print(f"Error: {str(e)}")
-        print("Traceback:")
-        print(traceback.format_exc())
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        audit_log.log('tutor_error', sample=False, error=repr(e), traceback=traceback.format_exc())
+        return JsonResponse({'error': str(e)}, status=500)
+    audit_log.log('tutor', subject=data['subject'], grade=data['grade'], locale=data['locale'],
+                  message=data['message'], source=reply['source'], reply=reply['reply'],
+                  total_ms=round((time.perf_counter() - start) * 1000, 1))
+    return JsonResponse(reply)
+
+@csrf_exempt
+async def api_tutor_stream(request):
+    """Stream the tutor reply as Server-Sent Events (token events, then done)."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    try:
+        data = json.loads(request.body)
+        args = (data['message'], data['subject'], data['grade'], data['locale'])
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected message, subject, grade and locale'}, status=400)
+
+    client_key = await _client_key(request)
+
+    def format_event(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    if isinstance(request, ASGIRequest):
+        async def events():
+            async for event, payload in astream_tutor_reply(*args, client_key=client_key):
+                yield format_event(event, payload)
+        body = events()
+    else:
+        # WSGI servers iterate the response on the worker thread, and would
+        # consume an async iterator whole before sending anything.
+        body = (format_event(event, payload) for event, payload in stream_tutor_reply(*args, client_key=client_key))
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+    return response
+
+def metrics_view(request):
+    """Latency histograms and cache counters in the Prometheus text format."""
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        raise Http404
+    stats = {
+        'pack_cache': pack_cache.stats(),
+        'fragment_cache': fragment_cache.stats(),
+        'lesson_index': lesson_index.stats(),
+        'sync_manifest': sync_manifest.stats(),
+        'tutor': tutor_stats(),
+        'audit_log': audit_log.stats(),
+    }
+    if warmup.last_report is not None:
+        stats['warmup'] = warmup.last_report.stats()
+    body = metrics.render(stats)
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')